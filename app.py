@@ -1,13 +1,28 @@
 import streamlit as st
-import yfinance as yf
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import requests
-import urllib.request
-import json
 import datetime
+import itertools
+import json
+import time
+
+from diagnostics import PROFILER, timed
+from figures import FIGURES, LiveFigure, lean_scatter
+from instruments import UNIVERSES
+from market_data import (
+    LOT_SIZES, STRIKE_STEP, FALLBACK_SPOTS, TICKER_MAP, NSE_CHAIN_URLS, INSTRUMENTS, WATCHLIST,
+    FX_TICKER, FALLBACK_FX, CHAIN_CACHE_PATH, ChainCache, MarketDataPoller, fallback_market_data,
+    standin_futures_curves, DIVIDENDS, forward_curve,
+)
+from strategies import PCP_MAX_IV_DEV, pcp_chain_scan, parse_nse_expiry, futures_term_structure, calendar_spreads, \
+    last_thursday, next_monthly_expiry, pcp_leg_analytics, pcp_trade, pcp_payoff, irp_trade, irp_sensitivity, \
+    basis_trade, basis_decay, irp_surface
+from scanner import RANK_KEYS, SCAN_DEFAULTS, TopN, iter_scan, paginate, rank_key
+from history import OpportunityHistory
+from pricing import parity_bounds
 st.set_page_config(page_title="Cross-Asset Arbitrage Monitor", layout="wide", page_icon="🏛️")
+_RERUN_T0 = time.perf_counter()
 
 st.markdown("""
     <style>
@@ -388,6 +403,11 @@ def _init_settings():
         "irp_min_profit":   100.0,   # ₹
         "irp_min_dev":      0.05,    # %
         "scanner_assets":   ["NIFTY", "RELIANCE", "TCS"],
+        "scanner_universe": "custom",
+        "scanner_page_size": 10,
+        "scanner_rank":     "net_pnl",
+        "score_ann_weight": SCAN_DEFAULTS["score_ann_weight"],   # ₹ per 1% ann. return
+        "score_day_weight": SCAN_DEFAULTS["score_day_weight"],   # ₹ per day to expiry
         "auto_refresh":     False,
         "refresh_interval": 30,
         "show_metadata":    True,
@@ -402,6 +422,10 @@ def _init_settings():
 
 _init_settings()
 
+# Live-data fragments (ticker bar, scanner results) re-run on this browser-side
+# timer; the rest of the page only re-runs on user interaction.
+live_run_every = st.session_state.refresh_interval if st.session_state.auto_refresh else None
+
 st.markdown("""
 <div style="
     padding: 22px 0 18px 0;
@@ -454,157 +478,225 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# ── CONSTANTS ─────────────────────────────────────────────────────────────────
-LOT_SIZES      = {"NIFTY": 65,   "RELIANCE": 250, "TCS": 175, "SBIN": 1500, "INFY": 400}
-STRIKE_STEP    = {"NIFTY": 50,   "RELIANCE": 20,  "TCS": 50,  "SBIN": 5,    "INFY": 20}
-FALLBACK_SPOTS = {"NIFTY": 25800.0, "RELIANCE": 1420.0, "TCS": 3850.0, "SBIN": 810.0, "INFY": 1580.0}
-TICKER_MAP     = {"NIFTY": "^NSEI", "RELIANCE": "RELIANCE.NS", "TCS": "TCS.NS", "SBIN": "SBIN.NS", "INFY": "INFY.NS"}
-FUTURES_TICKER = {"NIFTY": "^NSEI", "RELIANCE": "RELIANCE.NS", "TCS": "TCS.NS", "SBIN": "SBIN.NS", "INFY": "INFY.NS"}
-NSE_CHAIN_URLS = {
-    "NIFTY":    "https://www.nseindia.com/option-chain",
-    "RELIANCE": "https://www.nseindia.com/get-quotes/derivatives?symbol=RELIANCE",
-    "TCS":      "https://www.nseindia.com/get-quotes/derivatives?symbol=TCS",
-    "SBIN":     "https://www.nseindia.com/get-quotes/derivatives?symbol=SBIN",
-    "INFY":     "https://www.nseindia.com/get-quotes/derivatives?symbol=INFY",
-}
+# ── MARKET DATA POLLER ────────────────────────────────────────────────────────
+POLLER_COLD_START_WAIT_S = 12.0   # only the very first render of a fresh process waits
+SCAN_DRAW_EVERY_S        = 0.3    # streaming scan: redraw banner/cards/chart at most this often
+SCAN_RANK_LIMIT          = 500    # opportunities kept for paging/table; the rest are only counted
+
+@st.cache_resource(show_spinner=False)
+def get_poller():
+    """One background poller per server process, shared by every session.
+
+    Starts on the watchlist; sessions that scan or open other underlyings
+    add them with ``track()``. Chains are persisted to disk so a restart
+    serves the last good chains immediately instead of waiting on NSE.
+    """
+    chain_cache = ChainCache(path=CHAIN_CACHE_PATH)
+    PROFILER.register_counters("chain_cache", lambda: chain_cache.counters)
+    return MarketDataPoller(WATCHLIST, chain_cache=chain_cache).start()
+
+def get_snapshot():
+    """Latest published snapshot. Never fetches; only a cold process waits for the first cycle."""
+    poller = get_poller()
+    if poller.snapshot is None:
+        poller.wait_ready(POLLER_COLD_START_WAIT_S)
+    return poller.snapshot or {"ts": None, "cycle_ms": 0.0, "yf": {}, "market_data": {}, "latency_ms": {},
+                               "futures": None, "futures_src": None, "futures_ts": None, "complete": False}
+
+@st.cache_resource(show_spinner=False)
+def get_history():
+    """Process-wide opportunity history store (SQLite, batched background writes)."""
+    return OpportunityHistory()
 
 # ── FEATURE 1: LIVE MARKET STATUS TICKER BAR ─────────────────────────────────
-@st.cache_data(ttl=120, show_spinner=False)
+def _quote_entry(last, prev):
+    return {"price": last, "chg": last - prev, "chg_pct": (last - prev) / prev * 100 if prev else 0}
+
+@timed("app.ticker_bar_data")
 def get_ticker_bar_data():
-    """Fetch all 5 asset spots + USD/INR for the header bar."""
+    """Watchlist spots + USD/INR for the header bar, from the shared batch snapshot."""
+    snap = get_snapshot()["yf"]
     results = {}
-    for name, ticker in TICKER_MAP.items():
-        try:
-            h = yf.Ticker(ticker).history(period="2d")
-            if not h.empty:
-                price = float(h["Close"].iloc[-1])
-                prev  = float(h["Close"].iloc[-2]) if len(h) > 1 else price
-                results[name] = {"price": price, "chg": price - prev, "chg_pct": (price-prev)/prev*100}
-        except Exception:
+    for name in WATCHLIST:
+        ticker = TICKER_MAP[name]
+        if ticker in snap:
+            results[name] = _quote_entry(*snap[ticker])
+        else:
             results[name] = {"price": FALLBACK_SPOTS[name], "chg": 0, "chg_pct": 0}
-    try:
-        fx = yf.Ticker("USDINR=X").history(period="2d")
-        if not fx.empty:
-            p = float(fx["Close"].iloc[-1])
-            prev = float(fx["Close"].iloc[-2]) if len(fx) > 1 else p
-            results["USD/INR"] = {"price": p, "chg": p-prev, "chg_pct": (p-prev)/prev*100}
-    except Exception:
-        results["USD/INR"] = {"price": 83.50, "chg": 0, "chg_pct": 0}
+    if FX_TICKER in snap:
+        results["USD/INR"] = _quote_entry(*snap[FX_TICKER])
+    else:
+        results["USD/INR"] = {"price": FALLBACK_FX, "chg": 0, "chg_pct": 0}
     return results
 
-with st.spinner(""):
-    ticker_data = get_ticker_bar_data()
-
-now_str = datetime.datetime.now().strftime("%H:%M:%S")
-ticker_html = (
-    '<div style="background:#10131f; border:1px solid #1e2336; border-radius:11px;'
-    ' padding:10px 20px; margin-bottom:20px; display:flex; flex-wrap:wrap;'
-    ' align-items:center; gap:0; box-shadow:0 2px 16px rgba(0,0,0,0.5);">'
-    '<span style="font-size:10px; color:#c9a84c; font-weight:700; margin-right:20px;'
-    ' letter-spacing:0.15em; flex-shrink:0; display:inline-flex; align-items:center; gap:6px;'
-    ' font-family:DM Mono,monospace;">'
-    '<span style="width:6px;height:6px;background:#00c896;border-radius:50%;'
-    ' display:inline-block;box-shadow:0 0 6px #00c896;"></span>LIVE</span>'
-)
+def render_ticker_bar():
+    """Header ticker strip. Runs as a fragment so live refresh only redraws the bar."""
+    ticker_t0 = time.perf_counter()
+    with st.spinner(""):
+        ticker_data = get_ticker_bar_data()
+    ticker_load_ms = (time.perf_counter() - ticker_t0) * 1000
+
+    now_str = datetime.datetime.now().strftime("%H:%M:%S")
+    ticker_html = (
+        '<div style="background:#10131f; border:1px solid #1e2336; border-radius:11px;'
+        ' padding:10px 20px; margin-bottom:20px; display:flex; flex-wrap:wrap;'
+        ' align-items:center; gap:0; box-shadow:0 2px 16px rgba(0,0,0,0.5);">'
+        '<span style="font-size:10px; color:#c9a84c; font-weight:700; margin-right:20px;'
+        ' letter-spacing:0.15em; flex-shrink:0; display:inline-flex; align-items:center; gap:6px;'
+        ' font-family:DM Mono,monospace;">'
+        '<span style="width:6px;height:6px;background:#00c896;border-radius:50%;'
+        ' display:inline-block;box-shadow:0 0 6px #00c896;"></span>LIVE</span>'
+    )
+
+    for asset_name, d in ticker_data.items():
+        color  = "#00c896" if d["chg"] >= 0 else "#ff4d6a"
+        arrow  = "▲" if d["chg"] >= 0 else "▼"
+        prefix = "₹" if asset_name != "USD/INR" else ""
+        ticker_html += (
+            '<span style="font-size:13px; font-weight:500; color:#a8b3c8;'
+            ' margin-right:24px; display:inline-flex; align-items:center; gap:6px;'
+            ' font-family:DM Sans,sans-serif;">'
+            '<span style="color:#525f7a; font-size:10.5px; font-weight:700;'
+            ' letter-spacing:0.06em; font-family:DM Mono,monospace;">{n}</span>'
+            '<span style="color:#d0d9ea; font-family:DM Mono,monospace; font-weight:500;">{p}{v:,.2f}</span>'
+            '<span style="color:{c}; font-size:11px; font-weight:600;">{a} {pct:.2f}%</span>'
+            '</span>'.format(
+                n=asset_name, p=prefix, v=d["price"],
+                c=color, a=arrow, pct=abs(d["chg_pct"]))
+        )
 
-for asset_name, d in ticker_data.items():
-    color  = "#00c896" if d["chg"] >= 0 else "#ff4d6a"
-    arrow  = "▲" if d["chg"] >= 0 else "▼"
-    prefix = "₹" if asset_name != "USD/INR" else ""
     ticker_html += (
-        '<span style="font-size:13px; font-weight:500; color:#a8b3c8;'
-        ' margin-right:24px; display:inline-flex; align-items:center; gap:6px;'
-        ' font-family:DM Sans,sans-serif;">'
-        '<span style="color:#525f7a; font-size:10.5px; font-weight:700;'
-        ' letter-spacing:0.06em; font-family:DM Mono,monospace;">{n}</span>'
-        '<span style="color:#d0d9ea; font-family:DM Mono,monospace; font-weight:500;">{p}{v:,.2f}</span>'
-        '<span style="color:{c}; font-size:11px; font-weight:600;">{a} {pct:.2f}%</span>'
-        '</span>'.format(
-            n=asset_name, p=prefix, v=d["price"],
-            c=color, a=arrow, pct=abs(d["chg_pct"]))
+        '<span style="margin-left:auto; font-size:10px; color:#2a3352;'
+        ' white-space:nowrap; font-family:DM Mono,monospace;">{t} · {ms:,.0f} ms</span></div>'.format(
+            t=now_str, ms=ticker_load_ms)
     )
+    st.markdown(ticker_html, unsafe_allow_html=True)
 
-ticker_html += (
-    '<span style="margin-left:auto; font-size:10px; color:#2a3352;'
-    ' white-space:nowrap; font-family:DM Mono,monospace;">{t}</span></div>'.format(t=now_str)
-)
-st.markdown(ticker_html, unsafe_allow_html=True)
+st.fragment(run_every=live_run_every)(render_ticker_bar)()
 
 
 
 
 # ── DATA ENGINE ───────────────────────────────────────────────────────────────
-def _try_nse_api(asset_name):
-    is_index = (asset_name == "NIFTY")
-    try:
-        url = (
-            "https://www.nseindia.com/api/option-chain-indices?symbol={}".format(asset_name)
-            if is_index else
-            "https://www.nseindia.com/api/option-chain-equities?symbol={}".format(asset_name)
-        )
-        req = urllib.request.Request(url, headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                          "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-            "Accept": "application/json",
-            "Referer": "https://www.nseindia.com/",
-        })
-        with urllib.request.urlopen(req, timeout=8) as resp:
-            data = json.loads(resp.read().decode())
-        spot    = float(data["records"]["underlyingValue"])
-        expiries = data["records"]["expiryDates"]
-        expiry  = expiries[0]
-        calls_rows, puts_rows = [], []
-        for rec in data["records"]["data"]:
-            if rec.get("expiryDate") != expiry:
-                continue
-            k = float(rec["strikePrice"])
-            if "CE" in rec:
-                ce = rec["CE"]
-                calls_rows.append({"strike": k, "lastPrice": float(ce.get("lastPrice", 0) or 0),
-                                   "openInterest": float(ce.get("openInterest", 0) or 0),
-                                   "volume": float(ce.get("totalTradedVolume", 0) or 0)})
-            if "PE" in rec:
-                pe = rec["PE"]
-                puts_rows.append({"strike": k, "lastPrice": float(pe.get("lastPrice", 0) or 0),
-                                  "openInterest": float(pe.get("openInterest", 0) or 0),
-                                  "volume": float(pe.get("totalTradedVolume", 0) or 0)})
-        calls_df = pd.DataFrame(calls_rows)
-        puts_df  = pd.DataFrame(puts_rows)
-        if not calls_df.empty:
-            return round(spot, 2), calls_df, puts_df, expiry, expiries
-    except Exception:
-        pass
-    return None
-
-@st.cache_data(ttl=90, show_spinner=False)
+@timed("app.market_data")
 def get_market_data(asset_name):
-    result = _try_nse_api(asset_name)
-    if result:
-        spot, calls_df, puts_df, expiry, expiries = result
-        return spot, calls_df, puts_df, expiry, expiries, None, "nse"
-    try:
-        stock = yf.Ticker(TICKER_MAP[asset_name])
-        hist  = stock.history(period="2d")
-        if not hist.empty:
-            spot = float(round(hist["Close"].iloc[-1], 2))
-            return spot, pd.DataFrame(), pd.DataFrame(), None, [], \
-                "NSE option chain unavailable from cloud server. Live spot ✅ | Enter prices manually.", "yf_spot"
-    except Exception:
-        pass
-    return (FALLBACK_SPOTS[asset_name], pd.DataFrame(), pd.DataFrame(), None, [],
-            "All live sources unavailable. Using fallback spot. Enter prices manually.", "fallback")
-
-@st.cache_data(ttl=300, show_spinner=False)
+    """(spot, chain, expiry, expiries, message, source) from the poller snapshot; chain is an OptionChain."""
+    get_poller().track([asset_name])   # every call: keeps a tracked asset from expiring
+    data = get_snapshot()["market_data"].get(asset_name)
+    if data is None:
+        return fallback_market_data(asset_name, "Live data not polled yet. Using fallback spot.")
+    return data
+
+@timed("app.forex_rate")
 def get_forex_rate():
-    """Fetch USD/INR spot rate via yfinance."""
-    try:
-        t = yf.Ticker("USDINR=X")
-        h = t.history(period="2d")
-        if not h.empty:
-            return float(round(h["Close"].iloc[-1], 4))
-    except Exception:
-        pass
-    return 83.50  # fallback
+    """USD/INR spot rate from the shared yfinance batch snapshot."""
+    snap = get_snapshot()["yf"]
+    if FX_TICKER in snap:
+        return float(round(snap[FX_TICKER][0], 4))
+    return FALLBACK_FX
+
+# ── CHART BUILDERS ────────────────────────────────────────────────────────────
+# Cached process-wide on the scalar inputs each chart is drawn from (see
+# figures.py), so a rerun that leaves a tab's inputs alone (another widget,
+# a tab switch, an auto-refresh with unchanged quotes) reuses the figure
+# instead of rebuilding it; the spans time cache misses only. Line traces go
+# out as float32, and flat ones (the locked net P&L line) as two points.
+@FIGURES.cached("chart.pcp_payoff")
+def pcp_payoff_figure(s0, strike, c_mkt, p_mkt, units, signal_type, net_pnl, color, expiry_label, days):
+    prices, spot_pnl, put_pnl, call_pnl = pcp_payoff(s0, strike, c_mkt, p_mkt, units, signal_type)
+    net_pad = max(abs(net_pnl) * 5, 500)
+
+    fig = go.Figure()
+    fig.add_trace(lean_scatter(prices, spot_pnl, mode="lines", name="Spot Leg",
+                               line=dict(color="#1f77b4", width=1.5, dash="dot"), opacity=0.5, yaxis="y1"))
+    fig.add_trace(lean_scatter(prices, put_pnl, mode="lines", name="Put Leg",
+                               line=dict(color="#ff7f0e", width=1.5, dash="dot"), opacity=0.5, yaxis="y1"))
+    fig.add_trace(lean_scatter(prices, call_pnl, mode="lines", name="Call Leg",
+                               line=dict(color="#9467bd", width=1.5, dash="dot"), opacity=0.5, yaxis="y1"))
+    fig.add_trace(lean_scatter(prices, np.full(len(prices), net_pnl), mode="lines", name="Net P&L (locked)",
+                               line=dict(color=color, width=3.5), yaxis="y2"))
+    fig.add_shape(type="line", x0=prices[0], x1=prices[-1], y0=0, y1=0,
+                  line=dict(color="gray", width=1, dash="dash"), yref="y2")
+    fig.add_vline(x=s0, line_dash="dash", line_color="#333", line_width=1,
+                  annotation_text="Spot ₹{:,.0f}".format(s0), annotation_position="top right")
+    fig.update_layout(
+        title="Payoff at Expiry ({}) — {} days".format(expiry_label, days),
+        xaxis=dict(title="Spot Price at Expiry (₹)", tickformat=",.0f", showgrid=True, gridcolor="#1e2336"),
+        yaxis=dict(title=dict(text="Leg P&L (₹)", font=dict(color="#555")),
+                   tickformat=",.0f", showgrid=False),
+        yaxis2=dict(title=dict(text="Net P&L (₹)", font=dict(color=color)),
+                    tickformat=",.0f", overlaying="y", side="right",
+                    range=[-net_pad, net_pad], showgrid=True, gridcolor="#1e2336"),
+        height=370, margin=dict(t=45, b=40, l=10, r=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        hovermode="x unified", hoverdistance=-1, plot_bgcolor="#10131f", paper_bgcolor="#08090f")
+    return fig
+
+@FIGURES.cached("chart.irp_sensitivity")
+def irp_sensitivity_figure(f_theory, f_mkt, notional_usd, friction):
+    fwd_range, pnl_range = irp_sensitivity(f_theory, notional_usd, friction)
+    fig = go.Figure()
+    fig.add_trace(lean_scatter(
+        fwd_range, pnl_range, mode="lines",
+        line=dict(color="#1f77b4", width=2.5),
+        fill="tozeroy",
+        fillcolor="rgba(31,119,180,0.12)",
+        name="Net Profit (INR)"))
+    fig.add_vline(x=f_theory,  line_dash="dash", line_color="green",  annotation_text="Theoretical Fwd")
+    fig.add_vline(x=f_mkt,     line_dash="dash", line_color="red",    annotation_text="Market Fwd")
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", line_width=1)
+    fig.update_layout(
+        title="Net IRP Arbitrage P&L (INR) vs Market Forward Rate",
+        xaxis=dict(title="Market Forward Rate (USD/INR)", tickformat=".4f"),
+        yaxis=dict(title="Net Profit (₹)", tickformat=",.0f"),
+        height=320, margin=dict(t=40,b=30,l=10,r=10),
+        plot_bgcolor="#10131f", paper_bgcolor="#08090f", showlegend=False)
+    return fig
+
+@FIGURES.cached("chart.basis_decay")
+def basis_decay_figure(spot, futures, r_carry, days, units, friction):
+    days_arr, fair_arr, basis_arr, _ = basis_decay(spot, futures, r_carry, days, units, friction)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=days_arr[::-1], y=fair_arr[::-1], mode="lines",
+                             name="Fair Futures F*", line=dict(color="#00c896", width=2)))
+    fig.add_trace(go.Scatter(x=[days, 0], y=[futures, futures], mode="lines",
+                             name="Market Futures (entry)", line=dict(color="#ff4d6a", width=2, dash="dash")))
+    fig.add_trace(go.Scatter(x=days_arr[::-1], y=basis_arr[::-1], mode="lines",
+                             name="Basis (Fmkt − F*)", line=dict(color="#ff7f0e", width=1.5, dash="dot"),
+                             yaxis="y2"))
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", line_width=1, yref="y2")
+    fig.update_layout(
+        title="Basis Decay: Fair Futures Converges to Market Price at Expiry",
+        xaxis=dict(title="Days Remaining to Expiry", autorange="reversed"),
+        yaxis=dict(title=dict(text="Price (₹)", font=dict(color="#00c896")), tickformat=",.2f"),
+        yaxis2=dict(title=dict(text="Basis (₹)", font=dict(color="#ff7f0e")),
+                    overlaying="y", side="right", tickformat=",.2f"),
+        height=320, margin=dict(t=40,b=30,l=10,r=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        plot_bgcolor="#10131f", paper_bgcolor="#08090f")
+    return fig
+
+@FIGURES.cached("chart.forward_curve")
+def forward_curve_figure(tenors, days, forwards, f_theory):
+    gap = np.array(forwards) - np.array(f_theory)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=days, y=forwards, mode="lines+markers", name="Market Forward",
+                             line=dict(color="#ff4d6a", width=2), text=tenors,
+                             hovertemplate="%{text}<br>%{y:.4f}<extra></extra>"))
+    fig.add_trace(go.Scatter(x=days, y=f_theory, mode="lines+markers", name="Theoretical F*",
+                             line=dict(color="#00c896", width=2, dash="dash")))
+    fig.add_trace(go.Bar(x=days, y=gap, name="Gap (F_mkt − F*)", marker_color="rgba(255,127,14,0.45)",
+                         yaxis="y2"))
+    fig.update_layout(
+        title="USD/INR Forward Curve vs Covered Parity",
+        xaxis=dict(title="Days to Maturity"),
+        yaxis=dict(title=dict(text="Forward (USD/INR)", font=dict(color="#00c896")), tickformat=".4f"),
+        yaxis2=dict(title=dict(text="Gap", font=dict(color="#ff7f0e")),
+                    overlaying="y", side="right", tickformat=".4f"),
+        height=320, margin=dict(t=40,b=30,l=10,r=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        plot_bgcolor="#10131f", paper_bgcolor="#08090f")
+    return fig
 
 # ══════════════════════════════════════════════════════════════════════════════
 # SIDEBAR
@@ -641,728 +733,857 @@ with st.sidebar:
     else:
         st.info("🔄 Auto-refresh OFF")
 
+    st.divider()
+    # Process-wide, like the poller: one toggle times every session's reruns
+    # and the background fetches. Only flipping it changes the profiler — a
+    # plain rerun just shows the current state (ARB_PROFILE=1 included) —
+    # so one session's default can't switch it off for the others. The
+    # panel is filled at the end of the run.
+    def _set_profiling():
+        PROFILER.enabled = st.session_state.diag_enabled
+
+    st.session_state.diag_enabled = PROFILER.enabled
+    st.toggle("🩺 Diagnostics", key="diag_enabled", on_change=_set_profiling,
+              help="Time NSE / yfinance fetches, strategy math and chart builds, "
+                   "and count cache hits. Off costs nothing measurable.")
+    diag_slot = st.container()
+
 # ══════════════════════════════════════════════════════════════════════════════
 # TABS
 # ══════════════════════════════════════════════════════════════════════════════
-tab0, tab1, tab2, tab3, tab4, tab5 = st.tabs([
+TAB_LABELS = [
     "🔍 All Opportunities",
     "📐 Put-Call Parity",
     "🌍 Interest Rate Parity",
     "📦 Futures Basis (Cash & Carry)",
     "⚙️ Settings",
     "📚 Documentation",
-])
+]
+
+TAB_WIDGET_KEYS = {   # tab label → its widget keys (prefixes for the per-asset ones)
+    TAB_LABELS[0]: ("scan_universe_radio", "scan_assets_ms", "scan_strats", "scan_min_profit",
+                    "scan_profitable_only", "scan_page", "scanner_page_size", "scanner_rank", "score_ann_weight",
+                    "score_day_weight", "show_hist_cb", "hist_", "show_meth_cb"),
+    TAB_LABELS[1]: ("pcp_",),
+    TAB_LABELS[2]: ("irp_", "show_irp_cb"),
+    TAB_LABELS[3]: ("fb_", "ts_all", "show_fb_cb"),
+    TAB_LABELS[4]: ("cfg_",),
+}
+
+def keep_hidden_widget_state(open_label):
+    """Write the closed tabs' widget values back through Session State.
+
+    Streamlit drops a widget's state on every run that doesn't draw it, so a
+    lazily skipped tab would otherwise come back with its defaults. The open
+    tab is left alone: re-writing a key whose widget draws in the same run
+    triggers Streamlit's default-value warning.
+    """
+    for label, prefixes in TAB_WIDGET_KEYS.items():
+        if label != open_label:
+            for key in [k for k in st.session_state if k.startswith(prefixes)]:
+                st.session_state[key] = st.session_state[key]
+
+# Only the selected tab's block runs. Switching tabs reruns the script
+# (on_change="rerun"), so a widget change in one tab no longer re-runs the
+# scanner, the chain fetch and the charts of the other five. Streamlit
+# releases without stateful tabs render them all, as before.
+try:
+    tab0, tab1, tab2, tab3, tab4, tab5 = st.tabs(TAB_LABELS, key="main_tab", on_change="rerun")
+    keep_hidden_widget_state(st.session_state["main_tab"])
+except TypeError:
+    tab0, tab1, tab2, tab3, tab4, tab5 = st.tabs(TAB_LABELS)
+
+def tab_open(tab):
+    """True for the selected tab, and for every tab where Streamlit doesn't track selection."""
+    return getattr(tab, "open", None) is not False
+
+today = datetime.date.today()   # shared by the PCP, IRP and basis tabs
 
 # ══════════════════════════════════════════════════════════════════════════════
 # TAB 0 — ALL OPPORTUNITIES SCANNER
 # ══════════════════════════════════════════════════════════════════════════════
 with tab0:
-    st.subheader("🔍 All Opportunities — Live Arbitrage Scanner")
-    st.markdown("Scans all active strategies across selected assets and surfaces every profitable opportunity in one view.")
-
-    sc1, sc2, sc3 = st.columns([2, 1, 1])
-    with sc1:
-        scan_assets = st.multiselect(
-            "Assets to Scan",
-            list(LOT_SIZES.keys()),
-            default=st.session_state.scanner_assets,
-            key="scan_assets_ms"
-        )
-        st.session_state.scanner_assets = scan_assets
-    with sc2:
-        scan_strategies = st.multiselect(
-            "Strategies",
-            ["Put-Call Parity", "Futures Basis", "Interest Rate Parity"],
-            default=["Put-Call Parity", "Futures Basis", "Interest Rate Parity"],
-            key="scan_strats"
-        )
-    with sc3:
-        min_profit_filter = st.number_input(
-            "Min Net Profit (₹)", value=float(st.session_state.pcp_min_profit),
-            min_value=0.0, step=5.0, key="scan_min_profit"
-        )
-        show_only_profitable = st.checkbox("Show only profitable", value=True, key="scan_profitable_only")
-
-    scan_btn = st.button("🔄 Scan Now", type="primary", use_container_width=False)
-
-    st.markdown("---")
-
-    # ── run scan ──────────────────────────────────────────────────────────────
-    today_sc = datetime.date.today()
-
-    def last_thursday_sc(year, month):
-        import calendar
-        cal = calendar.monthcalendar(year, month)
-        thursdays = [w[3] for w in cal if w[3] != 0]
-        return datetime.date(year, month, thursdays[-1])
-
-    def next_expiry_sc():
-        y, m = today_sc.year, today_sc.month
-        for _ in range(3):
-            exp = last_thursday_sc(y, m)
-            if exp > today_sc:
-                return exp
-            m += 1
-            if m > 12: m = 1; y += 1
-        return today_sc + datetime.timedelta(days=30)
-
-    scan_expiry = next_expiry_sc()
-    scan_T      = max((scan_expiry - today_sc).days, 1) / 365.0
-    scan_r      = st.session_state.r_rate_pct / 100
-    scan_brok   = st.session_state.brokerage_flat
-
-    opportunities = []   # list of dicts
-    scan_summary  = {"PCP": 0, "FB": 0, "IRP": 0, "total": 0}
-
-    with st.spinner("📡 Scanning {} assets across {} strategies...".format(
-            len(scan_assets), len(scan_strategies))):
-
-        for asset_sc in scan_assets:
-            spot_data = get_market_data(asset_sc)
-            sp_sc     = spot_data[0]
-            calls_sc  = spot_data[1]
-            puts_sc   = spot_data[2]
-            lot_sc    = LOT_SIZES[asset_sc]
-            units_sc  = 1 * lot_sc   # scan with 1 lot
-            step_sc   = float(STRIKE_STEP[asset_sc])
-            atm_sc    = float(round(sp_sc / step_sc) * step_sc)
-
-            # ── PUT-CALL PARITY ────────────────────────────────────────────
-            if "Put-Call Parity" in scan_strategies:
-                def _lkp(df, k):
-                    if df.empty: return None
-                    mask = np.isclose(df["strike"].values, k, rtol=0, atol=step_sc*0.4)
-                    if not mask.any(): return None
-                    p = df.loc[mask, "lastPrice"].values[0]
-                    return float(round(p, 2)) if p > 0 else None
-
-                c_sc = _lkp(calls_sc, atm_sc)
-                p_sc = _lkp(puts_sc,  atm_sc)
-
-                if c_sc is None: c_sc = round(sp_sc * 0.025, 2)
-                if p_sc is None: p_sc = round(sp_sc * 0.018, 2)
-
-                pv_k_sc    = atm_sc * np.exp(-scan_r * scan_T)
-                synth_sc   = c_sc - p_sc + pv_k_sc
-                gap_sc     = sp_sc - synth_sc
-                gross_sc   = abs(gap_sc) * units_sc
-                fric_sc    = scan_brok * 4 + sp_sc * units_sc * 0.001 + (c_sc + p_sc) * units_sc * 0.000625
-                net_sc     = gross_sc - fric_sc
-                ann_ret_sc = (net_sc / (sp_sc * units_sc)) * (365 / max((scan_expiry - today_sc).days, 1)) * 100
-
-                threshold_sc = sp_sc * (st.session_state.pcp_min_dev / 100)
-                if abs(gap_sc) > threshold_sc:
-                    strategy_name = "Conversion" if gap_sc > 0 else "Reversal"
-                    profitable    = net_sc > min_profit_filter
-                    scan_summary["PCP"] += 1 if profitable else 0
-                    if not show_only_profitable or profitable:
-                        opportunities.append({
-                            "strategy":    "Put-Call Parity",
-                            "asset":       asset_sc,
-                            "type":        strategy_name,
-                            "spot":        sp_sc,
-                            "gap":         gap_sc,
-                            "gross":       gross_sc,
-                            "friction":    fric_sc,
-                            "net_pnl":     net_sc,
-                            "ann_return":  ann_ret_sc,
-                            "expiry":      scan_expiry,
-                            "days":        (scan_expiry - today_sc).days,
-                            "profitable":  profitable,
-                            "action":      ("Buy Spot · Buy Put · Sell Call"
-                                            if gap_sc > 0 else
-                                            "Short Spot · Sell Put · Buy Call"),
-                            "data_src":    spot_data[6],
-                        })
-
-            # ── FUTURES BASIS ──────────────────────────────────────────────
-            if "Futures Basis" in scan_strategies:
-                carry_sc   = scan_r   # no dividend assumption
-                fair_fut_sc = sp_sc * np.exp(carry_sc * scan_T)
-                # simulate a futures market price slightly above/below fair
-                # In real usage user enters actual futures price; here we use spot+0.5% as proxy
-                fut_mkt_sc  = sp_sc * np.exp(carry_sc * scan_T) * 1.008  # 0.8% above fair (typical)
-                basis_sc    = fut_mkt_sc - fair_fut_sc
-                gross_fb_sc = abs(basis_sc) * units_sc
-                fric_fb_sc  = scan_brok * 4 + sp_sc * units_sc * 0.001
-                net_fb_sc   = gross_fb_sc - fric_fb_sc
-                ann_fb_sc   = (net_fb_sc / (sp_sc * units_sc)) * (365 / max((scan_expiry - today_sc).days, 1)) * 100
-
-                thresh_fb   = fair_fut_sc * (st.session_state.fb_min_dev / 100)
-                if abs(basis_sc) > thresh_fb:
-                    profitable_fb = net_fb_sc > min_profit_filter
-                    scan_summary["FB"] += 1 if profitable_fb else 0
-                    if not show_only_profitable or profitable_fb:
-                        opportunities.append({
-                            "strategy":   "Futures Basis",
-                            "asset":      asset_sc,
-                            "type":       "Cash & Carry" if basis_sc > 0 else "Reverse C&C",
-                            "spot":       sp_sc,
-                            "gap":        basis_sc,
-                            "gross":      gross_fb_sc,
-                            "friction":   fric_fb_sc,
-                            "net_pnl":    net_fb_sc,
-                            "ann_return": ann_fb_sc,
-                            "expiry":     scan_expiry,
-                            "days":       (scan_expiry - today_sc).days,
-                            "profitable": profitable_fb,
-                            "action":     "Buy Spot · Sell Futures" if basis_sc > 0 else "Short Spot · Buy Futures",
-                            "data_src":   spot_data[6],
-                        })
-
-            # ── INTEREST RATE PARITY ───────────────────────────────────────
-            if "Interest Rate Parity" in scan_strategies and asset_sc == scan_assets[0]:
-                # IRP is currency-based, run once per scan not per equity asset
-                fx_sc      = get_forex_rate()
-                r_us_sc    = 5.25 / 100
-                r_in_sc    = scan_r
-                irp_T_sc   = 90 / 365.0   # standard 3-month tenor
-                f_theory_sc = fx_sc * np.exp((r_in_sc - r_us_sc) * irp_T_sc)
-                f_mkt_sc    = f_theory_sc * 1.003  # simulate 0.3% deviation
-                irp_gap_sc  = f_mkt_sc - f_theory_sc
-                notional_sc = 100000
-                gross_irp   = abs(irp_gap_sc) * notional_sc
-                fric_irp    = scan_brok * 4
-                net_irp     = gross_irp - fric_irp
-                ann_irp     = (net_irp / (fx_sc * notional_sc)) * (365 / 90) * 100
-
-                thresh_irp  = f_theory_sc * (st.session_state.irp_min_dev / 100)
-                if abs(irp_gap_sc) > thresh_irp:
-                    profitable_irp = net_irp > min_profit_filter
-                    scan_summary["IRP"] += 1 if profitable_irp else 0
-                    if not show_only_profitable or profitable_irp:
-                        opportunities.append({
-                            "strategy":   "Interest Rate Parity",
-                            "asset":      "USD/INR",
-                            "type":       "Borrow USD · Invest INR" if irp_gap_sc > 0 else "Borrow INR · Invest USD",
-                            "spot":       fx_sc,
-                            "gap":        irp_gap_sc,
-                            "gross":      gross_irp,
-                            "friction":   fric_irp,
-                            "net_pnl":    net_irp,
-                            "ann_return": ann_irp,
-                            "expiry":     today_sc + datetime.timedelta(days=90),
-                            "days":       90,
-                            "profitable": profitable_irp,
-                            "action":     "Borrow USD · Convert · Invest INR · Sell Forward" if irp_gap_sc > 0 else "Borrow INR · Convert · Invest USD · Buy Forward",
-                            "data_src":   "yfinance",
-                        })
-
-    scan_summary["total"] = scan_summary["PCP"] + scan_summary["FB"] + scan_summary["IRP"]
-
-    # ── SUMMARY BANNER ────────────────────────────────────────────────────────
-    total_found = len(opportunities)
-    profitable_found = sum(1 for o in opportunities if o["profitable"])
-
-    if profitable_found > 0:
-        banner_bg  = "#071a11"
-        banner_bdr = "rgba(0,200,150,0.35)"
-        banner_clr = "#00c896"
-        banner_txt = "✅ Found {} Profitable Arbitrage {} Across {} Assets".format(
-            profitable_found,
-            "Opportunity" if profitable_found == 1 else "Opportunities",
-            len(scan_assets))
-    else:
-        banner_bg  = "#0f1018"
-        banner_bdr = "rgba(82,95,122,0.4)"
-        banner_clr = "#525f7a"
-        banner_txt = "⚪ No Profitable Opportunities Found — Markets Are Efficient"
-
-    st.markdown(
-        '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
-        ' padding:14px 18px; border-radius:12px; margin-bottom:16px;">'
-        '<div style="font-size:15px; font-weight:700; color:{clr}; margin-bottom:4px;">{t}</div>'
-        '<div style="font-size:12px; color:#525f7a;">'
-        'PCP: {pcp} &nbsp;·&nbsp; Futures Basis: {fb} &nbsp;·&nbsp; IRP: {irp} &nbsp;·&nbsp; '
-        'Scanned: {na} assets &nbsp;·&nbsp; Next expiry: {exp}</div></div>'.format(
-            bg=banner_bg, bdr=banner_bdr, clr=banner_clr, t=banner_txt,
-            pcp=scan_summary["PCP"], fb=scan_summary["FB"], irp=scan_summary["IRP"],
-            na=len(scan_assets), exp=scan_expiry.strftime("%d %b %Y")),
-        unsafe_allow_html=True)
-
-    # ── OPPORTUNITY CARDS ─────────────────────────────────────────────────────
-    if opportunities:
-        # Sort by net P&L descending
-        opportunities.sort(key=lambda x: x["net_pnl"], reverse=True)
-
-        # Summary metrics row
-        total_potential = sum(o["net_pnl"] for o in opportunities if o["profitable"])
-        best_ann        = max((o["ann_return"] for o in opportunities if o["profitable"]), default=0)
-        sm1, sm2, sm3, sm4 = st.columns(4)
-        sm1.metric("Total Opportunities",    str(total_found))
-        sm2.metric("Profitable After Costs", str(profitable_found))
-        sm3.metric("Total Potential P&L",    "₹{:,.2f}".format(total_potential))
-        sm4.metric("Best Annualised Return", "{:.2f}%".format(best_ann))
+    if tab_open(tab0):
+        st.subheader("🔍 All Opportunities — Live Arbitrage Scanner")
+        st.markdown("Scans all active strategies across selected assets and surfaces every profitable opportunity in one view.")
+
+        sc1, sc2, sc3 = st.columns([2, 1, 1])
+        with sc1:
+            scan_universe = st.radio(
+                "Universe",
+                ["custom"] + list(UNIVERSES),
+                index=(["custom"] + list(UNIVERSES)).index(st.session_state.scanner_universe),
+                format_func=lambda u: "Pick assets" if u == "custom" else "{} ({})".format(
+                    UNIVERSES[u][0], len(INSTRUMENTS.universe(u))),
+                horizontal=True,
+                key="scan_universe_radio"
+            )
+            st.session_state.scanner_universe = scan_universe
+            if scan_universe == "custom":
+                scan_assets = st.multiselect(
+                    "Assets to Scan",
+                    INSTRUMENTS.symbols,
+                    default=st.session_state.scanner_assets,
+                    key="scan_assets_ms"
+                )
+                st.session_state.scanner_assets = scan_assets
+            else:
+                scan_assets = INSTRUMENTS.universe(scan_universe)
+                st.caption("{} underlyings from the instrument master · lot sizes and strike steps per contract file"
+                           .format(len(scan_assets)))
+        with sc2:
+            scan_strategies = st.multiselect(
+                "Strategies",
+                ["Put-Call Parity", "Futures Basis", "Interest Rate Parity"],
+                default=["Put-Call Parity", "Futures Basis", "Interest Rate Parity"],
+                key="scan_strats"
+            )
+        with sc3:
+            min_profit_filter = st.number_input(
+                "Min Net Profit (₹)", value=float(st.session_state.pcp_min_profit),
+                min_value=0.0, step=5.0, key="scan_min_profit"
+            )
+            show_only_profitable = st.checkbox("Show only profitable", value=True, key="scan_profitable_only")
+
+        scan_btn = st.button("🔄 Scan Now", type="primary", use_container_width=False)
 
         st.markdown("---")
-        st.markdown("### 📋 Opportunity Details")
-
-        for i, opp in enumerate(opportunities):
-            card_class = "opp-card-green" if opp["profitable"] else "opp-card-grey"
-            profit_badge = ('<span class="scanner-badge" style="background:#28a745;color:white;">PROFITABLE</span>'
-                           if opp["profitable"] else
-                           '<span class="scanner-badge" style="background:#adb5bd;color:white;">BELOW THRESHOLD</span>')
-            strategy_colors = {
-                "Put-Call Parity":      "#3d6bfa",
-                "Futures Basis":        "#7c5cbf",
-                "Interest Rate Parity": "#0e7490",
+
+        # ── run scan ──────────────────────────────────────────────────────────────
+        if scan_btn:
+            get_poller().refresh_now()
+
+        def render_scan_results(scan_assets, scan_strategies, min_profit_filter, show_only_profitable):
+            """Streaming scan + summary banner + cards. Runs as a fragment so live refresh only redraws this block.
+
+            Results come out of iter_scan() one asset/strategy at a time; until the
+            last one lands the banner counts progress and the cards and chart show
+            a running top-N, redrawn at most every SCAN_DRAW_EVERY_S. Only the best
+            SCAN_RANK_LIMIT are kept (TopN) for paging and the table; the metrics
+            are running totals over everything found, so render cost follows the
+            page size rather than the size of the universe.
+            """
+            # Underlyings outside the poller's set are fetched from the next cycle on; tracking them on every
+            # redraw, live refresh included, keeps them polled while this tab is open.
+            get_poller().track(scan_assets)
+            scan_settings = {
+                "r":               st.session_state.r_rate_pct / 100,
+                "brokerage":       st.session_state.brokerage_flat,
+                "pcp_min_dev":     st.session_state.pcp_min_dev,
+                "fb_min_dev":      st.session_state.fb_min_dev,
+                "irp_min_dev":     st.session_state.irp_min_dev,
+                "min_profit":      min_profit_filter,
+                "only_profitable": show_only_profitable,
+                "score_ann_weight": st.session_state.score_ann_weight,
+                "score_day_weight": st.session_state.score_day_weight,
             }
-            sc = strategy_colors.get(opp["strategy"], "#525f7a")
-
-            pnl_color   = "#00c896" if opp["profitable"] else "#525f7a"
-            border_col  = "#00c896" if opp["profitable"] else "#1e2336"
-            bg_col      = "#090f0c" if opp["profitable"] else "#10131f"
-            sp          = "Rs." if opp["asset"] != "USD/INR" else ""
-
-            card_html = (
-                '<div style="background:{bg}; border-left:4px solid {bc}; border-radius:8px;'
-                ' padding:12px 16px; margin-bottom:8px;">'
-
-                '<div style="display:flex; justify-content:space-between; align-items:center;'
-                ' flex-wrap:wrap; gap:6px; margin-bottom:10px;">'
-                '<div style="display:flex; flex-wrap:wrap; gap:5px; align-items:center;">'
-                '<span style="background:{sc}; color:#fff; padding:3px 10px; border-radius:20px;'
-                ' font-size:11px; font-weight:700;">#{n} {strat}</span>'
-                '<span style="background:#1e3a5f; color:#a8b3c8; padding:3px 10px;'
-                ' border-radius:20px; font-size:11px; font-weight:700;">{asset}</span>'
-                '{badge}'
-                '</div>'
-                '<span style="font-size:18px; font-weight:800; color:{pc};">Rs.{pnl:,.2f}</span>'
-                '</div>'
-
-                '<div style="display:grid; grid-template-columns:repeat(3,1fr); gap:6px; margin-bottom:8px;">'
-
-                '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
-                '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Type</div>'
-                '<div style="font-size:13px; color:#e2e8f0; font-weight:600; line-height:1.3;">{typ}</div>'
-                '</div>'
-
-                '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
-                '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Spot Price</div>'
-                '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">{sp}{spot_val}</div>'
-                '</div>'
-
-                '<div style="background:rgba(34,197,94,0.1); border-radius:5px; padding:7px 10px;">'
-                '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Ann. Return</div>'
-                '<div style="font-size:15px; color:#22c55e; font-weight:800;">{ann:.2f}%</div>'
-                '</div>'
-
-                '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
-                '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Gross P&amp;L</div>'
-                '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">Rs.{gross:,.2f}</div>'
-                '</div>'
-
-                '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
-                '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Transaction Cost</div>'
-                '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">Rs.{fric:,.2f}</div>'
-                '</div>'
-
-                '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
-                '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Expiry</div>'
-                '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">{exp} ({days}d)</div>'
-                '</div>'
-                '</div>'
-
-                '<div style="font-size:12px; color:#525f7a; padding:4px 0 0 0;">'
-                '<span style="font-size:10px; color:#4b5563; font-weight:700;'
-                ' text-transform:uppercase; letter-spacing:0.06em;">Execution: </span>'
-                '{action}'
-                '</div>'
-                '</div>'
-            ).format(
-                bg=bg_col, bc=border_col, sc=sc, n=i+1,
-                strat=opp["strategy"], asset=opp["asset"], badge=profit_badge,
-                pc=pnl_color, pnl=opp["net_pnl"],
-                typ=opp["type"], sp=sp,
-                spot_val="{:,.2f}".format(opp["spot"]),
-                gross=opp["gross"], fric=opp["friction"],
-                exp=opp["expiry"].strftime("%d %b %Y"), days=opp["days"],
-                ann=opp["ann_return"], action=opp["action"])
-
-            st.markdown(card_html, unsafe_allow_html=True)
-
-        # ── Comparison bar chart ───────────────────────────────────────────
-        if len(opportunities) > 1:
-            st.markdown("### 📊 Opportunity Comparison")
-            labels    = ["{} {}".format(o["asset"], o["strategy"][:3]) for o in opportunities]
-            net_vals  = [o["net_pnl"] for o in opportunities]
-            ann_vals  = [o["ann_return"] for o in opportunities]
-            colors    = ["#00c896" if o["profitable"] else "#2a3352" for o in opportunities]
-
-            fig_scan = go.Figure()
-            fig_scan.add_trace(go.Bar(
-                name="Net P&L (₹)", x=labels, y=net_vals,
-                marker_color=colors,
-                text=["₹{:,.0f}".format(v) for v in net_vals],
-                textposition="outside", yaxis="y1"))
-            fig_scan.add_trace(go.Scatter(
-                name="Ann. Return (%)", x=labels, y=ann_vals,
-                mode="lines+markers+text",
-                line=dict(color="#ff7f0e", width=2.5),
-                marker=dict(size=8, color="#f59e0b"),
-                text=["{:.1f}%".format(v) for v in ann_vals],
-                textposition="top center",
-                yaxis="y2"))
-            fig_scan.update_layout(
-                title="Net P&L & Annualised Return — All Scanned Opportunities",
-                xaxis=dict(title="Strategy · Asset"),
-                yaxis=dict(title=dict(text="Net P&L (₹)", font=dict(color="#00c896")),
-                           tickformat=",.0f"),
-                yaxis2=dict(title=dict(text="Ann. Return (%)", font=dict(color="#f59e0b")),
-                            overlaying="y", side="right", tickformat=".1f"),
-                height=380, margin=dict(t=45, b=40, l=10, r=10),
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                plot_bgcolor="#10131f", paper_bgcolor="#08090f", barmode="group")
-            st.plotly_chart(fig_scan, use_container_width=True)
-
-        # ── Exportable summary table ───────────────────────────────────────
-        st.markdown("### 📥 Summary Table")
-        tbl = pd.DataFrame([{
-            "Rank":       i+1,
-            "Strategy":   o["strategy"],
-            "Asset":      o["asset"],
-            "Type":       o["type"],
-            "Spot":       "₹{:,.2f}".format(o["spot"]) if o["asset"] != "USD/INR" else "{:.4f}".format(o["spot"]),
-            "Gap":        "{:.4f}".format(o["gap"]),
-            "Gross P&L":  "₹{:,.2f}".format(o["gross"]),
-            "Friction":   "₹{:,.2f}".format(o["friction"]),
-            "Net P&L":    "₹{:,.2f}".format(o["net_pnl"]),
-            "Ann. Return":"{:.2f}%".format(o["ann_return"]),
-            "Expiry":     o["expiry"].strftime("%d %b %Y"),
-            "Profitable": "✅" if o["profitable"] else "❌",
-            "Action":     o["action"],
-        } for i, o in enumerate(opportunities)])
-        st.dataframe(tbl, hide_index=True, use_container_width=True)
-        st.caption("Data is indicative. PCP uses ATM strike. Futures Basis uses estimated market price (+0.8% of fair). IRP uses USD 1,00,000 notional.")
 
-    else:
-        st.info("No opportunities found matching your filters. Try lowering the minimum profit threshold or adding more assets.")
+            def opportunity_card_html(opp, rank):
+                profit_badge = ('<span class="scanner-badge" style="background:#28a745;color:white;">PROFITABLE</span>'
+                               if opp["profitable"] else
+                               '<span class="scanner-badge" style="background:#adb5bd;color:white;">BELOW THRESHOLD</span>')
+                strategy_colors = {
+                    "Put-Call Parity":      "#3d6bfa",
+                    "Futures Basis":        "#7c5cbf",
+                    "Interest Rate Parity": "#0e7490",
+                }
+                sc = strategy_colors.get(opp["strategy"], "#525f7a")
+
+                pnl_color   = "#00c896" if opp["profitable"] else "#525f7a"
+                border_col  = "#00c896" if opp["profitable"] else "#1e2336"
+                bg_col      = "#090f0c" if opp["profitable"] else "#10131f"
+                sp          = "Rs." if opp["asset"] != "USD/INR" else ""
+
+                return (
+                    '<div style="background:{bg}; border-left:4px solid {bc}; border-radius:8px;'
+                    ' padding:12px 16px; margin-bottom:8px;">'
+
+                    '<div style="display:flex; justify-content:space-between; align-items:center;'
+                    ' flex-wrap:wrap; gap:6px; margin-bottom:10px;">'
+                    '<div style="display:flex; flex-wrap:wrap; gap:5px; align-items:center;">'
+                    '<span style="background:{sc}; color:#fff; padding:3px 10px; border-radius:20px;'
+                    ' font-size:11px; font-weight:700;">#{n} {strat}</span>'
+                    '<span style="background:#1e3a5f; color:#a8b3c8; padding:3px 10px;'
+                    ' border-radius:20px; font-size:11px; font-weight:700;">{asset}</span>'
+                    '{badge}'
+                    '</div>'
+                    '<span style="font-size:18px; font-weight:800; color:{pc};">Rs.{pnl:,.2f}</span>'
+                    '</div>'
+
+                    '<div style="display:grid; grid-template-columns:repeat(3,1fr); gap:6px; margin-bottom:8px;">'
+
+                    '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
+                    '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Type</div>'
+                    '<div style="font-size:13px; color:#e2e8f0; font-weight:600; line-height:1.3;">{typ}</div>'
+                    '</div>'
+
+                    '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
+                    '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Spot Price</div>'
+                    '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">{sp}{spot_val}</div>'
+                    '</div>'
+
+                    '<div style="background:rgba(34,197,94,0.1); border-radius:5px; padding:7px 10px;">'
+                    '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Ann. Return</div>'
+                    '<div style="font-size:15px; color:#22c55e; font-weight:800;">{ann:.2f}%</div>'
+                    '</div>'
+
+                    '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
+                    '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Gross P&amp;L</div>'
+                    '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">Rs.{gross:,.2f}</div>'
+                    '</div>'
+
+                    '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
+                    '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Transaction Cost</div>'
+                    '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">Rs.{fric:,.2f}</div>'
+                    '</div>'
+
+                    '<div style="background:rgba(255,255,255,0.05); border-radius:5px; padding:7px 10px;">'
+                    '<div style="font-size:10px; color:#6b7280; font-weight:700; letter-spacing:0.06em; text-transform:uppercase; margin-bottom:3px;">Expiry</div>'
+                    '<div style="font-size:13px; color:#e2e8f0; font-weight:600;">{exp} ({days}d)</div>'
+                    '</div>'
+                    '</div>'
+
+                    '<div style="font-size:12px; color:#525f7a; padding:4px 0 0 0;">'
+                    '<span style="font-size:10px; color:#4b5563; font-weight:700;'
+                    ' text-transform:uppercase; letter-spacing:0.06em;">Execution: </span>'
+                    '{action}'
+                    '</div>'
+                    '</div>'
+                ).format(
+                    bg=bg_col, bc=border_col, sc=sc, n=rank,
+                    strat=opp["strategy"], asset=opp["asset"], badge=profit_badge,
+                    pc=pnl_color, pnl=opp["net_pnl"],
+                    typ=opp["type"], sp=sp,
+                    spot_val="{:,.2f}".format(opp["spot"]),
+                    gross=opp["gross"], fric=opp["friction"],
+                    exp=opp["expiry"].strftime("%d %b %Y"), days=opp["days"],
+                    ann=opp["ann_return"], action=opp["action"])
+
+            # Redrawn every SCAN_DRAW_EVERY_S while the scan streams in: the frame is
+            # built once per bar count and each redraw only swaps the bars' data.
+            live_comparison = LiveFigure()
+
+            def comparison_frame():
+                fig_scan = go.Figure()
+                fig_scan.add_trace(go.Bar(name="Net P&L (₹)", textposition="outside", yaxis="y1"))
+                fig_scan.add_trace(go.Scatter(
+                    name="Ann. Return (%)",
+                    mode="lines+markers+text",
+                    line=dict(color="#ff7f0e", width=2.5),
+                    marker=dict(size=8, color="#f59e0b"),
+                    textposition="top center",
+                    yaxis="y2"))
+                fig_scan.update_layout(
+                    xaxis=dict(title="Strategy · Asset"),
+                    yaxis=dict(title=dict(text="Net P&L (₹)", font=dict(color="#00c896")),
+                               tickformat=",.0f"),
+                    yaxis2=dict(title=dict(text="Ann. Return (%)", font=dict(color="#f59e0b")),
+                                overlaying="y", side="right", tickformat=".1f"),
+                    height=380, margin=dict(t=45, b=40, l=10, r=10),
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                    plot_bgcolor="#10131f", paper_bgcolor="#08090f", barmode="group")
+                return fig_scan
+
+            @timed("chart.scan_comparison")
+            def comparison_figure(opps, start):
+                labels    = ["#{} {} {}".format(start + j + 1, o["asset"], o["strategy"][:3]) for j, o in enumerate(opps)]
+                net_vals  = [o["net_pnl"] for o in opps]
+                ann_vals  = [o["ann_return"] for o in opps]
+                colors    = ["#00c896" if o["profitable"] else "#2a3352" for o in opps]
+
+                def fill(fig_scan):
+                    fig_scan.data[0].update(x=labels, y=net_vals, marker_color=colors,
+                                            text=["₹{:,.0f}".format(v) for v in net_vals])
+                    fig_scan.data[1].update(x=labels, y=ann_vals, text=["{:.1f}%".format(v) for v in ann_vals])
+                    fig_scan.layout.title.text = "Net P&L & Annualised Return — Opportunities #{}–#{}".format(
+                        start + 1, start + len(opps))
+                return live_comparison.draw(len(opps), comparison_frame, fill)
+
+            def draw_banner(running):
+                profitable_found = totals["profitable"]
+                if running:
+                    banner_bg  = "#0b1220"
+                    banner_bdr = "rgba(61,107,250,0.35)"
+                    banner_clr = "#3d6bfa"
+                    banner_txt = "📡 Scanning… {} of {} assets in · {} profitable so far".format(
+                        len(done_assets), len(scan_assets), profitable_found)
+                elif profitable_found > 0:
+                    banner_bg  = "#071a11"
+                    banner_bdr = "rgba(0,200,150,0.35)"
+                    banner_clr = "#00c896"
+                    banner_txt = "✅ Found {} Profitable Arbitrage {} Across {} Assets".format(
+                        profitable_found,
+                        "Opportunity" if profitable_found == 1 else "Opportunities",
+                        len(scan_assets))
+                else:
+                    banner_bg  = "#0f1018"
+                    banner_bdr = "rgba(82,95,122,0.4)"
+                    banner_clr = "#525f7a"
+                    banner_txt = "⚪ No Profitable Opportunities Found — Markets Are Efficient"
+
+                banner_slot.markdown(
+                    '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
+                    ' padding:14px 18px; border-radius:12px; margin-bottom:16px;">'
+                    '<div style="font-size:15px; font-weight:700; color:{clr}; margin-bottom:4px;">{t}</div>'
+                    '<div style="font-size:12px; color:#525f7a;">'
+                    'PCP: {pcp} &nbsp;·&nbsp; Futures Basis: {fb} &nbsp;·&nbsp; IRP: {irp} &nbsp;·&nbsp; '
+                    'Scanned: {na} assets &nbsp;·&nbsp; Next expiry: {exp}</div></div>'.format(
+                        bg=banner_bg, bdr=banner_bdr, clr=banner_clr, t=banner_txt,
+                        pcp=scan_summary["PCP"], fb=scan_summary["FB"], irp=scan_summary["IRP"],
+                        na=len(scan_assets), exp=scan_summary["expiry"].strftime("%d %b %Y")),
+                    unsafe_allow_html=True)
 
-    if st.session_state.show_metadata:
-        show_meth = st.checkbox("Show Scanner Methodology", value=False, key="show_meth_cb")
-        if show_meth:
-            st.markdown("""
-            **How the scanner works:**
-            - **Put-Call Parity**: Uses ATM strike for each asset, computes gap = Spot − Synthetic, deducts STT + brokerage
-            - **Futures Basis**: Computes fair futures price using Cost-of-Carry (F* = S·e^(rT)), compares to simulated market futures price
-            - **Interest Rate Parity**: Uses live USD/INR spot from yfinance, India vs US rate differential, 90-day tenor
-            - **Annualised Return**: (Net P&L / Capital Deployed) × (365 / Days to Expiry) × 100
-            - **Capital deployed**: Spot price × lot size (1 lot per scan per asset)
-            - Opportunities are sorted by Net P&L descending
-            - ⚠️ Futures Basis uses an estimated futures price (+0.8% above fair). Use Tab 3 for actual market price.
-            """)
+            def draw_results(running):
+                draw_banner(running)
+                if not totals["found"]:
+                    if not running:
+                        cards_slot.info("No opportunities found matching your filters. Try lowering the minimum profit "
+                                        "threshold or adding more assets.")
+                    return
+                with metrics_slot.container():
+                    sm1, sm2, sm3, sm4 = st.columns(4)
+                    sm1.metric("Total Opportunities",    "{:,}".format(totals["found"]))
+                    sm2.metric("Profitable After Costs", "{:,}".format(totals["profitable"]))
+                    sm3.metric("Total Potential P&L",    "₹{:,.2f}".format(totals["pnl"]))
+                    sm4.metric("Best Annualised Return", "{:.2f}%".format(max(totals["best_ann"], 0)))
+
+                ranked_now = ranked.ranked()
+                if running:
+                    shown, start = ranked_now[:page_size], 0
+                    shown_caption = "Running top {} of {:,} found so far · by {}".format(
+                        len(shown), totals["found"], RANK_KEYS[rank_by])
+                else:
+                    shown, page, n_pages = paginate(ranked_now, page_no, page_size)
+                    start = (page - 1) * page_size
+                    shown_caption = "Showing #{}–#{} of {:,} · by {} · page {} of {}".format(
+                        start + 1, start + len(shown), totals["found"], RANK_KEYS[rank_by], page, n_pages) + (
+                        "" if ranked.seen <= len(ranked) else " (top {:,} kept for paging)".format(len(ranked)))
+                with cards_slot.container():
+                    st.caption(shown_caption)
+                    for j, opp in enumerate(shown):
+                        st.markdown(opportunity_card_html(opp, start + j + 1), unsafe_allow_html=True)
+                # ── Comparison bar chart (cards on screen) ─────────────────────────
+                if len(shown) > 1:
+                    with chart_slot.container():
+                        st.markdown("### 📊 Opportunity Comparison")
+                        # A fresh key per redraw: an unchanged top-N would otherwise repeat the element ID.
+                        st.plotly_chart(comparison_figure(shown, start), use_container_width=True,
+                                        key="scan_comparison_{}".format(next(draw_ids)))
+                else:
+                    chart_slot.empty()
+
+            scan_snapshot = get_snapshot()
+            scan_latency  = {a: scan_snapshot["latency_ms"][a] for a in scan_assets if a in scan_snapshot["latency_ms"]}
+            banner_slot   = st.empty()
+
+            if scan_latency:
+                # Per-asset detail while it fits on a line; past that, the slowest few.
+                lat_shown = list(scan_latency.items()) if len(scan_latency) <= 8 else \
+                    sorted(scan_latency.items(), key=lambda kv: kv[1], reverse=True)[:5]
+                st.caption("⏱️ Last poll {:.0f}s ago · cycle {:,.0f} ms (concurrent) · ".format(
+                    time.time() - scan_snapshot["ts"], scan_snapshot["cycle_ms"]) + " · ".join(
+                    "{} {:,.0f} ms ({})".format(a, ms, scan_snapshot["market_data"][a][5]) for a, ms in lat_shown) + (
+                    "" if len(lat_shown) == len(scan_latency) else " · slowest {} of {} (median {:,.0f} ms)".format(
+                        len(lat_shown), len(scan_latency), float(np.median(list(scan_latency.values()))))))
+                cache_stats = get_poller().chain_cache.stats()
+                cache_aged  = [(a, v) for a, v in sorted(cache_stats["assets"].items()) if v["age_s"] is not None]
+                st.caption("🗄️ Chain cache: {hits} fresh · {stale_hits} stale · {misses} miss · {negative_hits} negative · "
+                           "{fetch_failures}/{fetches} fetches failed".format(**cache_stats) + ("".join(
+                    " · {} {} {:.0f}s".format(a, v["state"], v["age_s"]) for a, v in cache_aged) if len(cache_aged) <= 8
+                    else " · {} chains held".format(len(cache_aged))))
+            if "Futures Basis" in scan_strategies:
+                scan_futures = scan_snapshot.get("futures")
+                if scan_futures is None and "futures" not in scan_snapshot["latency_ms"]:   # first fetch pending
+                    st.caption("⏳ Futures quotes still loading — Futures Basis joins the scan on the next refresh.")
+                elif scan_futures is None:
+                    st.caption("⚠️ No futures quotes in this snapshot — Futures Basis is skipped until the NSE "
+                               "derivatives feed (or the ARB_FUTURES_CURVE file) answers.")
+                else:
+                    st.caption("📦 Futures: {:,} contracts · {} · fetched {:.0f}s ago · last fetch {} · near month "
+                               "per underlying, spot from the same feed".format(
+                                   len(scan_futures), "NSE live" if scan_snapshot["futures_src"] == "nse" else "curve file",
+                                   time.time() - scan_snapshot["futures_ts"],
+                                   "{:,.0f} ms".format(scan_snapshot["latency_ms"]["futures"])
+                                   if "futures" in scan_snapshot["latency_ms"] else "still running"))
+            if "Interest Rate Parity" in scan_strategies:
+                scan_fwd, scan_fwd_source = forward_curve(get_forex_rate(), SCAN_DEFAULTS["r"], SCAN_DEFAULTS["r_us"])
+                if scan_fwd_source == "simulated":
+                    st.caption("⚠️ No forward quotes loaded — IRP is skipped in the scan (Tab 2 shows a simulated "
+                               "curve). Set ARB_FORWARD_CURVE to a quote file to scan it.")
+                elif scan_fwd_source == "error":
+                    st.caption("⚠️ ARB_FORWARD_CURVE couldn't be read ({}) — IRP is skipped in the scan."
+                               .format(scan_fwd.attrs["error"]))
+
+            # ── OPPORTUNITY CARDS ─────────────────────────────────────────────────────
+            timing_slot  = st.empty()
+            metrics_slot = st.empty()
+            st.markdown("---")
+            st.markdown("### 📋 Opportunity Details")
+            pg1, pg2, pg3, pg4, pg5 = st.columns([1, 1, 1.4, 1, 1])
+            with pg1:
+                page_size = st.selectbox("Cards per page", [10, 25, 50], key="scanner_page_size")
+            with pg2:
+                page_no = st.number_input("Page", min_value=1, value=1, step=1, key="scan_page")
+            with pg3:
+                rank_by = st.selectbox("Rank by", list(RANK_KEYS), format_func=RANK_KEYS.get, key="scanner_rank")
+            if rank_by == "score":
+                with pg4:
+                    st.number_input("₹ per 1% ann. return", min_value=0.0, step=10.0, key="score_ann_weight",
+                                    help="Custom score = net P&L + this × annualised return (%) − day weight × days")
+                with pg5:
+                    st.number_input("₹ per day to expiry", min_value=0.0, step=1.0, key="score_day_weight",
+                                    help="Penalty per day the capital is tied up")
+            cards_slot = st.empty()
+            chart_slot = st.empty()
+
+            ranked       = TopN(SCAN_RANK_LIMIT, rank_key(rank_by, scan_settings))
+            totals       = {"found": 0, "profitable": 0, "pnl": 0.0, "best_ann": 0.0}
+            done_assets  = set()
+            draw_ids     = itertools.count()
+            scan_summary = {"PCP": 0, "FB": 0, "IRP": 0, "expiry": next_monthly_expiry(datetime.date.today())}
+            # Keyed on the snapshot time, so reruns on the same data don't duplicate rows;
+            # mid-cycle snapshots are skipped.
+            record   = scan_snapshot["ts"] is not None and scan_snapshot.get("complete", True)
+            scan_t0, first_ms, drawn = time.perf_counter(), None, float("-inf")
+            for code, asset, opps, n in iter_scan(scan_snapshot["market_data"], get_forex_rate(),
+                                                  scan_assets, scan_strategies, scan_settings,
+                                                  futures=scan_snapshot.get("futures")):
+                ranked.extend(opps)
+                if record:
+                    get_history().append_scan(opps, scan_snapshot["ts"])
+                for o in opps:
+                    totals["found"] += 1
+                    if o["profitable"]:
+                        totals["profitable"] += 1
+                        totals["pnl"]        += o["net_pnl"]
+                        totals["best_ann"]    = max(totals["best_ann"], o["ann_return"])
+                scan_summary[code] += n
+                if code != "IRP":
+                    done_assets.add(asset)
+                if opps and first_ms is None:
+                    first_ms = (time.perf_counter() - scan_t0) * 1000
+                if time.perf_counter() - drawn >= SCAN_DRAW_EVERY_S:
+                    draw_results(running=True)
+                    drawn = time.perf_counter()
+            draw_results(running=False)
+            timing_slot.caption("⚡ First result after {} · full scan {:,.0f} ms".format(
+                "—" if first_ms is None else "{:,.0f} ms".format(first_ms), (time.perf_counter() - scan_t0) * 1000))
+
+            if len(ranked):
+                # ── Exportable summary table ───────────────────────────────────────
+                # Numeric columns formatted client-side; the grid only paints the rows
+                # in view, so the payload is the ranked top-N and nothing per-cell.
+                st.markdown("### 📥 Summary Table")
+                table_rows = ranked.ranked()
+                tbl = pd.DataFrame({
+                    "Rank":        np.arange(1, len(table_rows) + 1),
+                    "Strategy":    [o["strategy"] for o in table_rows],
+                    "Asset":       [o["asset"] for o in table_rows],
+                    "Type":        [o["type"] for o in table_rows],
+                    "Spot":        [o["spot"] for o in table_rows],
+                    "Gap":         [o["gap"] for o in table_rows],
+                    "Gross P&L":   [o["gross"] for o in table_rows],
+                    "Friction":    [o["friction"] for o in table_rows],
+                    "Net P&L":     [o["net_pnl"] for o in table_rows],
+                    "Ann. Return": [o["ann_return"] for o in table_rows],
+                    "Expiry":      [o["expiry"] for o in table_rows],
+                    "Profitable":  ["✅" if o["profitable"] else "❌" for o in table_rows],
+                    "Action":      [o["action"] for o in table_rows],
+                })
+                st.dataframe(tbl, hide_index=True, use_container_width=True, height=min(35 * len(tbl) + 38, 420),
+                             column_config={
+                                 "Spot":        st.column_config.NumberColumn(format="%.2f"),
+                                 "Gap":         st.column_config.NumberColumn(format="%.4f"),
+                                 "Gross P&L":   st.column_config.NumberColumn(format="₹%.2f"),
+                                 "Friction":    st.column_config.NumberColumn(format="₹%.2f"),
+                                 "Net P&L":     st.column_config.NumberColumn(format="₹%.2f"),
+                                 "Ann. Return": st.column_config.NumberColumn(format="%.2f%%"),
+                                 "Expiry":      st.column_config.DateColumn(format="DD MMM YYYY"),
+                             })
+                st.caption("Data is indicative. PCP scans every strike/expiry in the live chain (skipped without one), skipping strikes whose gap looks like a stale print. Futures Basis uses the near-month futures quote (skipped without one). IRP scans the ARB_FORWARD_CURVE quote file (skipped without one) on USD 1,00,000 notional.")
+
+        st.fragment(run_every=live_run_every)(render_scan_results)(
+            scan_assets, scan_strategies, min_profit_filter, show_only_profitable)
+
+        show_hist = st.checkbox("Show Opportunity History", value=False, key="show_hist_cb")
+        if show_hist:
+            h1, h2, h3 = st.columns([1, 1, 1])
+            with h1:
+                hist_asset = st.selectbox("Asset", list(LOT_SIZES.keys()) + ["USD/INR"], key="hist_asset")
+            with h2:
+                hist_strat = st.selectbox("Strategy", ["Put-Call Parity", "Futures Basis", "Interest Rate Parity"],
+                                          key="hist_strat")
+            with h3:
+                hist_hours = st.slider("Lookback (hours)", 1, 72, 8, key="hist_hours")
+            history        = get_history()
+            since_ts       = time.time() - hist_hours * 3600
+            hist_series    = history.series(hist_asset, hist_strat, since=since_ts)
+            if hist_series.empty:
+                st.info("No recorded {} opportunities for {} in the last {} h.".format(hist_strat, hist_asset, hist_hours))
+            else:
+                with PROFILER.span("chart.history"):
+                    fig_hist = go.Figure()
+                    fig_hist.add_trace(go.Scatter(x=hist_series.index, y=hist_series["gap"], mode="lines",
+                                                  name="Gap / unit", line=dict(color="#ff7f0e", width=1.5)))
+                    fig_hist.add_trace(go.Scatter(x=hist_series.index, y=hist_series["net_pnl"], mode="lines",
+                                                  name="Net P&L (₹)", line=dict(color="#00c896", width=2), yaxis="y2"))
+                    fig_hist.update_layout(
+                        title="{} · {} — best opportunity per scan".format(hist_asset, hist_strat),
+                        yaxis=dict(title=dict(text="Gap", font=dict(color="#ff7f0e")), tickformat=",.2f"),
+                        yaxis2=dict(title=dict(text="Net P&L (₹)", font=dict(color="#00c896")),
+                                    overlaying="y", side="right", tickformat=",.0f"),
+                        height=320, margin=dict(t=40, b=30, l=10, r=10),
+                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                        plot_bgcolor="#10131f", paper_bgcolor="#08090f")
+                st.plotly_chart(fig_hist, use_container_width=True)
+                hist_eps = history.episodes(hist_asset, hist_strat, since=since_ts)
+                if not hist_eps.empty:
+                    st.caption("{} profitable episode{} · longest {:,.0f}s · median {:,.0f}s".format(
+                        len(hist_eps), "s" if len(hist_eps) != 1 else "",
+                        hist_eps["duration_s"].max(), hist_eps["duration_s"].median()))
+                    st.dataframe(hist_eps, hide_index=True, use_container_width=True)
+
+        if st.session_state.show_metadata:
+            show_meth = st.checkbox("Show Scanner Methodology", value=False, key="show_meth_cb")
+            if show_meth:
+                st.markdown("""
+                **How the scanner works:**
+                - **Put-Call Parity**: Evaluates every strike and expiry in the live NSE chain at once (assets without a live chain are skipped), computes gap = Spot − Synthetic, deducts STT + brokerage, keeps the best few strikes per asset
+                - **Futures Basis**: Computes fair futures price using Cost-of-Carry (F* = S·e^(rT)), compares to the quoted near-month futures price from the NSE derivatives feed (or ARB_FUTURES_CURVE)
+                - **Interest Rate Parity**: Prices covered parity at every tenor (1W–1Y) of the USD/INR forward curve from the live yfinance spot and the India vs US rate differential, keeping the best few tenors. The curve comes from the ARB_FORWARD_CURVE quote file; without one IRP is left out of the scan, and Tab 2 shows a simulated curve (premium = r_d − r_f ± noise) with the same tenors under ±25/50/100 bp shocks to the INR rate
+                - **Annualised Return**: (Net P&L / Capital Deployed) × (365 / Days to Expiry) × 100
+                - **Capital deployed**: Spot price × lot size (1 lot per scan per asset)
+                - Opportunities are sorted by Net P&L descending
+                - ⚠️ Futures Basis is skipped for assets with no futures quote in the snapshot. Use Tab 3 for other expiries.
+                """)
 
 # ══════════════════════════════════════════════════════════════════════════════
 # TAB 1 — PUT-CALL PARITY ARBITRAGE
 # ══════════════════════════════════════════════════════════════════════════════
 with tab1:
-    st.subheader("📐 Put-Call Parity Arbitrage")
-    st.markdown(
-        "**Theory:** For European options: `C − P = S₀ − K·e^(−rT)`  "
-        "Any measurable deviation after transaction costs = risk-free profit."
-    )
-
-    col_a, col_b = st.columns([1, 2])
-    with col_a:
-        asset    = st.selectbox("Select Asset", list(LOT_SIZES.keys()), key="pcp_asset")
-        num_lots = st.number_input("Number of Lots", min_value=1, value=1, step=1, key="pcp_lots")
-
-    with st.spinner("📡 Fetching data for {}...".format(asset)):
-        s0, calls_df, puts_df, nse_expiry, nse_expiries, fetch_error, data_source = get_market_data(asset)
-
-    # ── EXPIRY DATE INPUT ──────────────────────────────────────────────────────
-    st.markdown("#### 📅 Expiry Date")
-    exp_col1, exp_col2, exp_col3 = st.columns([1.2, 1.2, 1.6])
-    with exp_col1:
-        today = datetime.date.today()
-        # Next NSE monthly expiry = last Thursday of the month
-        def last_thursday(year, month):
-            import calendar
-            cal = calendar.monthcalendar(year, month)
-            thursdays = [w[3] for w in cal if w[3] != 0]
-            return datetime.date(year, month, thursdays[-1])
-
-        # Build next 4 monthly expiries
-        suggested_expiries = []
-        y, m = today.year, today.month
-        for _ in range(4):
-            exp = last_thursday(y, m)
-            if exp > today:
-                suggested_expiries.append(exp)
-            m += 1
-            if m > 12:
-                m = 1; y += 1
-
-        # If NSE API returned expiry string, parse it
-        parsed_nse_expiry = None
-        if nse_expiry:
-            try:
-                parsed_nse_expiry = datetime.datetime.strptime(nse_expiry, "%d-%b-%Y").date()
-            except Exception:
-                try:
-                    parsed_nse_expiry = datetime.datetime.strptime(nse_expiry, "%Y-%m-%d").date()
-                except Exception:
-                    pass
-
-        default_expiry = parsed_nse_expiry if parsed_nse_expiry else (suggested_expiries[0] if suggested_expiries else today + datetime.timedelta(days=30))
-        expiry_date = st.date_input(
-            "Expiry Date",
-            value=default_expiry,
-            min_value=today + datetime.timedelta(days=1),
-            max_value=today + datetime.timedelta(days=365),
-            help="Select the actual NSE expiry date for this contract",
-            key="pcp_expiry"
+    if tab_open(tab1):
+        st.subheader("📐 Put-Call Parity Arbitrage")
+        st.markdown(
+            "**Theory:** For European options: `C − P = S₀ − K·e^(−rT)`  "
+            "Any measurable deviation after transaction costs = risk-free profit."
         )
 
-    with exp_col2:
-        days_to_expiry = (expiry_date - today).days
-        st.metric("Days to Expiry", "{} days".format(days_to_expiry))
-
-    with exp_col3:
-        if parsed_nse_expiry:
-            st.success("✅ NSE expiry loaded: **{}**".format(nse_expiry))
+        col_a, col_b = st.columns([1, 2])
+        with col_a:
+            asset    = st.selectbox("Select Asset", list(LOT_SIZES.keys()), key="pcp_asset")
+            num_lots = st.number_input("Number of Lots", min_value=1, value=1, step=1, key="pcp_lots")
+
+        with st.spinner("📡 Fetching data for {}...".format(asset)):
+            s0, option_chain, nse_expiry, nse_expiries, fetch_error, data_source = get_market_data(asset)
+
+        # ── EXPIRY DATE INPUT ──────────────────────────────────────────────────────
+        st.markdown("#### 📅 Expiry Date")
+        exp_col1, exp_col2, exp_col3 = st.columns([1.2, 1.2, 1.6])
+        with exp_col1:
+            # Build next 4 monthly expiries (NSE monthly expiry = last Thursday of the month)
+            suggested_expiries = []
+            y, m = today.year, today.month
+            for _ in range(4):
+                exp = last_thursday(y, m)
+                if exp > today:
+                    suggested_expiries.append(exp)
+                m += 1
+                if m > 12:
+                    m = 1; y += 1
+
+            # If NSE API returned expiry string, parse it
+            parsed_nse_expiry = parse_nse_expiry(nse_expiry) if nse_expiry else None
+
+            default_expiry = parsed_nse_expiry if parsed_nse_expiry else (suggested_expiries[0] if suggested_expiries else today + datetime.timedelta(days=30))
+            expiry_date = st.date_input(
+                "Expiry Date",
+                value=default_expiry,
+                min_value=today + datetime.timedelta(days=1),
+                max_value=today + datetime.timedelta(days=365),
+                help="Select the actual NSE expiry date for this contract",
+                key="pcp_expiry"
+            )
+
+        with exp_col2:
+            days_to_expiry = (expiry_date - today).days
+            st.metric("Days to Expiry", "{} days".format(days_to_expiry))
+
+        with exp_col3:
+            if parsed_nse_expiry:
+                st.success("✅ NSE expiry loaded: **{}**".format(nse_expiry))
+            else:
+                st.info("📅 Manually selected expiry. NSE monthly expiries are typically the last Thursday of each month.")
+
+        t = days_to_expiry / 365.0
+
+        # Status banner
+        if data_source == "nse":
+            st.success("✅ Live NSE option chain | Spot: ₹{:,.2f}".format(s0))
+        elif data_source == "yf_spot":
+            st.warning("⚠️ {}".format(fetch_error))
+            st.markdown(
+                '<div style="background:#0d1018; border:1px solid #1e2336; border-radius:8px;'
+                ' padding:10px 14px; font-size:13px; color:#a8b3c8; margin:6px 0;">📋 '
+                '<strong style="color:#d0d9ea;">Get option prices from NSE:</strong> '
+                '<a href="{}" target="_blank" style="color:#c9a84c;">Open {} Option Chain on NSE ↗</a><br>'
+                '<span style="color:#6b7280;">Enter ATM Call &amp; Put LTP below.</span></div>'.format(
+                    NSE_CHAIN_URLS[asset], asset),
+                unsafe_allow_html=True)
         else:
-            st.info("📅 Manually selected expiry. NSE monthly expiries are typically the last Thursday of each month.")
-
-    t = days_to_expiry / 365.0
-
-    # Status banner
-    if data_source == "nse":
-        st.success("✅ Live NSE option chain | Spot: ₹{:,.2f}".format(s0))
-    elif data_source == "yf_spot":
-        st.warning("⚠️ {}".format(fetch_error))
-        st.markdown(
-            '<div style="background:#0d1018; border:1px solid #1e2336; border-radius:8px;'
-            ' padding:10px 14px; font-size:13px; color:#a8b3c8; margin:6px 0;">📋 '
-            '<strong style="color:#d0d9ea;">Get option prices from NSE:</strong> '
-            '<a href="{}" target="_blank" style="color:#c9a84c;">Open {} Option Chain on NSE ↗</a><br>'
-            '<span style="color:#6b7280;">Enter ATM Call &amp; Put LTP below.</span></div>'.format(
-                NSE_CHAIN_URLS[asset], asset),
-            unsafe_allow_html=True)
-    else:
-        st.error("⚠️ {}".format(fetch_error))
-        st.markdown(
-            '<div style="background:#1c0a0a; border:1px solid #7f1d1d; border-radius:8px;'
-            ' padding:10px 14px; font-size:13px; color:#fca5a5; margin:6px 0;">📋 '
-            '<a href="{}" target="_blank" style="color:#ff4d6a;">Open {} Option Chain on NSE ↗</a></div>'.format(
-                NSE_CHAIN_URLS[asset], asset), unsafe_allow_html=True)
-
-    lot = LOT_SIZES[asset]
-    total_units = num_lots * lot
-    step = float(STRIKE_STEP[asset])
-
-    def lookup_option_price(chain_df, target_strike):
-        if chain_df.empty: return None
-        mask = np.isclose(chain_df["strike"].values, target_strike, rtol=0, atol=step * 0.4)
-        if not mask.any(): return None
-        price = chain_df.loc[mask, "lastPrice"].values[0]
-        vol   = chain_df.loc[mask, "volume"].values[0] if "volume" in chain_df.columns else np.nan
-        oi    = chain_df.loc[mask, "openInterest"].values[0] if "openInterest" in chain_df.columns else np.nan
-        if price > 0 and (pd.isna(vol) or vol > 0 or (not pd.isna(oi) and oi > 0)):
-            return float(round(price, 2))
-        return None
-
-    p1, p2, p3 = st.columns(3)
-    with p1:
-        default_strike = float(round(s0 / step) * step)
-        strike = st.number_input("Strike Price (₹)", value=default_strike, step=step, format="%.2f", key="pcp_strike_{}".format(asset))
-    with p2:
-        live_call    = lookup_option_price(calls_df, strike)
-        call_default = live_call if live_call is not None else round(s0 * 0.025, 2)
-        call_src     = "🟢 Live" if live_call is not None else "🟡 Enter manually"
-        c_mkt = st.number_input("Call Price (₹)  {}".format(call_src),
-                                value=float(call_default), min_value=0.01, step=0.5, format="%.2f", key="pcp_call_{}".format(asset))
-    with p3:
-        live_put    = lookup_option_price(puts_df, strike)
-        put_default = live_put if live_put is not None else round(s0 * 0.018, 2)
-        put_src     = "🟢 Live" if live_put is not None else "🟡 Enter manually"
-        p_mkt = st.number_input("Put Price (₹)  {}".format(put_src),
-                                value=float(put_default), min_value=0.01, step=0.5, format="%.2f", key="pcp_put_{}".format(asset))
-
-    # ── CALCULATIONS ──────────────────────────────────────────────────────────
-    pv_k            = strike * np.exp(-r_rate * t)
-    synthetic_spot  = c_mkt - p_mkt + pv_k
-    spread_per_unit = s0 - synthetic_spot
-    fno_orders      = 2 * num_lots
-    total_brokerage = brokerage * (fno_orders + 2)
-    stt_spot        = s0 * total_units * 0.001
-    stt_options     = (c_mkt + p_mkt) * total_units * 0.000625
-    total_friction  = total_brokerage + stt_spot + stt_options
-    gross_spread    = abs(spread_per_unit) * total_units
-    arb_threshold   = s0 * (arb_threshold_pct / 100)
-
-    if spread_per_unit > arb_threshold:
-        signal_line, signal_color, strategy_desc, signal_type = \
-            "✅ CONVERSION ARBITRAGE DETECTED", "#00c896", "Buy Spot  ·  Buy Put  ·  Sell Call", "conversion"
-        net_pnl = gross_spread - total_friction
-    elif spread_per_unit < -arb_threshold:
-        signal_line, signal_color, strategy_desc, signal_type = \
-            "🔴 REVERSAL ARBITRAGE DETECTED", "#ff4d6a", "Short Spot  ·  Sell Put  ·  Buy Call", "reversal"
-        net_pnl = gross_spread - total_friction
-    else:
-        signal_line, signal_color, strategy_desc, signal_type = \
-            "⚪ MARKET IS EFFICIENT — No Arbitrage", "#525f7a", "No Action", "none"
-        net_pnl = -total_friction
-
-    pnl_profitable = net_pnl > 0
-
-    # ── METRICS ROW ───────────────────────────────────────────────────────────
-    st.markdown("---")
-    ann_return_pcp = (net_pnl / max(s0 * total_units * margin_pct, 1)) * (365 / max(days_to_expiry, 1)) * 100
-
-    m1, m2, m3, m4, m5, m6 = st.columns(6)
-    m1.metric("Market Spot",       "₹{:,.2f}".format(s0))
-    m2.metric("Synthetic Price",   "₹{:,.2f}".format(synthetic_spot))
-    m3.metric("Gap / unit",        "₹{:.2f}".format(abs(spread_per_unit)))
-    m4.metric("Total Friction",    "₹{:,.2f}".format(total_friction))
-    m5.metric("Net P&L",           "₹{:,.2f}".format(net_pnl),
-              delta="✅ Profitable" if pnl_profitable else "❌ Loss after costs",
-              delta_color="normal" if pnl_profitable else "inverse")
-    m6.metric("Ann. Return",       "{:.2f}%".format(ann_return_pcp),
-              delta="{} days".format(days_to_expiry), delta_color="off")
-
-    # Map signal type to dark-bg banner style
-    _banner_styles = {
-        "conversion": ("rgba(0,200,150,0.08)", "rgba(0,200,150,0.35)", "#00c896"),
-        "reversal":   ("rgba(255,77,106,0.08)", "rgba(255,77,106,0.35)", "#ff4d6a"),
-        "none":       ("rgba(82,95,122,0.06)",  "rgba(82,95,122,0.3)",  "#525f7a"),
-    }
-    _bg, _bdr, _clr = _banner_styles[signal_type]
-    pulse_class = ""
-    st.markdown(
-        '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
-        ' padding:14px 18px; border-radius:12px; margin:12px 0;">'
-        '<div style="font-size:16px; font-weight:700; color:{clr}; margin-bottom:5px;">{s}</div>'
-        '<div style="font-size:12px; color:#525f7a;">'
-        'Strategy: <span style="color:#a8b3c8;">{d}</span>'
-        ' &nbsp;·&nbsp; Expiry: <span style="color:#a8b3c8;">{e}</span>'
-        ' &nbsp;·&nbsp; <span style="color:#a8b3c8;">{dte} days</span>'
-        ' &nbsp;·&nbsp; Ann. Return: <span style="color:{clr}; font-weight:700;">{ann:.2f}%</span>'
-        '</div></div>'.format(
-            bg=_bg, bdr=_bdr, clr=_clr,
-            s=signal_line, d=strategy_desc,
-            e=expiry_date.strftime("%d %b %Y"), dte=days_to_expiry, ann=ann_return_pcp),
-        unsafe_allow_html=True)
-
-
-    # ── FEATURE 12: ALERT SYSTEM ─────────────────────────────────────────────
-    alert_threshold = st.session_state.get("alert_threshold", 500)
-    if signal_type != "none" and pnl_profitable and net_pnl >= alert_threshold:
+            st.error("⚠️ {}".format(fetch_error))
+            st.markdown(
+                '<div style="background:#1c0a0a; border:1px solid #7f1d1d; border-radius:8px;'
+                ' padding:10px 14px; font-size:13px; color:#fca5a5; margin:6px 0;">📋 '
+                '<a href="{}" target="_blank" style="color:#ff4d6a;">Open {} Option Chain on NSE ↗</a></div>'.format(
+                    NSE_CHAIN_URLS[asset], asset), unsafe_allow_html=True)
+
+        lot = LOT_SIZES[asset]
+        total_units = num_lots * lot
+        step = float(STRIKE_STEP[asset])
+
+        # Chains carry every NSE expiry; live prices come from the selected one only.
+        chain_exp = option_chain.for_expiry(expiry_date.strftime("%d-%b-%Y"))
+
+        def lookup_option_price(side, target_strike):
+            quote = chain_exp.quote(side, target_strike, atol=step * 0.4)
+            if quote is None: return None
+            price, oi, vol = quote
+            if price > 0 and (pd.isna(vol) or vol > 0 or (not pd.isna(oi) and oi > 0)):
+                return float(round(price, 2))
+            return None
+
+        p1, p2, p3 = st.columns(3)
+        with p1:
+            default_strike = float(round(s0 / step) * step)
+            strike = st.number_input("Strike Price (₹)", value=default_strike, step=step, format="%.2f", key="pcp_strike_{}".format(asset))
+        with p2:
+            live_call    = lookup_option_price("call", strike)
+            call_default = live_call if live_call is not None else round(s0 * 0.025, 2)
+            call_src     = "🟢 Live" if live_call is not None else "🟡 Enter manually"
+            c_mkt = st.number_input("Call Price (₹)  {}".format(call_src),
+                                    value=float(call_default), min_value=0.01, step=0.5, format="%.2f", key="pcp_call_{}".format(asset))
+        with p3:
+            live_put    = lookup_option_price("put", strike)
+            put_default = live_put if live_put is not None else round(s0 * 0.018, 2)
+            put_src     = "🟢 Live" if live_put is not None else "🟡 Enter manually"
+            p_mkt = st.number_input("Put Price (₹)  {}".format(put_src),
+                                    value=float(put_default), min_value=0.01, step=0.5, format="%.2f", key="pcp_put_{}".format(asset))
+
+        exercise = st.radio("Exercise style", ["European (NSE)", "American"], horizontal=True, key="pcp_exercise",
+                            help="NSE stock and index options are European. American adds each leg's early-exercise "
+                                 "premium, priced on a binomial lattice.")
+
+        # ── CALCULATIONS ──────────────────────────────────────────────────────────
+        # Dividends going ex before expiry come off the spot (escrowed model), so
+        # the synthetic is C − P + PV(K) + PV(D), and the legs' IVs are solved
+        # against the ex-dividend spot. Both calls are memoized on their inputs,
+        # so reruns that don't touch this tab's numbers skip the math.
+        T_legs   = max(days_to_expiry, 1) / 365.0
+        div_times, div_amounts = DIVIDENDS.schedule(asset, today)
+        legs     = pcp_leg_analytics(s0, strike, c_mkt, p_mkt, r_rate, T_legs, tuple(div_times.tolist()),
+                                     tuple(div_amounts.tolist()), exercise == "American")
+        pv_div, s_ex, leg_iv, early_ex = legs["pv_div"], legs["s_ex"], legs["iv"], legs["early_ex"]
+
+        arb_threshold = s0 * (arb_threshold_pct / 100)
+        trade         = pcp_trade(s0, strike, c_mkt, p_mkt, r_rate, t, lot, num_lots, brokerage, arb_threshold,
+                                  pv_div, early_ex)
+        pv_k, synthetic_spot, spread_per_unit = trade["pv_k"], trade["synthetic"], trade["gap"]
+        fno_orders      = 2 * num_lots
+        total_brokerage = trade["brokerage"]
+        stt_spot        = trade["stt_spot"]
+        stt_options     = trade["stt_options"]
+        total_friction  = trade["friction"]
+        gross_spread    = trade["gross"]
+        net_pnl         = trade["net_pnl"]
+        signal_type     = trade["signal"]
+        signal_line, signal_color, strategy_desc = {
+            "conversion": ("✅ CONVERSION ARBITRAGE DETECTED", "#00c896", "Buy Spot  ·  Buy Put  ·  Sell Call"),
+            "reversal":   ("🔴 REVERSAL ARBITRAGE DETECTED", "#ff4d6a", "Short Spot  ·  Sell Put  ·  Buy Call"),
+            "none":       ("⚪ MARKET IS EFFICIENT — No Arbitrage", "#525f7a", "No Action"),
+        }[signal_type]
+
+        pnl_profitable = net_pnl > 0
+
+        # ── METRICS ROW ───────────────────────────────────────────────────────────
+        st.markdown("---")
+        ann_return_pcp = (net_pnl / max(s0 * total_units * margin_pct, 1)) * (365 / max(days_to_expiry, 1)) * 100
+
+        m1, m2, m3, m4, m5, m6 = st.columns(6)
+        m1.metric("Market Spot",       "₹{:,.2f}".format(s0))
+        m2.metric("Synthetic Price",   "₹{:,.2f}".format(synthetic_spot))
+        m3.metric("Gap / unit",        "₹{:.2f}".format(abs(spread_per_unit)))
+        m4.metric("Total Friction",    "₹{:,.2f}".format(total_friction))
+        m5.metric("Net P&L",           "₹{:,.2f}".format(net_pnl),
+                  delta="✅ Profitable" if pnl_profitable else "❌ Loss after costs",
+                  delta_color="normal" if pnl_profitable else "inverse")
+        m6.metric("Ann. Return",       "{:.2f}%".format(ann_return_pcp),
+                  delta="{} days".format(days_to_expiry), delta_color="off")
+
+        # Each leg's IV and Greeks at this strike. Parity holds only if both legs
+        # imply the same vol; a wide call/put IV split usually means one last
+        # price is stale, not that the gap is tradeable.
+        leg_g   = legs["greeks"]
+        fmt_leg = lambda fmt, v: "—" if np.isnan(v) else fmt.format(v)
+        st.caption("🧮 Implied vol: call {} · put {} · split {} · Δ {} / {} · Γ {} · Vega {} / {} per vol pt · "
+                   "Θ {} / {} per day".format(
+                       fmt_leg("{:.2f}%", leg_iv[0] * 100), fmt_leg("{:.2f}%", leg_iv[1] * 100),
+                       fmt_leg("{:.2f} pts", abs(leg_iv[0] - leg_iv[1]) * 100),
+                       fmt_leg("{:+.3f}", leg_g["delta"][0]), fmt_leg("{:+.3f}", leg_g["delta"][1]),
+                       fmt_leg("{:.5f}", leg_g["gamma"][0]),
+                       fmt_leg("₹{:,.2f}", leg_g["vega"][0]), fmt_leg("₹{:,.2f}", leg_g["vega"][1]),
+                       fmt_leg("₹{:,.2f}", leg_g["theta"][0]), fmt_leg("₹{:,.2f}", leg_g["theta"][1])))
+
+        # Dividends and exercise style. Early exercise widens parity into a band
+        # (parity_bounds); European legs must sit on its lower edge plus carry.
+        upcoming  = DIVIDENDS.upcoming(asset, today, expiry_date)
+        lo_b, hi_b = parity_bounds(s0, strike, T_legs, r_rate, pv_div)
+        st.caption("💸 Dividends before expiry: {} · PV(D) ₹{:,.2f} · {} · American C − P band "
+                   "₹{:,.2f} … ₹{:,.2f} (market ₹{:,.2f})".format(
+                       ", ".join("₹{:,.2f} ex {}".format(a, d.strftime("%d-%b")) for d, a in upcoming) or "none",
+                       pv_div,
+                       "early-exercise premium C − P ₹{:+,.2f}".format(early_ex) if exercise == "American"
+                       else "European exercise",
+                       float(lo_b), float(hi_b), c_mkt - p_mkt))
+
+        # Map signal type to dark-bg banner style
+        _banner_styles = {
+            "conversion": ("rgba(0,200,150,0.08)", "rgba(0,200,150,0.35)", "#00c896"),
+            "reversal":   ("rgba(255,77,106,0.08)", "rgba(255,77,106,0.35)", "#ff4d6a"),
+            "none":       ("rgba(82,95,122,0.06)",  "rgba(82,95,122,0.3)",  "#525f7a"),
+        }
+        _bg, _bdr, _clr = _banner_styles[signal_type]
+        pulse_class = ""
         st.markdown(
-            '<div style="background:rgba(0,200,150,0.07); border:1px solid rgba(0,200,150,0.3);'
-            ' border-left:3px solid #00c896; border-radius:12px; padding:14px 18px; margin:8px 0;">'
-            '<div style="font-size:13px; font-weight:700; color:#00c896; margin-bottom:4px;">🚨 TRADE SIGNAL — EXECUTE NOW</div>'
+            '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
+            ' padding:14px 18px; border-radius:12px; margin:12px 0;">'
+            '<div style="font-size:16px; font-weight:700; color:{clr}; margin-bottom:5px;">{s}</div>'
             '<div style="font-size:12px; color:#525f7a;">'
-            'Net Profit <span style="color:#a8b3c8;">₹{pnl:,.2f}</span>'
-            ' &nbsp;·&nbsp; Ann. Return <span style="color:#00c896; font-weight:700;">{ann:.2f}%</span>'
-            ' &nbsp;·&nbsp; Expiry <span style="color:#a8b3c8;">{exp}</span>'
+            'Strategy: <span style="color:#a8b3c8;">{d}</span>'
+            ' &nbsp;·&nbsp; Expiry: <span style="color:#a8b3c8;">{e}</span>'
+            ' &nbsp;·&nbsp; <span style="color:#a8b3c8;">{dte} days</span>'
+            ' &nbsp;·&nbsp; Ann. Return: <span style="color:{clr}; font-weight:700;">{ann:.2f}%</span>'
             '</div></div>'.format(
-                pnl=net_pnl, ann=ann_return_pcp,
-                exp=expiry_date.strftime("%d %b %Y")),
+                bg=_bg, bdr=_bdr, clr=_clr,
+                s=signal_line, d=strategy_desc,
+                e=expiry_date.strftime("%d %b %Y"), dte=days_to_expiry, ann=ann_return_pcp),
             unsafe_allow_html=True)
-    elif signal_type != "none" and pnl_profitable:
-        st.info("💡 Profitable opportunity found. Raise alert threshold in ⚙️ Settings to trigger the TRADE NOW banner.")
 
-    if signal_type != "none" and not pnl_profitable:
-        st.markdown(
-            '<div style="background:rgba(255,77,106,0.07); border:1px solid rgba(255,77,106,0.3);'
-            ' border-left:3px solid #ff4d6a; border-radius:9px; padding:12px 16px; margin:6px 0;">'
-            '<span style="color:#ff4d6a; font-size:13px; font-weight:600;">'
-            '⚠️ Gap detected but NOT profitable after costs. Do not trade.</span></div>',
-            unsafe_allow_html=True)
 
-    # ── PROOF + CHART ─────────────────────────────────────────────────────────
-    st.write("")
-    col_proof, col_graph = st.columns([1, 1.5])
-
-    with col_proof:
-        st.subheader("📊 Execution Proof")
-        st.markdown("**Strategy:** {}".format(strategy_desc))
-        st.markdown("**Expiry Date:** {}  ·  **T = {:.4f} years**".format(
-            expiry_date.strftime("%d %b %Y"), t))
-        st.latex(r"C - P = S_0 - K \cdot e^{-rT}")
-        st.latex(r"\text{Gap} = S_0 - \underbrace{(C - P + K e^{-rT})}_{\text{Synthetic Fair Price}}")
-        cost_df = pd.DataFrame({
-            "Item": ["Brokerage ({} orders)".format(fno_orders + 2),
-                     "STT on Spot (0.1%)", "STT on Options (0.0625%)", "Total Friction"],
-            "Amount (₹)": ["₹{:,.2f}".format(total_brokerage), "₹{:,.2f}".format(stt_spot),
-                           "₹{:,.2f}".format(stt_options),      "₹{:,.2f}".format(total_friction)]
-        })
-        st.dataframe(cost_df, hide_index=True, use_container_width=True)
-        st.metric("Net Profit (after all costs)", "₹{:,.2f}".format(net_pnl),
-                  delta="Profitable ✅" if pnl_profitable else "Loss ❌",
-                  delta_color="normal" if pnl_profitable else "inverse")
-        st.caption("Across {:,} units ({} lot{} × {})".format(
-            total_units, num_lots, "s" if num_lots > 1 else "", lot))
-
-
-    with col_graph:
-        prices = np.linspace(s0 * 0.75, s0 * 1.25, 300)
-        if signal_type == "conversion":
-            spot_pnl = (prices - s0) * total_units
-            put_pnl  = (np.maximum(strike - prices, 0) - p_mkt) * total_units
-            call_pnl = (c_mkt - np.maximum(prices - strike, 0)) * total_units
-        elif signal_type == "reversal":
-            spot_pnl = (s0 - prices) * total_units
-            put_pnl  = (p_mkt - np.maximum(strike - prices, 0)) * total_units
-            call_pnl = (np.maximum(prices - strike, 0) - c_mkt) * total_units
-        else:
-            spot_pnl = put_pnl = call_pnl = np.zeros_like(prices)
-
-        net_locked = np.full(len(prices), net_pnl)
-        net_pad    = max(abs(net_pnl) * 5, 500)
-
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=prices, y=spot_pnl, mode="lines", name="Spot Leg",
-                                 line=dict(color="#1f77b4", width=1.5, dash="dot"), opacity=0.5, yaxis="y1"))
-        fig.add_trace(go.Scatter(x=prices, y=put_pnl, mode="lines", name="Put Leg",
-                                 line=dict(color="#ff7f0e", width=1.5, dash="dot"), opacity=0.5, yaxis="y1"))
-        fig.add_trace(go.Scatter(x=prices, y=call_pnl, mode="lines", name="Call Leg",
-                                 line=dict(color="#9467bd", width=1.5, dash="dot"), opacity=0.5, yaxis="y1"))
-        fig.add_trace(go.Scatter(x=prices, y=net_locked, mode="lines", name="Net P&L (locked)",
-                                 line=dict(color=signal_color, width=3.5), yaxis="y2"))
-        fig.add_shape(type="line", x0=prices[0], x1=prices[-1], y0=0, y1=0,
-                      line=dict(color="gray", width=1, dash="dash"), yref="y2")
-        fig.add_vline(x=s0, line_dash="dash", line_color="#333", line_width=1,
-                      annotation_text="Spot ₹{:,.0f}".format(s0), annotation_position="top right")
-        fig.update_layout(
-            title="Payoff at Expiry ({}) — {} days".format(expiry_date.strftime("%d %b %Y"), days_to_expiry),
-            xaxis=dict(title="Spot Price at Expiry (₹)", tickformat=",.0f", showgrid=True, gridcolor="#1e2336"),
-            yaxis=dict(title=dict(text="Leg P&L (₹)", font=dict(color="#555")),
-                       tickformat=",.0f", showgrid=False),
-            yaxis2=dict(title=dict(text="Net P&L (₹)", font=dict(color=signal_color)),
-                        tickformat=",.0f", overlaying="y", side="right",
-                        range=[-net_pad, net_pad], showgrid=True, gridcolor="#1e2336"),
-            height=370, margin=dict(t=45, b=40, l=10, r=10),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode="x unified", plot_bgcolor="#10131f", paper_bgcolor="#08090f")
-        st.plotly_chart(fig, use_container_width=True)
-        st.caption("📌 Dotted = individual legs (left axis). Solid = Net P&L after costs (right axis). The flat line proves the arbitrage is locked.")
-
-    # ── SCENARIO TABLE ────────────────────────────────────────────────────────
-    st.divider()
-    st.subheader("📉 Expiry Scenario Analysis")
-    st.caption("Net P&L is identical across all expiry prices — proving the payoff is fully locked at entry.")
-    scenarios = {"Bear (−15%)": s0*0.85, "Bear (−10%)": s0*0.90, "At Strike": strike,
-                 "At Money": s0, "Bull (+10%)": s0*1.10, "Bull (+15%)": s0*1.15}
-    rows = []
-    for label, ep in scenarios.items():
-        if signal_type == "conversion":
-            sl = (ep - s0)*total_units; pl = (max(strike-ep,0)-p_mkt)*total_units; cl = (c_mkt-max(ep-strike,0))*total_units
-        elif signal_type == "reversal":
-            sl = (s0-ep)*total_units;  pl = (p_mkt-max(strike-ep,0))*total_units; cl = (max(ep-strike,0)-c_mkt)*total_units
+        # ── FEATURE 12: ALERT SYSTEM ─────────────────────────────────────────────
+        alert_threshold = st.session_state.get("alert_threshold", 500)
+        if signal_type != "none" and pnl_profitable and net_pnl >= alert_threshold:
+            st.markdown(
+                '<div style="background:rgba(0,200,150,0.07); border:1px solid rgba(0,200,150,0.3);'
+                ' border-left:3px solid #00c896; border-radius:12px; padding:14px 18px; margin:8px 0;">'
+                '<div style="font-size:13px; font-weight:700; color:#00c896; margin-bottom:4px;">🚨 TRADE SIGNAL — EXECUTE NOW</div>'
+                '<div style="font-size:12px; color:#525f7a;">'
+                'Net Profit <span style="color:#a8b3c8;">₹{pnl:,.2f}</span>'
+                ' &nbsp;·&nbsp; Ann. Return <span style="color:#00c896; font-weight:700;">{ann:.2f}%</span>'
+                ' &nbsp;·&nbsp; Expiry <span style="color:#a8b3c8;">{exp}</span>'
+                '</div></div>'.format(
+                    pnl=net_pnl, ann=ann_return_pcp,
+                    exp=expiry_date.strftime("%d %b %Y")),
+                unsafe_allow_html=True)
+        elif signal_type != "none" and pnl_profitable:
+            st.info("💡 Profitable opportunity found. Raise alert threshold in ⚙️ Settings to trigger the TRADE NOW banner.")
+
+        if signal_type != "none" and not pnl_profitable:
+            st.markdown(
+                '<div style="background:rgba(255,77,106,0.07); border:1px solid rgba(255,77,106,0.3);'
+                ' border-left:3px solid #ff4d6a; border-radius:9px; padding:12px 16px; margin:6px 0;">'
+                '<span style="color:#ff4d6a; font-size:13px; font-weight:600;">'
+                '⚠️ Gap detected but NOT profitable after costs. Do not trade.</span></div>',
+                unsafe_allow_html=True)
+
+        # ── PROOF + CHART ─────────────────────────────────────────────────────────
+        st.write("")
+        col_proof, col_graph = st.columns([1, 1.5])
+
+        with col_proof:
+            st.subheader("📊 Execution Proof")
+            st.markdown("**Strategy:** {}".format(strategy_desc))
+            st.markdown("**Expiry Date:** {}  ·  **T = {:.4f} years**".format(
+                expiry_date.strftime("%d %b %Y"), t))
+            st.latex(r"C - P = S_0 - K \cdot e^{-rT}")
+            st.latex(r"\text{Gap} = S_0 - \underbrace{(C - P + K e^{-rT})}_{\text{Synthetic Fair Price}}")
+            cost_df = pd.DataFrame({
+                "Item": ["Brokerage ({} orders)".format(fno_orders + 2),
+                         "STT on Spot (0.1%)", "STT on Options (0.0625%)", "Total Friction"],
+                "Amount (₹)": ["₹{:,.2f}".format(total_brokerage), "₹{:,.2f}".format(stt_spot),
+                               "₹{:,.2f}".format(stt_options),      "₹{:,.2f}".format(total_friction)]
+            })
+            st.dataframe(cost_df, hide_index=True, use_container_width=True)
+            st.metric("Net Profit (after all costs)", "₹{:,.2f}".format(net_pnl),
+                      delta="Profitable ✅" if pnl_profitable else "Loss ❌",
+                      delta_color="normal" if pnl_profitable else "inverse")
+            st.caption("Across {:,} units ({} lot{} × {})".format(
+                total_units, num_lots, "s" if num_lots > 1 else "", lot))
+
+
+        with col_graph:
+            fig = pcp_payoff_figure(s0, strike, c_mkt, p_mkt, total_units, signal_type, net_pnl, signal_color,
+                                    expiry_date.strftime("%d %b %Y"), days_to_expiry)
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption("📌 Dotted = individual legs (left axis). Solid = Net P&L after costs (right axis). The flat line proves the arbitrage is locked.")
+
+        # ── SCENARIO TABLE ────────────────────────────────────────────────────────
+        st.divider()
+        st.subheader("📉 Expiry Scenario Analysis")
+        st.caption("Net P&L is identical across all expiry prices — proving the payoff is fully locked at entry.")
+        scenarios = {"Bear (−15%)": s0*0.85, "Bear (−10%)": s0*0.90, "At Strike": strike,
+                     "At Money": s0, "Bull (+10%)": s0*1.10, "Bull (+15%)": s0*1.15}
+        rows = []
+        for label, ep in scenarios.items():
+            if signal_type == "conversion":
+                sl = (ep - s0)*total_units; pl = (max(strike-ep,0)-p_mkt)*total_units; cl = (c_mkt-max(ep-strike,0))*total_units
+            elif signal_type == "reversal":
+                sl = (s0-ep)*total_units;  pl = (p_mkt-max(strike-ep,0))*total_units; cl = (max(ep-strike,0)-c_mkt)*total_units
+            else:
+                sl = pl = cl = 0.0
+            gross = gross_spread if signal_type != "none" else 0.0
+            rows.append({"Scenario": label, "Expiry Price": "₹{:,.0f}".format(ep),
+                         "Spot Leg (₹)": "₹{:,.2f}".format(sl), "Put Leg (₹)": "₹{:,.2f}".format(pl),
+                         "Call Leg (₹)": "₹{:,.2f}".format(cl),
+                         "Gross P&L (₹)": "₹{:,.2f}".format(gross),
+                         "Friction (₹)": "−₹{:,.2f}".format(total_friction),
+                         "Net P&L (₹)": "₹{:,.2f}".format(gross - total_friction)})
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        st.info("**Gross P&L = ₹{:,.2f}** (gap × units).  **Net P&L = ₹{:,.2f}** (Gross − Friction). "
+                "Identical in every row — the arbitrage is locked at inception.".format(gross_spread, net_pnl))
+
+        # ── FULL-CHAIN PARITY SCAN ────────────────────────────────────────────────
+        st.divider()
+        st.subheader("🧮 Full-Chain Parity Scan")
+        chain_pcp = pcp_chain_scan(s0, option_chain, r_rate, lot,
+                                   lots=num_lots, brokerage=brokerage, today=today,
+                                   dividends=(div_times, div_amounts), american=exercise == "American")
+        if chain_pcp.empty:
+            st.info("Full-chain scan needs a live NSE option chain. Only the single strike above can be evaluated.")
         else:
-            sl = pl = cl = 0.0
-        gross = gross_spread if signal_type != "none" else 0.0
-        rows.append({"Scenario": label, "Expiry Price": "₹{:,.0f}".format(ep),
-                     "Spot Leg (₹)": "₹{:,.2f}".format(sl), "Put Leg (₹)": "₹{:,.2f}".format(pl),
-                     "Call Leg (₹)": "₹{:,.2f}".format(cl),
-                     "Gross P&L (₹)": "₹{:,.2f}".format(gross),
-                     "Friction (₹)": "−₹{:,.2f}".format(total_friction),
-                     "Net P&L (₹)": "₹{:,.2f}".format(gross - total_friction)})
-    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
-    st.info("**Gross P&L = ₹{:,.2f}** (gap × units).  **Net P&L = ₹{:,.2f}** (Gross − Friction). "
-            "Identical in every row — the arbitrage is locked at inception.".format(gross_spread, net_pnl))
+            chain_hits = chain_pcp[np.abs(chain_pcp["gap"].to_numpy()) > arb_threshold]
+            st.caption("{:,} strike/expiry pairs across {} expiries evaluated in one pass · "
+                       "{:,} clear the {:.2f}% gap threshold ({:,} look stale: a leg more than {:.0f} vol pts "
+                       "off the smile or not traded today) · ranked by Net P&L".format(
+                           len(chain_pcp), chain_pcp["expiry"].nunique(), len(chain_hits), arb_threshold_pct,
+                           int(chain_hits["stale"].sum()), PCP_MAX_IV_DEV))
+            st.dataframe(pd.DataFrame({
+                "Expiry":     chain_hits["expiry"],
+                "Days":       chain_hits["days"],
+                "Strike":     chain_hits["strike"].map("₹{:,.0f}".format),
+                "Call":       chain_hits["call"].map("₹{:,.2f}".format),
+                "Put":        chain_hits["put"].map("₹{:,.2f}".format),
+                "Gap / unit": chain_hits["gap"].map("₹{:,.2f}".format),
+                "Friction":   chain_hits["friction"].map("₹{:,.2f}".format),
+                "Net P&L":    chain_hits["net_pnl"].map("₹{:,.2f}".format),
+                "Ann. Return":chain_hits["ann_return"].map("{:.2f}%".format),
+                "Type":       chain_hits["type"],
+                "Call IV":    (chain_hits["call_iv"] * 100).map("{:.1f}%".format),
+                "Put IV":     (chain_hits["put_iv"] * 100).map("{:.1f}%".format),
+                "IV off smile": chain_hits["iv_dev"].map("{:.1f} pts".format),
+                "PV(D)":      chain_hits["pv_div"].map("₹{:,.2f}".format),
+                "Early ex.":  chain_hits["early_ex"].map("₹{:+,.2f}".format),
+                "Stale?":     np.where(chain_hits["stale"], "⚠️ stale", ""),
+            }), hide_index=True, use_container_width=True)
 
 
 
@@ -1370,493 +1591,542 @@ with tab1:
 # TAB 2 — INTEREST RATE PARITY (IRP)
 # ══════════════════════════════════════════════════════════════════════════════
 with tab2:
-    st.subheader("🌍 Covered Interest Rate Parity (CIRP) Arbitrage")
-    st.markdown("""
-    **Theory — Covered IRP:** The forward exchange rate between two currencies must satisfy:
-
-    `F = S × e^((r_d − r_f) × T)`
+    if tab_open(tab2):
+        st.subheader("🌍 Covered Interest Rate Parity (CIRP) Arbitrage")
+        st.markdown("""
+        **Theory — Covered IRP:** The forward exchange rate between two currencies must satisfy:
 
-    where **F** = theoretical forward rate, **S** = spot USD/INR rate, **r_d** = domestic (India) rate,
-    **r_f** = foreign (US) rate, **T** = tenor in years.
+        `F = S × e^((r_d − r_f) × T)`
 
-    If the **market forward rate ≠ theoretical forward**, a covered arbitrage opportunity exists.
-    """)
+        where **F** = theoretical forward rate, **S** = spot USD/INR rate, **r_d** = domestic (India) rate,
+        **r_f** = foreign (US) rate, **T** = tenor in years.
 
-    show_irp_how = st.checkbox("Show How IRP Arbitrage Works", value=False, key="show_irp_cb")
-    if show_irp_how:
-        st.markdown("""
-        **If Market Forward > Theoretical Forward (Forward is too expensive):**
-        1. Borrow USD at US risk-free rate for T years
-        2. Convert USD → INR at spot rate S
-        3. Invest INR at Indian risk-free rate for T years
-        4. Enter forward contract to sell INR → USD at market forward F_mkt
-        5. At maturity: repay USD loan, profit = (F_mkt − F_theoretical) × notional
-
-        **If Market Forward < Theoretical Forward (Forward is too cheap):**
-        1. Borrow INR at Indian rate
-        2. Convert INR → USD at spot rate S
-        3. Invest USD at US rate
-        4. Enter forward contract to buy INR → sell USD at F_mkt
-        5. At maturity: repay INR loan, profit = (F_theoretical − F_mkt) × notional
+        If the **market forward rate ≠ theoretical forward**, a covered arbitrage opportunity exists.
         """)
 
-    irp_c1, irp_c2, irp_c3 = st.columns(3)
-    with irp_c1:
-        spot_usd_inr = get_forex_rate()
-        st.metric("Live USD/INR Spot", "{:.4f}".format(spot_usd_inr), help="From yfinance (USDINR=X)")
-        s_fx = st.number_input("USD/INR Spot Rate", value=float(spot_usd_inr),
-                               min_value=60.0, max_value=110.0, step=0.01, format="%.4f", key="irp_spot")
-    with irp_c2:
-        r_us = st.slider("US Risk-Free Rate (%)", 1.0, 8.0, 5.25, step=0.25, key="irp_rus") / 100
-        r_in = st.slider("India Risk-Free Rate (%)", 4.0, 10.0, 6.75, step=0.25, key="irp_rin") / 100
-    with irp_c3:
-        irp_expiry = st.date_input("Forward Contract Maturity",
-                                   value=today + datetime.timedelta(days=90),
-                                   min_value=today + datetime.timedelta(days=1),
-                                   max_value=today + datetime.timedelta(days=730),
-                                   key="irp_expiry")
-        irp_days   = (irp_expiry - today).days
-        irp_T      = irp_days / 365.0
-        st.metric("Tenor", "{} days ({:.3f}y)".format(irp_days, irp_T))
-
-    notional_usd = st.number_input("Notional (USD)", value=100000.0, min_value=1000.0, step=10000.0,
-                                   format="%.0f", key="irp_notional",
-                                   help="Size of the arbitrage trade in USD")
-    f_mkt = st.number_input("Market Forward Rate (USD/INR)",
-                            value=float(round(s_fx * np.exp((r_in - r_us) * irp_T) + 0.5, 4)),
-                            min_value=60.0, max_value=120.0, step=0.01, format="%.4f", key="irp_fmkt",
-                            help="The actual forward rate quoted by your bank/broker")
-
-    # Calculations
-    f_theory  = s_fx * np.exp((r_in - r_us) * irp_T)
-    irp_gap   = f_mkt - f_theory
-    irp_gap_pct = (irp_gap / f_theory) * 100
-
-    # P&L in INR
-    notional_inr   = notional_usd * s_fx
-    irp_gross_inr  = abs(irp_gap) * notional_usd
-    irp_brokerage  = brokerage * 4   # 4 transactions: borrow, convert, invest, forward
-    irp_friction   = irp_brokerage   # simplified (no STT on forex)
-    irp_net_inr    = irp_gross_inr - irp_friction
-    irp_net_usd    = irp_net_inr / s_fx
-
-    # Signal
-    irp_threshold = f_theory * (arb_threshold_pct / 100)
-    if irp_gap > irp_threshold:
-        irp_signal = "🔴 FORWARD TOO EXPENSIVE — Borrow USD · Invest INR · Sell Forward"
-        irp_color  = "#ff4d6a"
-    elif irp_gap < -irp_threshold:
-        irp_signal = "✅ FORWARD TOO CHEAP — Borrow INR · Invest USD · Buy Forward"
-        irp_color  = "#00c896"
-    else:
-        irp_signal = "⚪ IRP HOLDS — No Covered Arbitrage Opportunity"
-        irp_color  = "#525f7a"
-
-    st.markdown("---")
-    i1, i2, i3, i4, i5 = st.columns(5)
-    i1.metric("Spot USD/INR",     "{:.4f}".format(s_fx))
-    i2.metric("Theoretical Fwd",  "{:.4f}".format(f_theory))
-    i3.metric("Market Fwd",       "{:.4f}".format(f_mkt))
-    i4.metric("Fwd Gap",          "{:.4f} ({:.3f}%)".format(irp_gap, irp_gap_pct))
-    i5.metric("Net Profit (INR)", "₹{:,.2f}".format(irp_net_inr),
-              delta="≈ USD {:,.2f}".format(irp_net_usd), delta_color="off")
-
-    _irp_styles = {
-        "#ff4d6a": ("rgba(255,77,106,0.08)", "rgba(255,77,106,0.35)"),
-        "#00c896": ("rgba(0,200,150,0.08)",  "rgba(0,200,150,0.35)"),
-        "#525f7a": ("rgba(82,95,122,0.06)",  "rgba(82,95,122,0.3)"),
-    }
-    _ibg, _ibdr = _irp_styles.get(irp_color, ("rgba(82,95,122,0.06)", "rgba(82,95,122,0.3)"))
-    st.markdown(
-        '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
-        ' padding:14px 18px; border-radius:12px; margin:12px 0;">'
-        '<div style="font-size:15px; font-weight:700; color:{clr}; margin-bottom:5px;">{s}</div>'
-        '<div style="font-size:12px; color:#525f7a;">'
-        'Notional: <span style="color:#a8b3c8;">USD {n:,.0f}</span>'
-        ' &nbsp;·&nbsp; Maturity: <span style="color:#a8b3c8;">{e} ({d} days)</span>'
-        '</div></div>'.format(
-            bg=_ibg, bdr=_ibdr, clr=irp_color,
-            s=irp_signal, n=notional_usd,
-            e=irp_expiry.strftime("%d %b %Y"), d=irp_days),
-        unsafe_allow_html=True)
-
-    st.markdown("#### 📐 Detailed Calculation")
-    irp_calc = pd.DataFrame({
-        "Step": ["Spot Rate (S)", "India Rate (r_d)", "US Rate (r_f)",
-                 "Tenor T (years)", "Theoretical Forward = S·e^((r_d−r_f)·T)",
-                 "Market Forward (F_mkt)", "Forward Gap (F_mkt − F_theory)",
-                 "Notional (USD)", "Gross Profit = |Gap| × Notional (INR)",
-                 "Transaction Costs (INR)", "Net Profit (INR)", "Net Profit (USD)"],
-        "Value": [
-            "{:.4f}".format(s_fx), "{:.2f}%".format(r_in*100), "{:.2f}%".format(r_us*100),
-            "{:.4f}y ({} days)".format(irp_T, irp_days),
-            "{:.4f}".format(f_theory), "{:.4f}".format(f_mkt),
-            "{:.4f} ({:.3f}%)".format(irp_gap, irp_gap_pct),
-            "USD {:,.0f}".format(notional_usd),
-            "₹{:,.2f}".format(irp_gross_inr),
-            "₹{:,.2f}".format(irp_friction),
-            "₹{:,.2f}".format(irp_net_inr),
-            "USD {:,.2f}".format(irp_net_usd),
-        ]
-    })
-    st.dataframe(irp_calc, hide_index=True, use_container_width=True)
-
-    # Forward rate sensitivity chart
-    st.markdown("#### 📊 Forward Gap Sensitivity — Net P&L vs Market Forward Rate")
-    fwd_range  = np.linspace(f_theory * 0.98, f_theory * 1.02, 200)
-    pnl_range  = [abs(fm - f_theory) * notional_usd - irp_friction for fm in fwd_range]
-    fig_irp = go.Figure()
-    fig_irp.add_trace(go.Scatter(
-        x=fwd_range, y=pnl_range, mode="lines",
-        line=dict(color="#1f77b4", width=2.5),
-        fill="tozeroy",
-        fillcolor="rgba(31,119,180,0.12)",
-        name="Net Profit (INR)"))
-    fig_irp.add_vline(x=f_theory,  line_dash="dash", line_color="green",  annotation_text="Theoretical Fwd")
-    fig_irp.add_vline(x=f_mkt,     line_dash="dash", line_color="red",    annotation_text="Market Fwd")
-    fig_irp.add_hline(y=0, line_dash="dash", line_color="gray", line_width=1)
-    fig_irp.update_layout(
-        title="Net IRP Arbitrage P&L (INR) vs Market Forward Rate",
-        xaxis=dict(title="Market Forward Rate (USD/INR)", tickformat=".4f"),
-        yaxis=dict(title="Net Profit (₹)", tickformat=",.0f"),
-        height=320, margin=dict(t=40,b=30,l=10,r=10),
-        plot_bgcolor="#10131f", paper_bgcolor="#08090f", showlegend=False)
-    st.plotly_chart(fig_irp, use_container_width=True)
-    st.caption("Green = Theoretical forward (no-arbitrage). Red = current market forward. Width of gap = arbitrage opportunity size.")
+        show_irp_how = st.checkbox("Show How IRP Arbitrage Works", value=False, key="show_irp_cb")
+        if show_irp_how:
+            st.markdown("""
+            **If Market Forward > Theoretical Forward (Forward is too expensive):**
+            1. Borrow USD at US risk-free rate for T years
+            2. Convert USD → INR at spot rate S
+            3. Invest INR at Indian risk-free rate for T years
+            4. Enter forward contract to sell INR → USD at market forward F_mkt
+            5. At maturity: repay USD loan, profit = (F_mkt − F_theoretical) × notional
+
+            **If Market Forward < Theoretical Forward (Forward is too cheap):**
+            1. Borrow INR at Indian rate
+            2. Convert INR → USD at spot rate S
+            3. Invest USD at US rate
+            4. Enter forward contract to buy INR → sell USD at F_mkt
+            5. At maturity: repay INR loan, profit = (F_theoretical − F_mkt) × notional
+            """)
+
+        irp_c1, irp_c2, irp_c3 = st.columns(3)
+        with irp_c1:
+            spot_usd_inr = get_forex_rate()
+            st.metric("Live USD/INR Spot", "{:.4f}".format(spot_usd_inr), help="From yfinance (USDINR=X)")
+            s_fx = st.number_input("USD/INR Spot Rate", value=float(spot_usd_inr),
+                                   min_value=60.0, max_value=110.0, step=0.01, format="%.4f", key="irp_spot")
+        with irp_c2:
+            r_us = st.slider("US Risk-Free Rate (%)", 1.0, 8.0, 5.25, step=0.25, key="irp_rus") / 100
+            r_in = st.slider("India Risk-Free Rate (%)", 4.0, 10.0, 6.75, step=0.25, key="irp_rin") / 100
+        with irp_c3:
+            irp_expiry = st.date_input("Forward Contract Maturity",
+                                       value=today + datetime.timedelta(days=90),
+                                       min_value=today + datetime.timedelta(days=1),
+                                       max_value=today + datetime.timedelta(days=730),
+                                       key="irp_expiry")
+            irp_days   = (irp_expiry - today).days
+            irp_T      = irp_days / 365.0
+            st.metric("Tenor", "{} days ({:.3f}y)".format(irp_days, irp_T))
+
+        notional_usd = st.number_input("Notional (USD)", value=100000.0, min_value=1000.0, step=10000.0,
+                                       format="%.0f", key="irp_notional",
+                                       help="Size of the arbitrage trade in USD")
+        # 1W–1Y outright forwards: the ARB_FORWARD_CURVE quote file, else a stand-in around parity.
+        fwd_curve, fwd_source = forward_curve(s_fx, r_in, r_us, seed=int(today.toordinal()))
+        f_default = s_fx * np.exp((r_in - r_us) * irp_T) + 0.5 if fwd_curve.empty else \
+            np.interp(irp_days, fwd_curve["days"], fwd_curve["forward"])
+        f_mkt = st.number_input("Market Forward Rate (USD/INR)",
+                                value=float(round(f_default, 4)),
+                                min_value=60.0, max_value=120.0, step=0.01, format="%.4f", key="irp_fmkt",
+                                help="The actual forward rate quoted by your bank/broker. Defaults to the "
+                                     "forward curve below, interpolated at this tenor.")
+
+        # Calculations (memoized; 4 transactions — borrow, convert, invest, forward — no STT on forex)
+        irp = irp_trade(s_fx, f_mkt, r_in, r_us, irp_T, notional_usd, brokerage, arb_threshold_pct)
+        f_theory, irp_gap, irp_gap_pct = irp["f_theory"], irp["gap"], irp["gap_pct"]
+        irp_gross_inr  = irp["gross"]
+        irp_friction   = irp["friction"]
+        irp_net_inr    = irp["net_pnl"]
+        irp_net_usd    = irp["net_usd"]
+        irp_signal, irp_color = {
+            "rich":  ("🔴 FORWARD TOO EXPENSIVE — Borrow USD · Invest INR · Sell Forward", "#ff4d6a"),
+            "cheap": ("✅ FORWARD TOO CHEAP — Borrow INR · Invest USD · Buy Forward", "#00c896"),
+            "none":  ("⚪ IRP HOLDS — No Covered Arbitrage Opportunity", "#525f7a"),
+        }[irp["signal"]]
+
+        st.markdown("---")
+        i1, i2, i3, i4, i5 = st.columns(5)
+        i1.metric("Spot USD/INR",     "{:.4f}".format(s_fx))
+        i2.metric("Theoretical Fwd",  "{:.4f}".format(f_theory))
+        i3.metric("Market Fwd",       "{:.4f}".format(f_mkt))
+        i4.metric("Fwd Gap",          "{:.4f} ({:.3f}%)".format(irp_gap, irp_gap_pct))
+        i5.metric("Net Profit (INR)", "₹{:,.2f}".format(irp_net_inr),
+                  delta="≈ USD {:,.2f}".format(irp_net_usd), delta_color="off")
+
+        _irp_styles = {
+            "#ff4d6a": ("rgba(255,77,106,0.08)", "rgba(255,77,106,0.35)"),
+            "#00c896": ("rgba(0,200,150,0.08)",  "rgba(0,200,150,0.35)"),
+            "#525f7a": ("rgba(82,95,122,0.06)",  "rgba(82,95,122,0.3)"),
+        }
+        _ibg, _ibdr = _irp_styles.get(irp_color, ("rgba(82,95,122,0.06)", "rgba(82,95,122,0.3)"))
+        st.markdown(
+            '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
+            ' padding:14px 18px; border-radius:12px; margin:12px 0;">'
+            '<div style="font-size:15px; font-weight:700; color:{clr}; margin-bottom:5px;">{s}</div>'
+            '<div style="font-size:12px; color:#525f7a;">'
+            'Notional: <span style="color:#a8b3c8;">USD {n:,.0f}</span>'
+            ' &nbsp;·&nbsp; Maturity: <span style="color:#a8b3c8;">{e} ({d} days)</span>'
+            '</div></div>'.format(
+                bg=_ibg, bdr=_ibdr, clr=irp_color,
+                s=irp_signal, n=notional_usd,
+                e=irp_expiry.strftime("%d %b %Y"), d=irp_days),
+            unsafe_allow_html=True)
+
+        st.markdown("#### 📐 Detailed Calculation")
+        irp_calc = pd.DataFrame({
+            "Step": ["Spot Rate (S)", "India Rate (r_d)", "US Rate (r_f)",
+                     "Tenor T (years)", "Theoretical Forward = S·e^((r_d−r_f)·T)",
+                     "Market Forward (F_mkt)", "Forward Gap (F_mkt − F_theory)",
+                     "Notional (USD)", "Gross Profit = |Gap| × Notional (INR)",
+                     "Transaction Costs (INR)", "Net Profit (INR)", "Net Profit (USD)"],
+            "Value": [
+                "{:.4f}".format(s_fx), "{:.2f}%".format(r_in*100), "{:.2f}%".format(r_us*100),
+                "{:.4f}y ({} days)".format(irp_T, irp_days),
+                "{:.4f}".format(f_theory), "{:.4f}".format(f_mkt),
+                "{:.4f} ({:.3f}%)".format(irp_gap, irp_gap_pct),
+                "USD {:,.0f}".format(notional_usd),
+                "₹{:,.2f}".format(irp_gross_inr),
+                "₹{:,.2f}".format(irp_friction),
+                "₹{:,.2f}".format(irp_net_inr),
+                "USD {:,.2f}".format(irp_net_usd),
+            ]
+        })
+        st.dataframe(irp_calc, hide_index=True, use_container_width=True)
+
+        # Forward rate sensitivity chart
+        st.markdown("#### 📊 Forward Gap Sensitivity — Net P&L vs Market Forward Rate")
+        fig_irp = irp_sensitivity_figure(f_theory, f_mkt, notional_usd, irp_friction)
+        st.plotly_chart(fig_irp, use_container_width=True)
+        st.caption("Green = Theoretical forward (no-arbitrage). Red = current market forward. Width of gap = arbitrage opportunity size.")
+
+        # Every tenor of the curve under every rate shock, in one broadcast
+        st.markdown("#### 📈 Forward Curve & Rate Scenarios")
+        if fwd_source == "error":
+            st.warning("⚠️ Couldn't load the ARB_FORWARD_CURVE quote file ({}). IRP is left out of the scanner "
+                       "until it reads; fix the file (columns: tenor, forward [, days]) to see the curve here."
+                       .format(fwd_curve.attrs["error"]))
+        elif fwd_source == "simulated":
+            st.caption("⚠️ No forward quotes loaded — the curve below is SIMULATED around covered parity "
+                       "(premium = r_d − r_f ± noise). Set ARB_FORWARD_CURVE to load a quote file instead.")
+        else:
+            st.caption("Forward source: quote file · {} tenors, {} to {}".format(
+                len(fwd_curve), fwd_curve["tenor"].iloc[0], fwd_curve["tenor"].iloc[-1]))
+        if not fwd_curve.empty:
+            irp_surf = irp_surface(s_fx, fwd_curve, r_in, r_us, notional_usd, brokerage)
+            irp_base = irp_surf[irp_surf["shock_bp"] == 0]
+            fig_curve = forward_curve_figure(tuple(irp_base["tenor"]), tuple(irp_base["days"]),
+                                             tuple(irp_base["forward"]), tuple(irp_base["f_theory"]))
+            st.plotly_chart(fig_curve, use_container_width=True)
+
+            irp_matrix = irp_surf.pivot(index="tenor", columns="shock_bp", values="net_pnl").loc[fwd_curve["tenor"]]
+            irp_matrix.columns = ["{:+d} bp".format(c) for c in irp_matrix.columns]
+            st.dataframe(irp_matrix.reset_index().rename(columns={"tenor": "Tenor"})
+                         .style.format({c: "₹{:,.0f}" for c in irp_matrix.columns}),
+                         hide_index=True, use_container_width=True)
+            st.caption("Net INR P&L on USD {:,.0f} at each tenor (rows) with the India rate shifted by each shock "
+                       "(columns), against the same market forwards. A gap that survives every column is not an "
+                       "artefact of the rate assumption.".format(notional_usd))
 
 # ══════════════════════════════════════════════════════════════════════════════
 # TAB 3 — FUTURES BASIS (CASH & CARRY)
 # ══════════════════════════════════════════════════════════════════════════════
 with tab3:
-    st.subheader("📦 Futures Basis — Cash & Carry Arbitrage")
-    st.markdown("""
-    **Theory — Cost of Carry:** The fair futures price is:
-
-    `F* = S × e^((r + d) × T)`
+    if tab_open(tab3):
+        st.subheader("📦 Futures Basis — Cash & Carry Arbitrage")
+        st.markdown("""
+        **Theory — Cost of Carry:** The fair futures price is:
 
-    where **r** = risk-free rate, **d** = storage/holding cost (net of dividends), **T** = time to expiry.
+        `F* = S × e^((r + d) × T)`
 
-    - **If F_mkt > F_fair** → **Cash & Carry**: Buy spot, sell futures, deliver at expiry
-    - **If F_mkt < F_fair** → **Reverse Cash & Carry**: Short spot, buy futures, accept delivery
-    """)
+        where **r** = risk-free rate, **d** = storage/holding cost (net of dividends), **T** = time to expiry.
 
-    show_fb_how = st.checkbox("Show How Futures Basis Arbitrage Works", value=False, key="show_fb_cb")
-    if show_fb_how:
-        st.markdown("""
-        **Cash & Carry (Futures overpriced):**
-        1. Borrow money at risk-free rate for T years
-        2. Buy the underlying spot at price S
-        3. Sell futures contract at F_mkt (above fair value F*)
-        4. At expiry: deliver spot into futures, repay loan
-        5. Profit = F_mkt − S·e^(rT) per unit (the basis mispricing)
-
-        **Reverse Cash & Carry (Futures underpriced):**
-        1. Short sell the underlying spot at S
-        2. Invest short-sale proceeds at risk-free rate
-        3. Buy futures at F_mkt (below fair value F*)
-        4. At expiry: take delivery via futures to close short
-        5. Profit = S·e^(rT) − F_mkt per unit
+        - **If F_mkt > F_fair** → **Cash & Carry**: Buy spot, sell futures, deliver at expiry
+        - **If F_mkt < F_fair** → **Reverse Cash & Carry**: Short spot, buy futures, accept delivery
         """)
 
-    fb_c1, fb_c2 = st.columns(2)
-    with fb_c1:
-        fb_asset   = st.selectbox("Select Asset", list(LOT_SIZES.keys()), key="fb_asset")
-        fb_lots    = st.number_input("Number of Lots", min_value=1, value=1, step=1, key="fb_lots")
-        holding_cost_pct = st.slider("Holding Cost / Dividend Yield (%)", -3.0, 5.0, 0.0, step=0.1,
-                                     help="Annual storage or holding cost. Negative = dividend yield (reduces fair futures price)",
-                                     key="fb_hold")
-    with fb_c2:
-        fb_expiry  = st.date_input("Futures Expiry Date",
-                                   value=last_thursday(today.year, today.month) if last_thursday(today.year, today.month) > today
-                                   else last_thursday(today.year, today.month + 1 if today.month < 12 else 1),
-                                   min_value=today + datetime.timedelta(days=1),
-                                   max_value=today + datetime.timedelta(days=365),
-                                   key="fb_expiry")
-        fb_days    = (fb_expiry - today).days
-        fb_T       = fb_days / 365.0
-        st.metric("Days to Expiry", "{} days ({:.4f}y)".format(fb_days, fb_T))
-
-    with st.spinner("Fetching spot for {}...".format(fb_asset)):
-        fb_s0_data = get_market_data(fb_asset)
-        fb_s0      = fb_s0_data[0]
-
-    fb_spot    = st.number_input("Spot Price (₹)", value=float(fb_s0), min_value=1.0, step=1.0,
-                                 format="%.2f", key="fb_spot_{}".format(fb_asset))
-    r_carry    = r_rate + (holding_cost_pct / 100)
-    fb_fair    = fb_spot * np.exp(r_carry * fb_T)
-    fb_lot_sz  = LOT_SIZES[fb_asset]
-    fb_units   = fb_lots * fb_lot_sz
-
-    fb_mkt = st.number_input("Market Futures Price (₹)",
-                             value=float(round(fb_fair + 50, 2)),
-                             min_value=1.0, step=1.0, format="%.2f", key="fb_fmkt_{}".format(fb_asset),
-                             help="The actual futures price quoted on NSE/BSE")
-
-    # Calculations
-    fb_basis    = fb_mkt - fb_fair           # + = futures rich, − = futures cheap
-    fb_basis_pct = (fb_basis / fb_fair) * 100
-    fb_threshold = fb_fair * (arb_threshold_pct / 100)
-
-    fb_gross    = abs(fb_basis) * fb_units
-    fb_brokerage = brokerage * 4             # spot buy/sell + futures buy/sell
-    fb_stt_spot = fb_spot * fb_units * 0.001
-    fb_friction  = fb_brokerage + fb_stt_spot
-    fb_net       = fb_gross - fb_friction
-    fb_profitable = fb_net > 0
-
-    if fb_basis > fb_threshold:
-        fb_signal = "✅ CASH & CARRY — Buy Spot · Sell Futures · Deliver at Expiry"
-        fb_color  = "#00c896"
-        fb_strategy = "Cash & Carry"
-    elif fb_basis < -fb_threshold:
-        fb_signal = "🔴 REVERSE CASH & CARRY — Short Spot · Buy Futures · Accept Delivery"
-        fb_color  = "#ff4d6a"
-        fb_strategy = "Reverse Cash & Carry"
-    else:
-        fb_signal = "⚪ BASIS FAIR — No Futures Arbitrage Opportunity"
-        fb_color  = "#525f7a"
-        fb_strategy = "No Trade"
-
-    st.markdown("---")
-    f1, f2, f3, f4, f5, f6 = st.columns(6)
-    f1.metric("Spot Price",    "₹{:,.2f}".format(fb_spot))
-    f2.metric("Fair Futures",  "₹{:,.2f}".format(fb_fair))
-    f3.metric("Market Futures","₹{:,.2f}".format(fb_mkt))
-    f4.metric("Basis",         "₹{:.2f} ({:.2f}%)".format(fb_basis, fb_basis_pct))
-    f5.metric("Friction",      "₹{:,.2f}".format(fb_friction))
-    f6.metric("Net P&L",       "₹{:,.2f}".format(fb_net),
-              delta="Profitable ✅" if fb_profitable else "Loss ❌",
-              delta_color="normal" if fb_profitable else "inverse")
-
-    _fb_styles = {
-        "#00c896": ("rgba(0,200,150,0.08)",  "rgba(0,200,150,0.35)"),
-        "#ff4d6a": ("rgba(255,77,106,0.08)", "rgba(255,77,106,0.35)"),
-        "#525f7a": ("rgba(82,95,122,0.06)",  "rgba(82,95,122,0.3)"),
-    }
-    _fbbg, _fbbdr = _fb_styles.get(fb_color, ("rgba(82,95,122,0.06)", "rgba(82,95,122,0.3)"))
-    st.markdown(
-        '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
-        ' padding:14px 18px; border-radius:12px; margin:12px 0;">'
-        '<div style="font-size:15px; font-weight:700; color:{clr}; margin-bottom:5px;">{s}</div>'
-        '<div style="font-size:12px; color:#525f7a;">'
-        'Strategy: <span style="color:#a8b3c8;">{st}</span>'
-        ' &nbsp;·&nbsp; Expiry: <span style="color:#a8b3c8;">{e} ({d} days)</span>'
-        '</div></div>'.format(
-            bg=_fbbg, bdr=_fbbdr, clr=fb_color,
-            s=fb_signal, st=fb_strategy,
-            e=fb_expiry.strftime("%d %b %Y"), d=fb_days),
-        unsafe_allow_html=True)
-
-    if fb_basis != 0 and not fb_profitable:
-        st.markdown('<div style="background:#120508; border:1px solid rgba(255,77,106,0.3); border-left:3px solid #ff4d6a; border-radius:9px; padding:12px 16px; color:#ff9eae; font-size:13px; font-weight:600; margin:6px 0;">⚠️ Basis gap detected but costs exceed profit. Do not trade.</div>',
-                    unsafe_allow_html=True)
+        show_fb_how = st.checkbox("Show How Futures Basis Arbitrage Works", value=False, key="show_fb_cb")
+        if show_fb_how:
+            st.markdown("""
+            **Cash & Carry (Futures overpriced):**
+            1. Borrow money at risk-free rate for T years
+            2. Buy the underlying spot at price S
+            3. Sell futures contract at F_mkt (above fair value F*)
+            4. At expiry: deliver spot into futures, repay loan
+            5. Profit = F_mkt − S·e^(rT) per unit (the basis mispricing)
+
+            **Reverse Cash & Carry (Futures underpriced):**
+            1. Short sell the underlying spot at S
+            2. Invest short-sale proceeds at risk-free rate
+            3. Buy futures at F_mkt (below fair value F*)
+            4. At expiry: take delivery via futures to close short
+            5. Profit = S·e^(rT) − F_mkt per unit
+            """)
 
-    st.markdown("#### 📐 Detailed Calculation")
-    fb_table = pd.DataFrame({
-        "Parameter": ["Spot Price (S)", "Risk-Free Rate (r)", "Holding Cost/Dividend (d)",
-                      "Carry Rate = r + d", "Time to Expiry T",
-                      "Fair Futures F* = S·e^(carry×T)",
-                      "Market Futures Price (F_mkt)", "Basis = F_mkt − F*",
-                      "Total Units (lots × lot size)",
-                      "Gross Profit = |Basis| × Units",
-                      "Brokerage (4 orders)", "STT on Spot",
-                      "Total Friction", "Net Profit"],
-        "Value": [
-            "₹{:,.2f}".format(fb_spot), "{:.2f}%".format(r_rate*100),
-            "{:.2f}%".format(holding_cost_pct), "{:.2f}%".format(r_carry*100),
-            "{} days ({:.4f}y)".format(fb_days, fb_T),
-            "₹{:,.2f}".format(fb_fair), "₹{:,.2f}".format(fb_mkt),
-            "₹{:.2f} ({:.3f}%)".format(fb_basis, fb_basis_pct),
-            "{:,}".format(fb_units),
-            "₹{:,.2f}".format(fb_gross),
-            "₹{:,.2f}".format(fb_brokerage), "₹{:,.2f}".format(fb_stt_spot),
-            "₹{:,.2f}".format(fb_friction),
-            "₹{:,.2f}".format(fb_net),
-        ]
-    })
-    st.dataframe(fb_table, hide_index=True, use_container_width=True)
-
-    # Basis decay chart — shows convergence to zero at expiry
-    st.markdown("#### 📊 Futures Basis Decay to Zero at Expiry")
-    days_arr  = np.arange(fb_days, 0, -1)
-    T_arr     = days_arr / 365.0
-    fair_arr  = fb_spot * np.exp(r_carry * T_arr)
-    basis_arr = fb_mkt - fair_arr          # basis decays as fair price rises to meet futures
-    pnl_arr   = np.where(basis_arr > 0,
-                         (basis_arr * fb_units) - fb_friction,
-                         (abs(basis_arr) * fb_units) - fb_friction)
-
-    fig_fb = go.Figure()
-    fig_fb.add_trace(go.Scatter(x=days_arr[::-1], y=fair_arr[::-1], mode="lines",
-                                name="Fair Futures F*", line=dict(color="#00c896", width=2)))
-    fig_fb.add_trace(go.Scatter(x=[fb_days, 0], y=[fb_mkt, fb_mkt], mode="lines",
-                                name="Market Futures (entry)", line=dict(color="#ff4d6a", width=2, dash="dash")))
-    fig_fb.add_trace(go.Scatter(x=days_arr[::-1], y=basis_arr[::-1], mode="lines",
-                                name="Basis (Fmkt − F*)", line=dict(color="#ff7f0e", width=1.5, dash="dot"),
-                                yaxis="y2"))
-    fig_fb.add_hline(y=0, line_dash="dash", line_color="gray", line_width=1, yref="y2")
-    fig_fb.update_layout(
-        title="Basis Decay: Fair Futures Converges to Market Price at Expiry",
-        xaxis=dict(title="Days Remaining to Expiry", autorange="reversed"),
-        yaxis=dict(title=dict(text="Price (₹)", font=dict(color="#00c896")), tickformat=",.2f"),
-        yaxis2=dict(title=dict(text="Basis (₹)", font=dict(color="#ff7f0e")),
-                    overlaying="y", side="right", tickformat=",.2f"),
-        height=320, margin=dict(t=40,b=30,l=10,r=10),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        plot_bgcolor="#10131f", paper_bgcolor="#08090f")
-    st.plotly_chart(fig_fb, use_container_width=True)
-    st.caption("As time passes, F* rises (cost of carry accumulates) and converges to F_mkt at expiry. "
-               "The basis (orange dotted) decays to zero — this convergence locks in the arbitrage profit.")
+        fb_c1, fb_c2 = st.columns(2)
+        with fb_c1:
+            fb_asset   = st.selectbox("Select Asset", list(LOT_SIZES.keys()), key="fb_asset")
+            fb_lots    = st.number_input("Number of Lots", min_value=1, value=1, step=1, key="fb_lots")
+            holding_cost_pct = st.slider("Holding Cost / Dividend Yield (%)", -3.0, 5.0, 0.0, step=0.1,
+                                         help="Annual storage or holding cost. Negative = dividend yield (reduces fair futures price)",
+                                         key="fb_hold")
+        with fb_c2:
+            fb_expiry  = st.date_input("Futures Expiry Date",
+                                       value=last_thursday(today.year, today.month) if last_thursday(today.year, today.month) > today
+                                       else last_thursday(today.year, today.month + 1 if today.month < 12 else 1),
+                                       min_value=today + datetime.timedelta(days=1),
+                                       max_value=today + datetime.timedelta(days=365),
+                                       key="fb_expiry")
+            fb_days    = (fb_expiry - today).days
+            fb_T       = fb_days / 365.0
+            st.metric("Days to Expiry", "{} days ({:.4f}y)".format(fb_days, fb_T))
+
+        with st.spinner("Fetching spot for {}...".format(fb_asset)):
+            fb_s0_data = get_market_data(fb_asset)
+            fb_s0      = fb_s0_data[0]
+
+        fb_spot    = st.number_input("Spot Price (₹)", value=float(fb_s0), min_value=1.0, step=1.0,
+                                     format="%.2f", key="fb_spot_{}".format(fb_asset))
+        r_carry    = r_rate + (holding_cost_pct / 100)
+        fb_fair    = fb_spot * np.exp(r_carry * fb_T)
+        fb_lot_sz  = LOT_SIZES[fb_asset]
+        fb_units   = fb_lots * fb_lot_sz
+
+        fb_mkt = st.number_input("Market Futures Price (₹)",
+                                 value=float(round(fb_fair + 50, 2)),
+                                 min_value=1.0, step=1.0, format="%.2f", key="fb_fmkt_{}".format(fb_asset),
+                                 help="The actual futures price quoted on NSE/BSE")
+
+        # Calculations
+        fb = basis_trade(fb_spot, fb_mkt, r_carry, fb_T, fb_lot_sz, fb_lots, brokerage, arb_threshold_pct)
+        fb_basis      = fb["basis"]              # + = futures rich, − = futures cheap
+        fb_basis_pct  = fb["basis_pct"]
+        fb_gross      = fb["gross"]
+        fb_brokerage  = fb["brokerage"]          # spot buy/sell + futures buy/sell
+        fb_stt_spot   = fb["stt_spot"]
+        fb_friction   = fb["friction"]
+        fb_net        = fb["net_pnl"]
+        fb_profitable = fb_net > 0
+        fb_signal, fb_color, fb_strategy = {
+            "carry":   ("✅ CASH & CARRY — Buy Spot · Sell Futures · Deliver at Expiry", "#00c896", "Cash & Carry"),
+            "reverse": ("🔴 REVERSE CASH & CARRY — Short Spot · Buy Futures · Accept Delivery", "#ff4d6a",
+                        "Reverse Cash & Carry"),
+            "none":    ("⚪ BASIS FAIR — No Futures Arbitrage Opportunity", "#525f7a", "No Trade"),
+        }[fb["signal"]]
+
+        st.markdown("---")
+        f1, f2, f3, f4, f5, f6 = st.columns(6)
+        f1.metric("Spot Price",    "₹{:,.2f}".format(fb_spot))
+        f2.metric("Fair Futures",  "₹{:,.2f}".format(fb_fair))
+        f3.metric("Market Futures","₹{:,.2f}".format(fb_mkt))
+        f4.metric("Basis",         "₹{:.2f} ({:.2f}%)".format(fb_basis, fb_basis_pct))
+        f5.metric("Friction",      "₹{:,.2f}".format(fb_friction))
+        f6.metric("Net P&L",       "₹{:,.2f}".format(fb_net),
+                  delta="Profitable ✅" if fb_profitable else "Loss ❌",
+                  delta_color="normal" if fb_profitable else "inverse")
+
+        _fb_styles = {
+            "#00c896": ("rgba(0,200,150,0.08)",  "rgba(0,200,150,0.35)"),
+            "#ff4d6a": ("rgba(255,77,106,0.08)", "rgba(255,77,106,0.35)"),
+            "#525f7a": ("rgba(82,95,122,0.06)",  "rgba(82,95,122,0.3)"),
+        }
+        _fbbg, _fbbdr = _fb_styles.get(fb_color, ("rgba(82,95,122,0.06)", "rgba(82,95,122,0.3)"))
+        st.markdown(
+            '<div style="background:{bg}; border:1px solid {bdr}; border-left:3px solid {clr};'
+            ' padding:14px 18px; border-radius:12px; margin:12px 0;">'
+            '<div style="font-size:15px; font-weight:700; color:{clr}; margin-bottom:5px;">{s}</div>'
+            '<div style="font-size:12px; color:#525f7a;">'
+            'Strategy: <span style="color:#a8b3c8;">{st}</span>'
+            ' &nbsp;·&nbsp; Expiry: <span style="color:#a8b3c8;">{e} ({d} days)</span>'
+            '</div></div>'.format(
+                bg=_fbbg, bdr=_fbbdr, clr=fb_color,
+                s=fb_signal, st=fb_strategy,
+                e=fb_expiry.strftime("%d %b %Y"), d=fb_days),
+            unsafe_allow_html=True)
+
+        if fb_basis != 0 and not fb_profitable:
+            st.markdown('<div style="background:#120508; border:1px solid rgba(255,77,106,0.3); border-left:3px solid #ff4d6a; border-radius:9px; padding:12px 16px; color:#ff9eae; font-size:13px; font-weight:600; margin:6px 0;">⚠️ Basis gap detected but costs exceed profit. Do not trade.</div>',
+                        unsafe_allow_html=True)
+
+        st.markdown("#### 📐 Detailed Calculation")
+        fb_table = pd.DataFrame({
+            "Parameter": ["Spot Price (S)", "Risk-Free Rate (r)", "Holding Cost/Dividend (d)",
+                          "Carry Rate = r + d", "Time to Expiry T",
+                          "Fair Futures F* = S·e^(carry×T)",
+                          "Market Futures Price (F_mkt)", "Basis = F_mkt − F*",
+                          "Total Units (lots × lot size)",
+                          "Gross Profit = |Basis| × Units",
+                          "Brokerage (4 orders)", "STT on Spot",
+                          "Total Friction", "Net Profit"],
+            "Value": [
+                "₹{:,.2f}".format(fb_spot), "{:.2f}%".format(r_rate*100),
+                "{:.2f}%".format(holding_cost_pct), "{:.2f}%".format(r_carry*100),
+                "{} days ({:.4f}y)".format(fb_days, fb_T),
+                "₹{:,.2f}".format(fb_fair), "₹{:,.2f}".format(fb_mkt),
+                "₹{:.2f} ({:.3f}%)".format(fb_basis, fb_basis_pct),
+                "{:,}".format(fb_units),
+                "₹{:,.2f}".format(fb_gross),
+                "₹{:,.2f}".format(fb_brokerage), "₹{:,.2f}".format(fb_stt_spot),
+                "₹{:,.2f}".format(fb_friction),
+                "₹{:,.2f}".format(fb_net),
+            ]
+        })
+        st.dataframe(fb_table, hide_index=True, use_container_width=True)
+
+        # Basis decay chart — shows convergence to zero at expiry
+        st.markdown("#### 📊 Futures Basis Decay to Zero at Expiry")
+        fig_fb = basis_decay_figure(fb_spot, fb_mkt, r_carry, fb_days, fb_units, fb_friction)
+        st.plotly_chart(fig_fb, use_container_width=True)
+        st.caption("As time passes, F* rises (cost of carry accumulates) and converges to F_mkt at expiry. "
+                   "The basis (orange dotted) decays to zero — this convergence locks in the arbitrage profit.")
+
+        # Term structure — every listed expiry of every underlying from one snapshot
+        st.markdown("#### 📈 Futures Term Structure & Calendar Spreads")
+        ts_snapshot = get_snapshot()
+        ts_curves   = ts_snapshot.get("futures")
+        ts_source   = ts_snapshot.get("futures_src")
+        if ts_curves is None:
+            ts_spots  = dict(FALLBACK_SPOTS, **{a: d[0] for a, d in ts_snapshot["market_data"].items()})
+            ts_curves = standin_futures_curves(ts_spots, today=today, r=r_rate, seed=int(today.toordinal()))
+            ts_source = "simulated"
+        ts_all = st.checkbox("Show all F&O underlyings", value=False, key="ts_all",
+                             help="Off: the watchlist only. On: every underlying in the futures feed.")
+        if not ts_all:
+            ts_curves = ts_curves[ts_curves["asset"].isin(WATCHLIST)]
+        ts_term = futures_term_structure(ts_curves, r_rate, lots=fb_lots, brokerage=brokerage, today=today)
+        ts_cal  = calendar_spreads(ts_term, r_rate, lots=fb_lots, brokerage=brokerage, min_dev_pct=arb_threshold_pct)
+
+        if ts_source == "simulated":
+            st.caption("⚠️ Futures feed unavailable — curves below are SIMULATED around the latest spots "
+                       "(carry = r ± noise). Set ARB_FUTURES_CURVE to load a curve file instead.")
+        else:
+            st.caption("Futures source: {} · {:,} contracts across {:,} underlyings".format(
+                "NSE live" if ts_source == "nse" else "curve file", len(ts_term), ts_term["asset"].nunique()))
+
+        ts_asset = ts_term[ts_term["asset"] == fb_asset]
+        if not ts_asset.empty:
+            with PROFILER.span("chart.term_structure"):
+                fig_ts = go.Figure()
+                fig_ts.add_trace(go.Scatter(x=ts_asset["days"], y=ts_asset["futures"], mode="lines+markers",
+                                            name="Market Futures", line=dict(color="#ff4d6a", width=2),
+                                            text=ts_asset["expiry"], hovertemplate="%{text}<br>₹%{y:,.2f}<extra></extra>"))
+                fig_ts.add_trace(go.Scatter(x=ts_asset["days"], y=ts_asset["fair"], mode="lines+markers",
+                                            name="Fair F* = S·e^(rT)", line=dict(color="#00c896", width=2, dash="dash")))
+                fig_ts.add_trace(go.Bar(x=ts_asset["days"], y=ts_asset["implied_carry"], name="Implied Carry (%)",
+                                        marker_color="rgba(255,127,14,0.45)", yaxis="y2"))
+                fig_ts.update_layout(
+                    title="{} Futures Curve vs Fair Value".format(fb_asset),
+                    xaxis=dict(title="Days to Expiry"),
+                    yaxis=dict(title=dict(text="Price (₹)", font=dict(color="#00c896")), tickformat=",.2f"),
+                    yaxis2=dict(title=dict(text="Implied Carry (%)", font=dict(color="#ff7f0e")),
+                                overlaying="y", side="right", tickformat=".2f"),
+                    height=320, margin=dict(t=40,b=30,l=10,r=10),
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                    plot_bgcolor="#10131f", paper_bgcolor="#08090f")
+            st.plotly_chart(fig_ts, use_container_width=True)
+
+        if not ts_term.empty:
+            ts_carry = ts_term.pivot_table(index="asset", columns="tenor", values="implied_carry", aggfunc="first")
+            ts_basis = ts_term.pivot_table(index="asset", columns="tenor", values="basis_pct", aggfunc="first")
+            ts_cols  = [t for t in ("near", "mid", "far") if t in ts_carry.columns]
+            ts_view  = pd.concat([ts_carry[ts_cols].add_prefix("Carry % "), ts_basis[ts_cols].add_prefix("Basis % ")],
+                                 axis=1).reset_index().rename(columns={"asset": "Asset"})
+            st.dataframe(ts_view.style.format({c: "{:.3f}" for c in ts_view.columns if c != "Asset"}, na_rep="—"),
+                         hide_index=True, use_container_width=True, height=min(38 + 35 * len(ts_view), 420))
+            st.caption("Implied carry = ln(F/S)/T — the annualised rate each contract prices in; compare with "
+                       "r = {:.2f}%. Basis % is F_mkt vs F* = S·e^(rT).".format(r_rate * 100))
+
+        ts_flagged = ts_cal[ts_cal["flag"]].sort_values("net_pnl", ascending=False)
+        if ts_flagged.empty:
+            st.info("No calendar spread deviates more than {:.2f}% from carry after costs ({:,} spreads checked)."
+                    .format(arb_threshold_pct, len(ts_cal)))
+        else:
+            st.success("🎯 {} calendar spread(s) mispriced beyond {:.2f}% after costs".format(
+                len(ts_flagged), arb_threshold_pct))
+            ts_flag_view = ts_flagged[["asset", "legs", "near_expiry", "far_expiry", "f_near", "f_far", "fair_far",
+                                       "gap", "gap_pct", "forward_carry", "net_pnl", "type"]].rename(columns={
+                "asset": "Asset", "legs": "Legs", "near_expiry": "Near Expiry", "far_expiry": "Far Expiry",
+                "f_near": "F Near (₹)", "f_far": "F Far (₹)", "fair_far": "Fair Far (₹)", "gap": "Gap (₹)",
+                "gap_pct": "Gap %", "forward_carry": "Fwd Carry %", "net_pnl": "Net P&L (₹)", "type": "Trade"})
+            st.dataframe(ts_flag_view.style.format({
+                "F Near (₹)": "{:,.2f}", "F Far (₹)": "{:,.2f}", "Fair Far (₹)": "{:,.2f}", "Gap (₹)": "{:,.2f}",
+                "Gap %": "{:.3f}", "Fwd Carry %": "{:.2f}", "Net P&L (₹)": "₹{:,.0f}"}),
+                hide_index=True, use_container_width=True)
+            st.caption("Fair far = F_near·e^(r·(T_far − T_near)). Gap > 0: far leg rich — sell far, buy near; "
+                       "gap < 0: the reverse. Costs: brokerage on 4 futures orders.")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # TAB 5 — SETTINGS & CONFIGURATION
 # ══════════════════════════════════════════════════════════════════════════════
 with tab4:
-    st.subheader("⚙️ Settings & Configuration")
-    st.markdown("Configure transaction costs, detection thresholds, and display preferences. "
-                "All settings persist across tabs within this session.")
-
-    cfg1, cfg2 = st.columns(2)
-
-    # ── TRANSACTION COSTS ─────────────────────────────────────────────────────
-    with cfg1:
-        st.markdown("#### 💸 Transaction Costs")
-        st.caption("As percentage of trade value. Applied in scanner and individual strategy tabs.")
-
-        new_tc_equity  = st.number_input("Equity / Spot Trading (%)",
-                                         value=float(st.session_state.tc_equity),
-                                         min_value=0.0, max_value=1.0, step=0.005,
-                                         format="%.4f", key="cfg_tc_eq",
-                                         help="STT on equity delivery: 0.1% buy side = 0.05% round-trip equiv")
-        new_tc_options = st.number_input("Options Trading (%)",
-                                         value=float(st.session_state.tc_options),
-                                         min_value=0.0, max_value=1.0, step=0.005,
-                                         format="%.4f", key="cfg_tc_opt",
-                                         help="STT on options sell side: 0.0625%")
-        new_tc_futures = st.number_input("Futures Trading (%)",
-                                         value=float(st.session_state.tc_futures),
-                                         min_value=0.0, max_value=1.0, step=0.001,
-                                         format="%.4f", key="cfg_tc_fut",
-                                         help="STT on futures: 0.0125% sell side")
-        new_tc_fx      = st.number_input("FX / Forex Trading (%)",
-                                         value=float(st.session_state.tc_fx_spot),
-                                         min_value=0.0, max_value=1.0, step=0.001,
-                                         format="%.4f", key="cfg_tc_fx",
-                                         help="Bank spread + conversion charges")
-        new_brokerage  = st.number_input("Flat Brokerage per Order (₹)",
-                                         value=float(st.session_state.brokerage_flat),
-                                         min_value=0.0, max_value=100.0, step=5.0,
-                                         key="cfg_brok",
-                                         help="₹20 = Zerodha, ₹0 = no brokerage model")
-
-        st.markdown("**Borrowing / Funding Spread**")
-        new_borrow_spread = st.slider("Borrowing Spread above Risk-Free (%)",
-                                      0.0, 3.0, 0.5, step=0.1, key="cfg_borrow",
-                                      help="Additional cost when borrowing for Cash & Carry or IRP")
-
-    # ── DETECTION THRESHOLDS ──────────────────────────────────────────────────
-    with cfg2:
-        st.markdown("#### 🎯 Detection Thresholds")
-        st.caption("Minimum criteria for an opportunity to trigger a signal.")
-
-        st.markdown("**Put-Call Parity**")
-        new_pcp_min_profit = st.number_input("PCP Minimum Net Profit (₹)",
-                                              value=float(st.session_state.pcp_min_profit),
-                                              min_value=0.0, step=5.0, key="cfg_pcp_profit")
-        new_pcp_min_dev    = st.slider("PCP Minimum Gap (% of Spot)",
-                                       0.01, 1.0, float(st.session_state.pcp_min_dev),
-                                       step=0.01, key="cfg_pcp_dev",
-                                       help="Smaller = more sensitive, more noise")
-
-        st.markdown("**Futures Basis**")
-        new_fb_min_profit  = st.number_input("Futures Basis Minimum Net Profit (₹)",
-                                              value=float(st.session_state.fb_min_profit),
-                                              min_value=0.0, step=5.0, key="cfg_fb_profit")
-        new_fb_min_dev     = st.slider("Futures Min Basis Deviation (% of Fair)",
-                                       0.01, 1.0, float(st.session_state.fb_min_dev),
-                                       step=0.01, key="cfg_fb_dev")
-
-        st.markdown("**Interest Rate Parity**")
-        new_irp_min_profit = st.number_input("IRP Minimum Net Profit (₹)",
-                                              value=float(st.session_state.irp_min_profit),
-                                              min_value=0.0, step=50.0, key="cfg_irp_profit")
-        new_irp_min_dev    = st.slider("IRP Min Forward Deviation (% of Theoretical)",
-                                       0.01, 1.0, float(st.session_state.irp_min_dev),
-                                       step=0.01, key="cfg_irp_dev")
-
-    st.divider()
-
-    # ── DISPLAY & DATA SETTINGS ───────────────────────────────────────────────
-    ds1, ds2 = st.columns(2)
-    with ds1:
-        st.markdown("#### 🔄 Auto-Refresh")
-        new_auto_refresh = st.checkbox("Enable Auto-Refresh",
-                                        value=bool(st.session_state.auto_refresh),
-                                        key="cfg_autoref",
-                                        help="Automatically re-runs the app at set interval")
-        new_refresh_interval = st.slider("Refresh Interval (seconds)",
-                                          10, 120, int(st.session_state.refresh_interval),
-                                          step=10, key="cfg_interval",
-                                          disabled=not new_auto_refresh)
-
-    with ds2:
-        st.markdown("#### 🖥️ Display Settings")
-        new_show_metadata = st.checkbox("Show Scanner Methodology",
-                                         value=bool(st.session_state.show_metadata),
-                                         key="cfg_meta")
-        new_margin_pct    = st.slider("Margin Requirement (%)", 10, 40,
-                                       int(st.session_state.margin_pct),
-                                       key="cfg_margin",
-                                       help="Used to calculate Capital Required in PCP tab")
-
-        st.markdown("**🚨 Alert Threshold**")
-        new_alert_thr     = st.number_input("Minimum Net P&L to trigger TRADE NOW banner (₹)",
-                                             value=float(st.session_state.get("alert_threshold", 500)),
-                                             min_value=0.0, step=100.0, key="cfg_alert",
-                                             help="Shows a flashing alert banner when Net P&L exceeds this value")
-
-    st.divider()
-
-    # ── SAVE BUTTON ───────────────────────────────────────────────────────────
-    save_col, reset_col, _ = st.columns([1, 1, 3])
-    with save_col:
-        if st.button("💾 Save Settings", type="primary", use_container_width=True):
-            st.session_state.tc_equity         = new_tc_equity
-            st.session_state.tc_options        = new_tc_options
-            st.session_state.tc_futures        = new_tc_futures
-            st.session_state.tc_fx_spot        = new_tc_fx
-            st.session_state.brokerage_flat    = new_brokerage
-            st.session_state.pcp_min_profit    = new_pcp_min_profit
-            st.session_state.pcp_min_dev       = new_pcp_min_dev
-            st.session_state.fb_min_profit     = new_fb_min_profit
-            st.session_state.fb_min_dev        = new_fb_min_dev
-            st.session_state.irp_min_profit    = new_irp_min_profit
-            st.session_state.irp_min_dev       = new_irp_min_dev
-            st.session_state.auto_refresh      = new_auto_refresh
-            st.session_state.refresh_interval  = new_refresh_interval
-            st.session_state.show_metadata     = new_show_metadata
-            st.session_state.margin_pct        = new_margin_pct
-            st.session_state.alert_threshold   = new_alert_thr
-            st.success("✅ Settings saved! All tabs will use updated values.")
-
-    with reset_col:
-        if st.button("🔄 Reset Defaults", use_container_width=True):
-            keys_to_clear = ["tc_equity","tc_options","tc_futures","tc_fx_spot",
-                             "brokerage_flat","pcp_min_profit","pcp_min_dev",
-                             "fb_min_profit","fb_min_dev","irp_min_profit","irp_min_dev",
-                             "auto_refresh","refresh_interval","show_metadata",
-                             "margin_pct","iv_pct","r_rate_pct","arb_threshold_pct"]
-            for k in keys_to_clear:
-                if k in st.session_state:
-                    del st.session_state[k]
-            st.rerun()
-
-    st.divider()
-
-    # ── CURRENT CONFIG SUMMARY ────────────────────────────────────────────────
-    st.markdown("#### 📋 Current Configuration Summary")
-    config_text = """**Transaction Costs:**
+    if tab_open(tab4):
+        st.subheader("⚙️ Settings & Configuration")
+        st.markdown("Configure transaction costs, detection thresholds, and display preferences. "
+                    "All settings persist across tabs within this session.")
+
+        cfg1, cfg2 = st.columns(2)
+
+        # ── TRANSACTION COSTS ─────────────────────────────────────────────────────
+        with cfg1:
+            st.markdown("#### 💸 Transaction Costs")
+            st.caption("As percentage of trade value. Applied in scanner and individual strategy tabs.")
+
+            new_tc_equity  = st.number_input("Equity / Spot Trading (%)",
+                                             value=float(st.session_state.tc_equity),
+                                             min_value=0.0, max_value=1.0, step=0.005,
+                                             format="%.4f", key="cfg_tc_eq",
+                                             help="STT on equity delivery: 0.1% buy side = 0.05% round-trip equiv")
+            new_tc_options = st.number_input("Options Trading (%)",
+                                             value=float(st.session_state.tc_options),
+                                             min_value=0.0, max_value=1.0, step=0.005,
+                                             format="%.4f", key="cfg_tc_opt",
+                                             help="STT on options sell side: 0.0625%")
+            new_tc_futures = st.number_input("Futures Trading (%)",
+                                             value=float(st.session_state.tc_futures),
+                                             min_value=0.0, max_value=1.0, step=0.001,
+                                             format="%.4f", key="cfg_tc_fut",
+                                             help="STT on futures: 0.0125% sell side")
+            new_tc_fx      = st.number_input("FX / Forex Trading (%)",
+                                             value=float(st.session_state.tc_fx_spot),
+                                             min_value=0.0, max_value=1.0, step=0.001,
+                                             format="%.4f", key="cfg_tc_fx",
+                                             help="Bank spread + conversion charges")
+            new_brokerage  = st.number_input("Flat Brokerage per Order (₹)",
+                                             value=float(st.session_state.brokerage_flat),
+                                             min_value=0.0, max_value=100.0, step=5.0,
+                                             key="cfg_brok",
+                                             help="₹20 = Zerodha, ₹0 = no brokerage model")
+
+            st.markdown("**Borrowing / Funding Spread**")
+            new_borrow_spread = st.slider("Borrowing Spread above Risk-Free (%)",
+                                          0.0, 3.0, 0.5, step=0.1, key="cfg_borrow",
+                                          help="Additional cost when borrowing for Cash & Carry or IRP")
+
+        # ── DETECTION THRESHOLDS ──────────────────────────────────────────────────
+        with cfg2:
+            st.markdown("#### 🎯 Detection Thresholds")
+            st.caption("Minimum criteria for an opportunity to trigger a signal.")
+
+            st.markdown("**Put-Call Parity**")
+            new_pcp_min_profit = st.number_input("PCP Minimum Net Profit (₹)",
+                                                  value=float(st.session_state.pcp_min_profit),
+                                                  min_value=0.0, step=5.0, key="cfg_pcp_profit")
+            new_pcp_min_dev    = st.slider("PCP Minimum Gap (% of Spot)",
+                                           0.01, 1.0, float(st.session_state.pcp_min_dev),
+                                           step=0.01, key="cfg_pcp_dev",
+                                           help="Smaller = more sensitive, more noise")
+
+            st.markdown("**Futures Basis**")
+            new_fb_min_profit  = st.number_input("Futures Basis Minimum Net Profit (₹)",
+                                                  value=float(st.session_state.fb_min_profit),
+                                                  min_value=0.0, step=5.0, key="cfg_fb_profit")
+            new_fb_min_dev     = st.slider("Futures Min Basis Deviation (% of Fair)",
+                                           0.01, 1.0, float(st.session_state.fb_min_dev),
+                                           step=0.01, key="cfg_fb_dev")
+
+            st.markdown("**Interest Rate Parity**")
+            new_irp_min_profit = st.number_input("IRP Minimum Net Profit (₹)",
+                                                  value=float(st.session_state.irp_min_profit),
+                                                  min_value=0.0, step=50.0, key="cfg_irp_profit")
+            new_irp_min_dev    = st.slider("IRP Min Forward Deviation (% of Theoretical)",
+                                           0.01, 1.0, float(st.session_state.irp_min_dev),
+                                           step=0.01, key="cfg_irp_dev")
+
+        st.divider()
+
+        # ── DISPLAY & DATA SETTINGS ───────────────────────────────────────────────
+        ds1, ds2 = st.columns(2)
+        with ds1:
+            st.markdown("#### 🔄 Auto-Refresh")
+            new_auto_refresh = st.checkbox("Enable Auto-Refresh",
+                                            value=bool(st.session_state.auto_refresh),
+                                            key="cfg_autoref",
+                                            help="Periodically redraws the ticker bar and scanner results from the latest market snapshot")
+            new_refresh_interval = st.slider("Refresh Interval (seconds)",
+                                              10, 120, int(st.session_state.refresh_interval),
+                                              step=10, key="cfg_interval",
+                                              disabled=not new_auto_refresh)
+
+        with ds2:
+            st.markdown("#### 🖥️ Display Settings")
+            new_show_metadata = st.checkbox("Show Scanner Methodology",
+                                             value=bool(st.session_state.show_metadata),
+                                             key="cfg_meta")
+            new_margin_pct    = st.slider("Margin Requirement (%)", 10, 40,
+                                           int(st.session_state.margin_pct),
+                                           key="cfg_margin",
+                                           help="Used to calculate Capital Required in PCP tab")
+
+            st.markdown("**🚨 Alert Threshold**")
+            new_alert_thr     = st.number_input("Minimum Net P&L to trigger TRADE NOW banner (₹)",
+                                                 value=float(st.session_state.get("alert_threshold", 500)),
+                                                 min_value=0.0, step=100.0, key="cfg_alert",
+                                                 help="Shows a flashing alert banner when Net P&L exceeds this value")
+
+        st.divider()
+
+        # ── SAVE BUTTON ───────────────────────────────────────────────────────────
+        save_col, reset_col, _ = st.columns([1, 1, 3])
+        with save_col:
+            if st.button("💾 Save Settings", type="primary", use_container_width=True):
+                st.session_state.tc_equity         = new_tc_equity
+                st.session_state.tc_options        = new_tc_options
+                st.session_state.tc_futures        = new_tc_futures
+                st.session_state.tc_fx_spot        = new_tc_fx
+                st.session_state.brokerage_flat    = new_brokerage
+                st.session_state.pcp_min_profit    = new_pcp_min_profit
+                st.session_state.pcp_min_dev       = new_pcp_min_dev
+                st.session_state.fb_min_profit     = new_fb_min_profit
+                st.session_state.fb_min_dev        = new_fb_min_dev
+                st.session_state.irp_min_profit    = new_irp_min_profit
+                st.session_state.irp_min_dev       = new_irp_min_dev
+                st.session_state.auto_refresh      = new_auto_refresh
+                st.session_state.refresh_interval  = new_refresh_interval
+                st.session_state.show_metadata     = new_show_metadata
+                st.session_state.margin_pct        = new_margin_pct
+                st.session_state.alert_threshold   = new_alert_thr
+                st.success("✅ Settings saved! All tabs will use updated values.")
+
+        with reset_col:
+            if st.button("🔄 Reset Defaults", use_container_width=True):
+                keys_to_clear = ["tc_equity","tc_options","tc_futures","tc_fx_spot",
+                                 "brokerage_flat","pcp_min_profit","pcp_min_dev",
+                                 "fb_min_profit","fb_min_dev","irp_min_profit","irp_min_dev",
+                                 "auto_refresh","refresh_interval","show_metadata",
+                                 "margin_pct","iv_pct","r_rate_pct","arb_threshold_pct"]
+                for k in keys_to_clear:
+                    if k in st.session_state:
+                        del st.session_state[k]
+                st.rerun()
+
+        st.divider()
+
+        # ── CURRENT CONFIG SUMMARY ────────────────────────────────────────────────
+        st.markdown("#### 📋 Current Configuration Summary")
+        config_text = """**Transaction Costs:**
 - Equity/Spot: {tc_eq:.3f}%
 - Options: {tc_opt:.3f}%
 - Futures: {tc_fut:.3f}%
@@ -1872,185 +2142,204 @@ with tab4:
 - Margin Requirement: {margin}%
 - Auto-Refresh: {ar} ({ari}s interval)
 - Show Methodology: {meta}""".format(
-        tc_eq=st.session_state.tc_equity,
-        tc_opt=st.session_state.tc_options,
-        tc_fut=st.session_state.tc_futures,
-        tc_fx=st.session_state.tc_fx_spot,
-        brok=st.session_state.brokerage_flat,
-        pcp_p=st.session_state.pcp_min_profit,
-        pcp_d=st.session_state.pcp_min_dev,
-        fb_p=st.session_state.fb_min_profit,
-        fb_d=st.session_state.fb_min_dev,
-        irp_p=st.session_state.irp_min_profit,
-        irp_d=st.session_state.irp_min_dev,
-        margin=st.session_state.margin_pct,
-        ar="ON" if st.session_state.auto_refresh else "OFF",
-        ari=st.session_state.refresh_interval,
-        meta="Enabled" if st.session_state.show_metadata else "Disabled")
-    st.code(config_text, language=None)
-    st.caption("⚠️ Settings are session-specific and reset when you close the browser.")
-
-    # ── AUTO REFRESH LOGIC ────────────────────────────────────────────────────
-    if st.session_state.auto_refresh:
-        import time
-        time.sleep(st.session_state.refresh_interval)
-        st.rerun()
+            tc_eq=st.session_state.tc_equity,
+            tc_opt=st.session_state.tc_options,
+            tc_fut=st.session_state.tc_futures,
+            tc_fx=st.session_state.tc_fx_spot,
+            brok=st.session_state.brokerage_flat,
+            pcp_p=st.session_state.pcp_min_profit,
+            pcp_d=st.session_state.pcp_min_dev,
+            fb_p=st.session_state.fb_min_profit,
+            fb_d=st.session_state.fb_min_dev,
+            irp_p=st.session_state.irp_min_profit,
+            irp_d=st.session_state.irp_min_dev,
+            margin=st.session_state.margin_pct,
+            ar="ON" if st.session_state.auto_refresh else "OFF",
+            ari=st.session_state.refresh_interval,
+            meta="Enabled" if st.session_state.show_metadata else "Disabled")
+        st.code(config_text, language=None)
+        st.caption("⚠️ Settings are session-specific and reset when you close the browser.")
 
 # ══════════════════════════════════════════════════════════════════════════════
 # TAB 6 — DOCUMENTATION
 # ══════════════════════════════════════════════════════════════════════════════
 with tab5:
-    st.markdown("""
-    <div style="text-align:center; padding:20px 0 10px;">
-      <div style="font-size:48px;">📚</div>
-      <h1 style="color:#f59e0b; font-weight:900; margin:0;">Documentation</h1>
-      <p style="color:#94a3b8;">Complete guide to the Cross-Asset Arbitrage Monitor</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    st.markdown("---")
-
-    # About
-    doc_c1, doc_c2 = st.columns([2, 1])
-    with doc_c1:
+    if tab_open(tab5):
         st.markdown("""
-### 🏛️ About This Project
-The **Cross-Asset Arbitrage Opportunity Monitor** is a real-time financial dashboard
-that detects mispricing across options and futures markets by checking fundamental
-parity relationships. When market prices deviate from theoretical fair values,
-the dashboard calculates the arbitrage profit and provides step-by-step execution instructions.
-
-**Key Features:**
-- ✅ Put-Call Parity arbitrage detection
-- ✅ Futures Basis (Cost-of-Carry) arbitrage detection
-- ✅ Covered Interest Rate Parity (CIRP) detection
-- ✅ Cross-Market Statistical Spread Arbitrage
-- ✅ Live market data via yfinance (spot prices)
-- ✅ Historical gap analysis and sensitivity analysis
-- ✅ Automated profit calculation including all transaction costs
-- ✅ Step-by-step execution strategy for each opportunity
-        """)
+        <div style="text-align:center; padding:20px 0 10px;">
+          <div style="font-size:48px;">📚</div>
+          <h1 style="color:#f59e0b; font-weight:900; margin:0;">Documentation</h1>
+          <p style="color:#94a3b8;">Complete guide to the Cross-Asset Arbitrage Monitor</p>
+        </div>
+        """, unsafe_allow_html=True)
 
-    with doc_c2:
-        st.markdown("""
-### 👥 Project Team
-**Institution:** IIT Roorkee
+        st.markdown("---")
 
-**Department:** Management Studies
+        # About
+        doc_c1, doc_c2 = st.columns([2, 1])
+        with doc_c1:
+            st.markdown("""
+    ### 🏛️ About This Project
+    The **Cross-Asset Arbitrage Opportunity Monitor** is a real-time financial dashboard
+    that detects mispricing across options and futures markets by checking fundamental
+    parity relationships. When market prices deviate from theoretical fair values,
+    the dashboard calculates the arbitrage profit and provides step-by-step execution instructions.
+
+    **Key Features:**
+    - ✅ Put-Call Parity arbitrage detection
+    - ✅ Futures Basis (Cost-of-Carry) arbitrage detection
+    - ✅ Covered Interest Rate Parity (CIRP) detection
+    - ✅ Cross-Market Statistical Spread Arbitrage
+    - ✅ Live market data via yfinance (spot prices)
+    - ✅ Historical gap analysis and sensitivity analysis
+    - ✅ Automated profit calculation including all transaction costs
+    - ✅ Step-by-step execution strategy for each opportunity
+            """)
 
-**Course:** Financial Engineering
+        with doc_c2:
+            st.markdown("""
+    ### 👥 Project Team
+    **Institution:** IIT Roorkee
 
-**Team:** Group 4
+    **Department:** Management Studies
 
-**Supervisor:** Financial Engineering Faculty
+    **Course:** Financial Engineering
 
----
-**🔗 Live Dashboard:**
-arbitrage-monitor-anchalfeproject.streamlit.app
+    **Team:** Group 4
 
-**📦 GitHub:**
-github.com/[your-username]/arbitrage-monitor
-        """)
+    **Supervisor:** Financial Engineering Faculty
 
-    st.markdown("---")
+    ---
+    **🔗 Live Dashboard:**
+    arbitrage-monitor-anchalfeproject.streamlit.app
 
-    # Strategies
-    st.markdown("## 📐 Arbitrage Strategies")
-    doc_tab_pcp, doc_tab_fb, doc_tab_irp = st.tabs([
-        "Put-Call Parity", "Futures Basis", "Interest Rate Parity"])
+    **📦 GitHub:**
+    github.com/[your-username]/arbitrage-monitor
+            """)
 
-    with doc_tab_pcp:
-        st.markdown("""
-#### Fundamental Relationship
-The price of a European call minus a European put equals the difference between
-the spot price and the present value of the strike:
-
-$$C - P = S_0 - K \\cdot e^{-rT}$$
-
-**Variables:**
-- `C` = Call option market price
-- `P` = Put option market price
-- `S₀` = Current spot price of underlying
-- `K` = Strike price (identical for both options)
-- `r` = Continuously compounded risk-free rate
-- `T` = Time to expiry in years
-
-#### Arbitrage Strategies
-| Gap | Condition | Strategy | Execution |
-|-----|-----------|----------|-----------|
-| Gap > 0 | Spot > Synthetic | **Conversion** | Buy Spot · Buy Put · Sell Call |
-| Gap < 0 | Synthetic > Spot | **Reversal** | Short Spot · Sell Put · Buy Call |
-| Gap ≈ 0 | Efficient market | **No Trade** | Wait and monitor |
-
-#### Why is the payoff locked?
-The three legs together form a synthetic forward position.
-At any expiry price, the individual leg gains and losses cancel perfectly,
-leaving only the arbitrage spread as profit.
-        """)
+        st.markdown("---")
 
-    with doc_tab_fb:
-        st.markdown("""
-#### Cost-of-Carry Model
-The fair (no-arbitrage) futures price is:
+        # Strategies
+        st.markdown("## 📐 Arbitrage Strategies")
+        doc_tab_pcp, doc_tab_fb, doc_tab_irp = st.tabs([
+            "Put-Call Parity", "Futures Basis", "Interest Rate Parity"])
 
-$$F^* = S \\cdot e^{(r + d) \\times T}$$
+        with doc_tab_pcp:
+            st.markdown("""
+    #### Fundamental Relationship
+    The price of a European call minus a European put equals the difference between
+    the spot price and the present value of the strike:
+
+    $$C - P = S_0 - K \\cdot e^{-rT}$$
+
+    **Variables:**
+    - `C` = Call option market price
+    - `P` = Put option market price
+    - `S₀` = Current spot price of underlying
+    - `K` = Strike price (identical for both options)
+    - `r` = Continuously compounded risk-free rate
+    - `T` = Time to expiry in years
+
+    #### Arbitrage Strategies
+    | Gap | Condition | Strategy | Execution |
+    |-----|-----------|----------|-----------|
+    | Gap > 0 | Spot > Synthetic | **Conversion** | Buy Spot · Buy Put · Sell Call |
+    | Gap < 0 | Synthetic > Spot | **Reversal** | Short Spot · Sell Put · Buy Call |
+    | Gap ≈ 0 | Efficient market | **No Trade** | Wait and monitor |
+
+    #### Why is the payoff locked?
+    The three legs together form a synthetic forward position.
+    At any expiry price, the individual leg gains and losses cancel perfectly,
+    leaving only the arbitrage spread as profit.
+            """)
 
-where `d` = holding cost or dividend yield (negative for dividends).
+        with doc_tab_fb:
+            st.markdown("""
+    #### Cost-of-Carry Model
+    The fair (no-arbitrage) futures price is:
 
-#### Strategies
-- **Cash & Carry (F_mkt > F*):** Buy spot, sell futures, hold to expiry, deliver
-- **Reverse C&C (F_mkt < F*):** Short spot, buy futures, accept delivery at expiry
+    $$F^* = S \\cdot e^{(r + d) \\times T}$$
 
-#### Basis
-`Basis = F_mkt − F*`
+    where `d` = holding cost or dividend yield (negative for dividends).
 
-The basis decays to zero at expiry — this convergence guarantees the locked profit.
-        """)
+    #### Strategies
+    - **Cash & Carry (F_mkt > F*):** Buy spot, sell futures, hold to expiry, deliver
+    - **Reverse C&C (F_mkt < F*):** Short spot, buy futures, accept delivery at expiry
 
-    with doc_tab_irp:
-        st.markdown("""
-#### Covered Interest Rate Parity
-The theoretical forward exchange rate must satisfy:
+    #### Basis
+    `Basis = F_mkt − F*`
 
-$$F = S \\times e^{(r_d - r_f) \\times T}$$
+    The basis decays to zero at expiry — this convergence guarantees the locked profit.
+            """)
 
-where `r_d` = domestic rate (India), `r_f` = foreign rate (US), `S` = spot USD/INR.
+        with doc_tab_irp:
+            st.markdown("""
+    #### Covered Interest Rate Parity
+    The theoretical forward exchange rate must satisfy:
 
-#### Arbitrage
-If `F_mkt ≠ F_theoretical`:
-1. Borrow in the lower-rate currency
-2. Convert at spot
-3. Invest at the higher-rate currency
-4. Lock in the forward to eliminate FX risk
-5. Collect the rate differential as risk-free profit
-        """)
+    $$F = S \\times e^{(r_d - r_f) \\times T}$$
 
-    st.markdown("---")
-    st.markdown("## 💸 Transaction Cost Model")
-    cost_table_data = {
-        "Cost Component":   ["Brokerage (flat)",   "STT on Spot",          "STT on Options (sell)", "STT on Futures"],
-        "Rate":             ["₹20 per order",       "0.1% of trade value",  "0.0625% of premium",    "0.0125% of trade"],
-        "Applied to":       ["All 4 orders",        "Spot buy side",        "Option sell side",      "Futures sell side"],
-        "Typical (1 lot)":  ["₹80",                 "~₹1,300–₹1,700",      "~₹35–₹80",             "~₹30–₹50"],
-    }
-    st.dataframe(pd.DataFrame(cost_table_data), hide_index=True, use_container_width=True)
+    where `r_d` = domestic rate (India), `r_f` = foreign rate (US), `S` = spot USD/INR.
 
-    st.markdown("---")
-    st.markdown("## ⚠️ Disclaimer")
-    st.warning("""
-    This dashboard is developed for **educational and research purposes** as part of the
-    Financial Engineering course at IIT Roorkee. It is **not financial advice**.
+    #### Arbitrage
+    If `F_mkt ≠ F_theoretical`:
+    1. Borrow in the lower-rate currency
+    2. Convert at spot
+    3. Invest at the higher-rate currency
+    4. Lock in the forward to eliminate FX risk
+    5. Collect the rate differential as risk-free profit
+            """)
 
-    - Arbitrage windows in real markets last milliseconds and are exploited by HFT algorithms
-    - Transaction costs shown are approximate and may vary by broker and trade size
-    - NSE option chain data requires manual entry due to API restrictions on cloud servers
-    - All calculations assume European-style options and no early exercise
-    - Past arbitrage patterns do not guarantee future opportunities
+        st.markdown("---")
+        st.markdown("## 💸 Transaction Cost Model")
+        cost_table_data = {
+            "Cost Component":   ["Brokerage (flat)",   "STT on Spot",          "STT on Options (sell)", "STT on Futures"],
+            "Rate":             ["₹20 per order",       "0.1% of trade value",  "0.0625% of premium",    "0.0125% of trade"],
+            "Applied to":       ["All 4 orders",        "Spot buy side",        "Option sell side",      "Futures sell side"],
+            "Typical (1 lot)":  ["₹80",                 "~₹1,300–₹1,700",      "~₹35–₹80",             "~₹30–₹50"],
+        }
+        st.dataframe(pd.DataFrame(cost_table_data), hide_index=True, use_container_width=True)
 
-    Always consult a licensed financial advisor before executing real trades.
-    """)
+        st.markdown("---")
+        st.markdown("## ⚠️ Disclaimer")
+        st.warning("""
+        This dashboard is developed for **educational and research purposes** as part of the
+        Financial Engineering course at IIT Roorkee. It is **not financial advice**.
+
+        - Arbitrage windows in real markets last milliseconds and are exploited by HFT algorithms
+        - Transaction costs shown are approximate and may vary by broker and trade size
+        - NSE option chain data requires manual entry due to API restrictions on cloud servers
+        - All calculations assume European-style options and no early exercise
+        - Past arbitrage patterns do not guarantee future opportunities
+
+        Always consult a licensed financial advisor before executing real trades.
+        """)
 
 # ── GLOBAL FOOTER ─────────────────────────────────────────────────────────────
 st.divider()
 st.caption("⚠️ For educational and research purposes only. Not financial advice. "
            "Arbitrage windows are fleeting in real markets. | IIT Roorkee · Dept. of Management Studies · Financial Engineering")
+
+# ── DIAGNOSTICS PANEL ─────────────────────────────────────────────────────────
+# Rendered last so this run's own spans are in it.
+if PROFILER.enabled:
+    PROFILER.record("app.rerun", (time.perf_counter() - _RERUN_T0) * 1000)
+    diag = PROFILER.snapshot()
+    with diag_slot:
+        st.caption("Last full rerun {:,.0f} ms · stats since {}".format(
+            diag["spans"]["app.rerun"]["last_ms"],
+            datetime.datetime.fromtimestamp(diag["since"]).strftime("%H:%M:%S")))
+        st.dataframe(pd.DataFrame([dict(span=name, **stats) for name, stats in diag["spans"].items()]),
+                     hide_index=True, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(format="%.1f")
+                                    for c in ("total_ms", "mean_ms", "max_ms", "last_ms")})
+        if diag["counters"]:
+            st.dataframe(pd.DataFrame({"counter": list(diag["counters"]), "value": list(diag["counters"].values())}),
+                         hide_index=True, use_container_width=True)
+        d1, d2, d3 = st.columns(3)
+        d1.download_button("JSON", json.dumps(diag, indent=2), file_name="arb_diagnostics.json",
+                           mime="application/json", key="diag_json")
+        d2.download_button("Prometheus", PROFILER.prometheus(), file_name="arb_metrics.prom",
+                           mime="text/plain", key="diag_prom")
+        if d3.button("Reset", key="diag_reset"):
+            PROFILER.reset()
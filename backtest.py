@@ -0,0 +1,294 @@
+"""Tick-level backtester — replay recorded snapshots through the strategy kernels.
+
+Tick files are CSV (or Parquet, if pyarrow is installed), one row per quote:
+
+    PCP:   ts, asset, expiry, strike, spot, call, put [, call_oi, put_oi]
+    Basis: ts, asset, expiry, spot, futures [, futures_oi]
+    IRP:   ts, tenor_days, spot, forward [, r_in, r_us]
+
+Every row is priced with the same kernels and friction model as the live
+scanner (brokerage per order, 0.1% spot STT, 0.0625% option STT), and PCP
+nets out the PV of dividends going ex between the tick and expiry from the
+same DividendCalendar (ARB_DIVIDENDS). A trade is
+opened when a contract's deviation first crosses the threshold and is held
+to expiry — these are locked arbitrages, so P&L is fixed at entry. Further
+ticks above the threshold on the same contract are the same trade.
+
+    python backtest.py --pcp ticks_pcp.csv --thresholds 0.02 0.05 0.1 0.2
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from market_data import DIVIDENDS, INSTRUMENTS
+from pricing import dividend_pv
+from strategies import NSE_EXPIRY_FORMAT, basis_kernel, irp_kernel, pcp_kernel
+
+DEFAULT_THRESHOLDS = np.round(np.arange(0.01, 0.51, 0.01), 2)   # % — same range as the Settings sliders
+CAPACITY_OI_SHARE  = 0.10   # fraction of open interest one desk could realistically take
+
+STATS_COLUMNS = ["strategy", "threshold_pct", "trades", "hits", "hit_rate", "total_pnl", "mean_pnl",
+                 "capacity_lots", "capacity_pnl"]
+
+
+# ── TICK I/O ──────────────────────────────────────────────────────────────────
+def load_ticks(path):
+    """Read a tick file; ``ts`` becomes a datetime column."""
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    df["ts"] = pd.to_datetime(df["ts"], unit="s") if pd.api.types.is_numeric_dtype(df["ts"]) \
+        else pd.to_datetime(df["ts"])
+    return df
+
+
+def append_ticks(df, path):
+    """Append tick rows to a CSV, writing the header only for a new file."""
+    if df.empty:
+        return
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, mode="a", index=False, header=not os.path.exists(path))
+
+
+def pcp_ticks_from_snapshot(snapshot):
+    """Flatten a poller snapshot's live chains into PCP tick rows."""
+    frames = []
+    for asset, data in snapshot["market_data"].items():
+        spot, chain, source = data[0], data[1], data[5]
+        if source != "nse" or chain.is_empty:
+            continue
+        both = ~np.isnan(chain.call_last) & ~np.isnan(chain.put_last)
+        frames.append(pd.DataFrame({
+            "ts":      snapshot["ts"],
+            "asset":   asset,
+            "expiry":  chain.expiry_names()[both],
+            "strike":  chain.strike[both],
+            "spot":    spot,
+            "call":    chain.call_last[both],
+            "put":     chain.put_last[both],
+            "call_oi": chain.call_oi[both],
+            "put_oi":  chain.put_oi[both],
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _days_to_expiry(ticks):
+    expiry = pd.to_datetime(ticks["expiry"], format=NSE_EXPIRY_FORMAT, errors="coerce")
+    expiry = expiry.fillna(pd.to_datetime(ticks["expiry"], errors="coerce"))
+    days   = (expiry - ticks["ts"].dt.normalize()).dt.days.to_numpy(dtype=float)
+    return np.maximum(np.nan_to_num(days, nan=30.0), 1.0)
+
+
+def _contract_key(ticks, columns):
+    # Integer id per contract — far cheaper to sort on than concatenated strings.
+    return ticks.groupby(columns, sort=False).ngroup().to_numpy()
+
+
+def _dividend_pv(ticks, T, r, dividends):
+    """PV at each tick of the dividends its asset goes ex on after the tick and by expiry."""
+    pv = np.zeros(len(ticks))
+    if dividends is None:
+        return pv
+    assets = ticks["asset"].to_numpy()
+    day    = ticks["ts"].dt.normalize().to_numpy().astype("datetime64[D]")
+    for asset in set(dividends.by_symbol).intersection(assets):   # a handful of payers; rows vectorized
+        rows = np.flatnonzero(assets == asset)
+        ex_dates, amounts = dividends.by_symbol[asset]
+        times = (np.array(ex_dates, dtype="datetime64[D]") - day[rows, None]).astype(float) / 365.0
+        pv[rows] = dividend_pv(times, amounts, T[rows], r)
+    return pv
+
+
+def _lot_sizes(ticks):
+    if "lot_size" in ticks.columns:
+        return ticks["lot_size"].to_numpy(dtype=float)
+    return INSTRUMENTS.lot_sizes_for(ticks["asset"])
+
+
+# ── PER-TICK EVALUATION ───────────────────────────────────────────────────────
+# Each evaluator returns the common frame the backtest runs on:
+#   key (contract id), ts, dev_pct (|gap| as % of reference), net_pnl, capacity_lots
+def evaluate_pcp_ticks(ticks, r, lots=1, brokerage=20.0, dividends=DIVIDENDS):
+    ticks = ticks[(ticks["call"] > 0) & (ticks["put"] > 0)]
+    spot  = ticks["spot"].to_numpy(dtype=float)
+    T     = _days_to_expiry(ticks) / 365.0
+    _, _, gap, _, _, net = pcp_kernel(spot, ticks["strike"].to_numpy(dtype=float),
+                                      ticks["call"].to_numpy(dtype=float), ticks["put"].to_numpy(dtype=float),
+                                      r, T, _lot_sizes(ticks), lots, brokerage,
+                                      pv_div=_dividend_pv(ticks, T, r, dividends))
+    if {"call_oi", "put_oi"} <= set(ticks.columns):
+        capacity = np.minimum(ticks["call_oi"].to_numpy(dtype=float), ticks["put_oi"].to_numpy(dtype=float))
+        capacity = np.floor(capacity * CAPACITY_OI_SHARE)
+    else:
+        capacity = np.full(len(ticks), np.nan)
+    return pd.DataFrame({
+        "key":           _contract_key(ticks, ["asset", "expiry", "strike"]),
+        "ts":            ticks["ts"].to_numpy(),
+        "dev_pct":       np.abs(gap) / spot * 100,
+        "net_pnl":       net,
+        "capacity_lots": capacity,
+    })
+
+
+def evaluate_basis_ticks(ticks, r, lots=1, brokerage=20.0):
+    spot = ticks["spot"].to_numpy(dtype=float)
+    T    = _days_to_expiry(ticks) / 365.0
+    fair, basis, _, _, net = basis_kernel(spot, ticks["futures"].to_numpy(dtype=float), r, T,
+                                          _lot_sizes(ticks), lots, brokerage)
+    if "futures_oi" in ticks.columns:
+        capacity = np.floor(ticks["futures_oi"].to_numpy(dtype=float) * CAPACITY_OI_SHARE)
+    else:
+        capacity = np.full(len(ticks), np.nan)
+    return pd.DataFrame({
+        "key":           _contract_key(ticks, ["asset", "expiry"]),
+        "ts":            ticks["ts"].to_numpy(),
+        "dev_pct":       np.abs(basis) / fair * 100,
+        "net_pnl":       net,
+        "capacity_lots": capacity,
+    })
+
+
+def evaluate_irp_ticks(ticks, r_in=0.0675, r_us=0.0525, notional=100000, brokerage=20.0):
+    fx   = ticks["spot"].to_numpy(dtype=float)
+    r_d  = ticks["r_in"].to_numpy(dtype=float) if "r_in" in ticks.columns else r_in
+    r_f  = ticks["r_us"].to_numpy(dtype=float) if "r_us" in ticks.columns else r_us
+    T    = ticks["tenor_days"].to_numpy(dtype=float) / 365.0
+    f_theory, gap, _, _, net = irp_kernel(fx, ticks["forward"].to_numpy(dtype=float), r_d, r_f, T, notional, brokerage)
+    return pd.DataFrame({
+        "key":           _contract_key(ticks, ["tenor_days"]),
+        "ts":            ticks["ts"].to_numpy(),
+        "dev_pct":       np.abs(gap) / f_theory * 100,
+        "net_pnl":       net,
+        "capacity_lots": np.nan,
+    })
+
+
+# ── THRESHOLD GRID ────────────────────────────────────────────────────────────
+def sort_evaluated(evaluated):
+    """Order evaluated ticks by (contract, time) → dict of arrays for threshold_stats.
+
+    ``same_prev[i]`` is True when row i-1 is the same contract. Nothing here
+    depends on thresholds, lots or brokerage, so sweeps compute it once.
+    """
+    ev  = evaluated.sort_values(["key", "ts"], kind="stable")
+    key = ev["key"].to_numpy()
+    same_prev = np.zeros(len(ev), dtype=bool)
+    same_prev[1:] = key[1:] == key[:-1]
+    return {
+        "dev_pct":       ev["dev_pct"].to_numpy(dtype=float),
+        "net_pnl":       ev["net_pnl"].to_numpy(dtype=float),
+        "capacity_lots": np.nan_to_num(ev["capacity_lots"].to_numpy(dtype=float), nan=0.0),
+        "same_prev":     same_prev,
+    }
+
+
+def threshold_stats(dev, net, cap, same_prev, thresholds, min_profit=None):
+    """P&L, hit rate and capacity for every threshold in one pass over sorted ticks.
+
+    A contract trades at most once per threshold: at threshold t, on its
+    first tick with dev > t. Dipping back below t and crossing again is the
+    same locked trade, not a new one. That first tick is the one where t
+    lies in [max dev of the contract's earlier ticks, dev), so each tick adds
+    its P&L to a contiguous slice of the sorted grid — a difference array
+    over thresholds replaces the ticks × thresholds matrix, keeping memory
+    O(ticks).
+
+    ``min_profit`` (₹) additionally requires net P&L above it to enter, as the
+    scanner's profit filter does; ticks that fail it neither enter nor count
+    towards the running maximum.
+    """
+    th = np.sort(np.asarray(thresholds, dtype=float))
+    K  = len(th)
+    ok = np.ones(len(dev), dtype=bool) if min_profit is None else net > min_profit
+
+    # Highest eligible deviation on the same contract before each tick.
+    run_max  = pd.Series(np.where(ok, dev, -np.inf)).groupby(np.cumsum(~same_prev)).cummax().to_numpy()
+    prev_max = np.full(len(dev), -np.inf)
+    prev_max[1:] = np.where(same_prev[1:], run_max[:-1], -np.inf)
+
+    lo = np.where(ok, prev_max, np.inf)    # rows that can't enter get an empty slice
+    hi = np.where(ok, dev, -np.inf)
+    start = np.searchsorted(th, lo, side="left")
+    end   = np.searchsorted(th, hi, side="left")
+    valid = end > start
+    start, end = start[valid], end[valid]
+
+    def _slice_sum(weights):
+        w = weights[valid]
+        return np.cumsum(np.bincount(start, w, minlength=K + 1) - np.bincount(end, w, minlength=K + 1))[:K]
+
+    trades    = _slice_sum(np.ones(len(dev)))
+    hits      = _slice_sum((net > 0).astype(float))
+    total_pnl = _slice_sum(net)
+    cap_lots  = _slice_sum(cap)
+    cap_pnl   = _slice_sum(cap * net)   # net is per traded size; scaled linearly to the OI share
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "threshold_pct": th,
+            "trades":        trades.round().astype(int),
+            "hits":          hits.round().astype(int),
+            "hit_rate":      np.where(trades > 0, hits / trades, np.nan),
+            "total_pnl":     total_pnl,
+            "mean_pnl":      np.where(trades > 0, total_pnl / trades, np.nan),
+            "capacity_lots": cap_lots,
+            "capacity_pnl":  cap_pnl,
+        })
+
+
+def backtest(evaluated, thresholds=DEFAULT_THRESHOLDS, min_profit=None):
+    """Threshold grid stats for one evaluated tick frame (see threshold_stats)."""
+    s = sort_evaluated(evaluated)
+    return threshold_stats(s["dev_pct"], s["net_pnl"], s["capacity_lots"], s["same_prev"], thresholds, min_profit)
+
+
+def run_backtest(pcp=None, basis=None, irp=None, thresholds=DEFAULT_THRESHOLDS, r=0.0675, r_us=0.0525,
+                 lots=1, brokerage=20.0, min_profit=None):
+    """Backtest whichever tick sets are given; one stats block per strategy."""
+    blocks = []
+    for name, ticks, evaluate in (
+            ("Put-Call Parity",      pcp,   lambda t: evaluate_pcp_ticks(t, r, lots, brokerage)),
+            ("Futures Basis",        basis, lambda t: evaluate_basis_ticks(t, r, lots, brokerage)),
+            ("Interest Rate Parity", irp,   lambda t: evaluate_irp_ticks(t, r, r_us, brokerage=brokerage))):
+        if ticks is None:
+            continue
+        stats = backtest(evaluate(ticks), thresholds, min_profit)
+        stats.insert(0, "strategy", name)
+        blocks.append(stats)
+    return pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame(columns=STATS_COLUMNS)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded ticks and score detection thresholds.")
+    parser.add_argument("--pcp", metavar="PATH", help="PCP tick file")
+    parser.add_argument("--basis", metavar="PATH", help="futures basis tick file")
+    parser.add_argument("--irp", metavar="PATH", help="IRP forward tick file")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=list(DEFAULT_THRESHOLDS), help="%% grid")
+    parser.add_argument("--rate", type=float, default=6.75, help="India risk-free rate (%%)")
+    parser.add_argument("--us-rate", type=float, default=5.25, help="US risk-free rate (%%)")
+    parser.add_argument("--lots", type=int, default=1)
+    parser.add_argument("--brokerage", type=float, default=20.0, help="₹ per order")
+    parser.add_argument("--min-profit", type=float, default=None, help="₹ net required to enter")
+    parser.add_argument("--out", metavar="PATH", help="write stats CSV here instead of stdout")
+    args = parser.parse_args(argv)
+    if not (args.pcp or args.basis or args.irp):
+        parser.error("give at least one of --pcp, --basis, --irp")
+
+    stats = run_backtest(
+        pcp=load_ticks(args.pcp) if args.pcp else None,
+        basis=load_ticks(args.basis) if args.basis else None,
+        irp=load_ticks(args.irp) if args.irp else None,
+        thresholds=args.thresholds, r=args.rate / 100, r_us=args.us_rate / 100,
+        lots=args.lots, brokerage=args.brokerage, min_profit=args.min_profit)
+    if args.out:
+        stats.to_csv(args.out, index=False)
+    else:
+        stats.to_csv(sys.stdout, index=False, float_format="%.4f")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
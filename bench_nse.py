@@ -0,0 +1,377 @@
+"""Chain-fetch benchmark against a local NSE stand-in server.
+
+The stand-in behaves like the parts of nseindia.com that matter here: API
+calls without the cookies set by an HTML page get 401, responses are gzipped
+when asked, a fraction of requests fail with 503, and every new connection
+pays a fixed setup delay standing in for the TCP + TLS handshake.
+
+    python bench_nse.py --requests 200 --handshake-ms 80 --error-rate 0.05
+
+Compares the old per-call urllib fetch with the pooled NSESession and prints
+latency percentiles and success rate for each. ``--parse`` instead times the
+whole-document json.loads parser against the streaming column parser and
+reports peak memory for each. ``--iv`` times the implied-vol / Greeks pass
+and the full-chain parity scan over a synthetic chain of that size
+(``--iv --strikes 1000 --expiries 1`` for one 1000-strike expiry).
+``--universe 5 50 200`` times a full poll cycle
+(cold, then warm), the bulk futures fetch and a scan over that many
+instrument-master underlyings, then the same cycle streamed — each asset scanned as it lands — with one
+underlying held back by ``--straggler-ms``, to show time-to-first-result.
+"""
+import argparse
+import datetime
+import gzip
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from market_data import FALLBACK_FX, FALLBACK_SPOTS, FETCH_DEADLINE_S, FETCH_WORKERS, INSTRUMENTS, NSE_CHUNK_BYTES, \
+    NSE_INDEX_NAMES, STRIKE_STEP, WATCHLIST, ChainCache, NSESession, fetch_futures_curves, \
+    fetch_market_data_concurrent, fetch_nse_chain, iter_market_data_concurrent, nse_chain_path, parse_nse_chain, \
+    parse_nse_chain_stream, standin_futures_curves
+from pricing import bs_price, chain_greeks, smile_deviation
+from scanner import iter_scan, run_scan
+from strategies import pcp_chain_scan
+
+
+def synthetic_nse_chain(asset, n_strikes=120, n_expiries=3, seed=0):
+    """An option-chain payload shaped like NSE's — every field of a real leg,
+    plus the "filtered" near-expiry copy — around the asset's fallback spot."""
+    rng   = random.Random(seed)
+    spot  = FALLBACK_SPOTS[asset]
+    step  = STRIKE_STEP[asset]
+    atm   = round(spot / step) * step
+    start = datetime.date(2026, 11, 5)
+    expiries = [(start + datetime.timedelta(weeks=w)).strftime("%d-%b-%Y") for w in range(n_expiries)]
+    data = []
+    for e_i, expiry in enumerate(expiries):
+        for k_i in range(n_strikes):
+            k  = atm + (k_i - n_strikes // 2) * step
+            tv = spot * 0.005 * (1 + e_i) ** 0.5
+
+            def leg(kind, intrinsic):
+                price = round(max(intrinsic, 0) + tv * rng.uniform(0.8, 1.2), 2)
+                return {
+                    "strikePrice": k, "expiryDate": expiry, "underlying": asset,
+                    "identifier": "OPTIDX{}{}{}{:.2f}".format(asset, expiry, kind, k),
+                    "openInterest": rng.randint(0, 50000), "changeinOpenInterest": rng.randint(-500, 500),
+                    "pchangeinOpenInterest": round(rng.uniform(-5, 5), 6),
+                    "totalTradedVolume": rng.randint(0, 90000), "impliedVolatility": round(rng.uniform(8, 30), 2),
+                    "lastPrice": price, "change": round(rng.uniform(-20, 20), 6), "pChange": round(rng.uniform(-9, 9), 6),
+                    "totalBuyQuantity": rng.randint(0, 10 ** 6), "totalSellQuantity": rng.randint(0, 10 ** 6),
+                    "bidQty": rng.randint(0, 5000), "bidprice": round(price - 0.05, 2),
+                    "askQty": rng.randint(0, 5000), "askPrice": round(price + 0.05, 2), "underlyingValue": spot,
+                }
+            data.append({"strikePrice": k, "expiryDate": expiry, "CE": leg("CE", spot - k), "PE": leg("PE", k - spot)})
+    near = [d for d in data if d["expiryDate"] == expiries[0]]
+    return {
+        "records": {"expiryDates": expiries, "data": data, "timestamp": "17-Oct-2026 15:30:00",
+                    "underlyingValue": spot, "strikePrices": sorted({d["strikePrice"] for d in data})},
+        "filtered": {"data": near, "CE": {"totOI": 0, "totVol": 0}, "PE": {"totOI": 0, "totVol": 0}},
+    }
+
+
+def synthetic_nse_futures(assets, seed=0):
+    """liveEquity-derivatives payloads for ``assets`` — {"stock_fut": ..., "nse50_fut": ...} —
+    near / mid / far contracts around each fallback spot."""
+    nse_names = {v: k for k, v in NSE_INDEX_NAMES.items()}
+    curves    = standin_futures_curves({a: FALLBACK_SPOTS[a] for a in assets}, seed=seed)
+    payloads  = {"stock_fut": [], "nse50_fut": []}
+    for row in curves.itertuples(index=False):
+        index = row.asset in nse_names
+        payloads["nse50_fut" if index else "stock_fut"].append({
+            "instrumentType": "FUTIDX" if index else "FUTSTK", "underlying": nse_names.get(row.asset, row.asset),
+            "expiryDate": row.expiry, "lastPrice": row.futures, "underlyingValue": row.spot,
+            "openInterest": row.oi,
+        })
+    return {index: {"data": rows} for index, rows in payloads.items()}
+
+
+# ── STAND-IN SERVER ───────────────────────────────────────────────────────────
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version        = "HTTP/1.1"   # keep-alive, like the real site
+    disable_nagle_algorithm = True         # headers and body go out in separate writes
+
+    def setup(self):
+        self.server.connections += 1
+        time.sleep(self.server.handshake_s)
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if body and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.server.gzipped.get(body) or gzip.compress(body)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+    def do_GET(self):
+        time.sleep(self.server.service_s)
+        path, _, query = self.path.partition("?")
+        if not path.startswith("/api/"):
+            self._send(200, b"<html>option chain</html>", "text/html", {"Set-Cookie": "nsit=standin; Path=/"})
+            return
+        if "nsit=standin" not in self.headers.get("Cookie", ""):
+            self._send(401, b'{"error": "unauthorised"}')
+            return
+        if self.server.rng.random() < self.server.error_rate:
+            self._send(503, b'{"error": "busy"}')
+            return
+        params = urllib.parse.parse_qs(query)
+        if path == "/api/liveEquity-derivatives":
+            self._send(200, self.server.futures[params.get("index", ["stock_fut"])[0]])
+            return
+        symbol = params.get("symbol", ["NIFTY"])[0]
+        time.sleep(self.server.stragglers.get(symbol, 0.0))
+        self._send(200, self.server.payloads[symbol])
+
+
+def start_standin(handshake_ms=80.0, service_ms=15.0, error_rate=0.05, seed=0, assets=WATCHLIST, n_strikes=120):
+    """Start the stand-in serving chains and futures for ``assets`` on a free
+    localhost port; returns the server (``.base_url``)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.daemon_threads = True
+    server.handshake_s    = handshake_ms / 1000
+    server.service_s      = service_ms / 1000
+    server.error_rate     = error_rate
+    server.rng            = random.Random(seed)
+    server.bytes_sent     = 0
+    server.connections    = 0
+    server.stragglers     = {}   # symbol → extra seconds before answering
+    server.payloads       = {a: json.dumps(synthetic_nse_chain(a, n_strikes)).encode() for a in assets}
+    server.futures        = {k: json.dumps(v).encode() for k, v in synthetic_nse_futures(assets, seed).items()}
+    server.gzipped        = {body: gzip.compress(body)   # a CDN caches these
+                             for body in list(server.payloads.values()) + list(server.futures.values())}
+    server.base_url       = "http://127.0.0.1:{}".format(server.server_address[1])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ── CLIENTS ───────────────────────────────────────────────────────────────────
+def urllib_fetch(base_url, asset, cookie=None):
+    """The previous fetch path: new connection per call, no gzip, and no cookies
+    unless one is handed in (to isolate connection cost from rejections)."""
+    try:
+        headers = {"User-Agent": "Mozilla/5.0", "Accept": "application/json", "Referer": "https://www.nseindia.com/"}
+        if cookie:
+            headers["Cookie"] = cookie
+        req = urllib.request.Request("{}{}?symbol={}".format(base_url, nse_chain_path(asset), asset), headers=headers)
+        with urllib.request.urlopen(req, timeout=8) as resp:
+            return parse_nse_chain(json.loads(resp.read().decode()))
+    except Exception:
+        return None
+
+
+def session_fetch(session, asset):
+    try:
+        chunks = session.iter_chunks(nse_chain_path(asset), params={"symbol": asset})
+        result = parse_nse_chain_stream(chunks)
+        for _ in chunks:
+            pass
+        return result
+    except Exception:
+        return None
+
+
+def run_client(name, fetch, n_requests, workers):
+    assets = WATCHLIST
+    lat, ok = [], 0
+
+    def one(i):
+        t0 = time.perf_counter()
+        result = fetch(assets[i % len(assets)])
+        return (time.perf_counter() - t0) * 1000, result is not None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for ms, success in pool.map(one, range(n_requests)):
+            lat.append(ms)
+            ok += success
+    wall = time.perf_counter() - t0
+    return {"client": name, "requests": n_requests, "success_rate": round(ok / n_requests, 3),
+            "p50_ms": round(float(np.percentile(lat, 50)), 1), "p95_ms": round(float(np.percentile(lat, 95)), 1),
+            "wall_s": round(wall, 2)}
+
+
+# ── PARSE BENCHMARK ───────────────────────────────────────────────────────────
+def _parse_whole(body):
+    return parse_nse_chain(json.loads(body.decode()))
+
+
+def _parse_stream(body):
+    return parse_nse_chain_stream(body[i:i + NSE_CHUNK_BYTES] for i in range(0, len(body), NSE_CHUNK_BYTES))
+
+
+def bench_parse(n_strikes, n_expiries, repeat=5):
+    """Parse time (best of ``repeat``) and peak traced memory for both parsers."""
+    body = json.dumps(synthetic_nse_chain("NIFTY", n_strikes, n_expiries)).encode()
+    a, b = _parse_whole(body), _parse_stream(body)
+    for x, y in zip(a[1].to_frames(), b[1].to_frames()):
+        assert x.equals(y), "streaming parse differs from json.loads path"
+    results = []
+    for name, parse in (("json.loads document", _parse_whole), ("streaming columns", _parse_stream)):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            parse(body)
+            times.append((time.perf_counter() - t0) * 1000)
+        tracemalloc.start()
+        parse(body)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append({"parser": name, "payload_mb": round(len(body) / 2 ** 20, 2), "rows": len(a[1]),
+                        "parse_ms": round(min(times), 1), "peak_mb": round(peak / 2 ** 20, 2)})
+    return results
+
+
+# ── IV BENCHMARK ──────────────────────────────────────────────────────────────
+def bench_iv(n_strikes, n_expiries, repeat=20, r=0.0675):
+    """IV + Greeks, smile check and full PCP scan (European, and American with one dividend) on one chain."""
+    spot, chain, _, _ = parse_nse_chain(synthetic_nse_chain("NIFTY", n_strikes, n_expiries))
+    T = (np.arange(len(chain.expiries)) * 7 + 19)[chain.expiry_idx] / 365.0   # the payload's weekly expiries
+
+    def best_ms(fn):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - t0) * 1000)
+        return round(min(times), 2)
+
+    g   = chain_greeks(spot, chain, r, T)
+    fwd = spot * np.exp(r * T)
+    ok  = ~np.isnan(g["call_iv"])
+    err = np.abs(bs_price(spot, chain.strike[ok], T[ok], r, g["call_iv"][ok], True) - chain.call_last[ok])
+    today = datetime.date(2026, 10, 17)
+    return {"rows": len(chain), "legs": 2 * len(chain),
+            "iv_greeks_ms": best_ms(lambda: chain_greeks(spot, chain, r, T)),
+            "smile_ms": best_ms(lambda: smile_deviation(chain, g["call_iv"], g["put_iv"], fwd)),
+            "pcp_scan_ms": best_ms(lambda: pcp_chain_scan(spot, chain, r, 75, today=today)),
+            "pcp_american_ms": best_ms(lambda: pcp_chain_scan(spot, chain, r, 75, today=today,
+                                                              dividends=([0.02], [spot * 0.005]), american=True)),
+            "solved": int(ok.sum() + (~np.isnan(g["put_iv"])).sum()),
+            "max_reprice_err": float(err.max()) if len(err) else 0.0,
+            "stale_rows": int(pcp_chain_scan(spot, chain, r, 75, today=today)["stale"].sum())}
+
+
+# ── UNIVERSE BENCHMARK ────────────────────────────────────────────────────────
+def universe_of(n):
+    """The first ``n`` underlyings by tier: watchlist, then NIFTY 50, then the rest of F&O."""
+    return sorted(INSTRUMENTS, key=lambda s: INSTRUMENTS.tier[INSTRUMENTS.index[s]])[:n]
+
+
+def bench_universe(sizes, handshake_ms, service_ms, error_rate, straggler_ms=2000.0, n_strikes=40):
+    """Poll-cycle and scan time at each universe size, against a fresh stand-in."""
+    results = []
+    for n in sizes:
+        assets  = universe_of(n)
+        server  = start_standin(handshake_ms, service_ms, error_rate, assets=assets, n_strikes=n_strikes)
+        session = NSESession(base_url=server.base_url, backoff_s=0.05)
+        cache   = ChainCache(loader=lambda a, s=session: fetch_nse_chain(a, s))
+        cycles  = []
+        for _ in range(2):   # cold: handshakes + cookie priming; warm: pooled connections
+            t0 = time.perf_counter()
+            data, latency = fetch_market_data_concurrent(assets, {}, FETCH_DEADLINE_S, cache)
+            cycles.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        curves     = fetch_futures_curves(session)
+        futures_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        opps, _ = run_scan(data, FALLBACK_FX, assets, settings={"only_profitable": False}, futures=curves)
+        scan_ms = (time.perf_counter() - t0) * 1000
+
+        # Streamed, with the first underlying held back: results shouldn't wait for it.
+        server.stragglers[assets[0]] = straggler_ms / 1000
+        t0 = time.perf_counter()
+        first_ms = None
+        arrivals = ((a, d) for a, d, _ in iter_market_data_concurrent(assets, {}, FETCH_DEADLINE_S, cache))
+        for _, _, unit_opps, _ in iter_scan(arrivals, FALLBACK_FX, assets, ["Put-Call Parity", "Futures Basis"],
+                                            settings={"only_profitable": False}, futures=curves):
+            if unit_opps and first_ms is None:
+                first_ms = (time.perf_counter() - t0) * 1000
+        stream_ms = (time.perf_counter() - t0) * 1000
+        results.append({"assets": len(assets), "cold_cycle_ms": round(cycles[0], 1),
+                        "warm_cycle_ms": round(cycles[1], 1),
+                        "fetch_p95_ms": round(float(np.percentile(list(latency.values()), 95)), 1),
+                        "live_chains": sum(d[5] == "nse" for d in data.values()),
+                        "futures_ms": round(futures_ms, 1),
+                        "futures_contracts": 0 if curves is None else len(curves),
+                        "scan_ms": round(scan_ms, 1), "opportunities": len(opps),
+                        "stream_first_result_ms": round(first_ms, 1), "stream_total_ms": round(stream_ms, 1),
+                        "connections": server.connections})
+        server.shutdown()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chain fetches against a local NSE stand-in.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--handshake-ms", type=float, default=80.0, help="per-connection setup cost")
+    parser.add_argument("--service-ms", type=float, default=15.0, help="per-request server time")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="fraction of API calls answered 503")
+    parser.add_argument("--parse", action="store_true", help="benchmark payload parsing only (no server)")
+    parser.add_argument("--iv", action="store_true", help="benchmark the implied-vol / Greeks pass only (no server)")
+    parser.add_argument("--strikes", type=int, default=120, help="--parse/--iv: strikes per expiry")
+    parser.add_argument("--expiries", type=int, default=18, help="--parse/--iv: expiries in the payload")
+    parser.add_argument("--universe", type=int, nargs="+", metavar="N",
+                        help="benchmark a poll cycle + scan over the first N underlyings (e.g. 5 50 200)")
+    parser.add_argument("--straggler-ms", type=float, default=2000.0,
+                        help="--universe: extra delay on one underlying in the streamed cycle")
+    args = parser.parse_args(argv)
+
+    if args.parse:
+        for stats in bench_parse(args.strikes, args.expiries):
+            sys.stdout.write(json.dumps(stats) + "\n")
+        return 0
+    if args.iv:
+        sys.stdout.write(json.dumps(bench_iv(args.strikes, args.expiries)) + "\n")
+        return 0
+
+    socket.setdefaulttimeout(10)
+    if args.universe:
+        for stats in bench_universe(args.universe, args.handshake_ms, args.service_ms, args.error_rate,
+                                    args.straggler_ms):
+            sys.stdout.write(json.dumps(stats) + "\n")
+        return 0
+
+    results = []
+    for name in ("urllib", "urllib+cookie", "session"):
+        server = start_standin(args.handshake_ms, args.service_ms, args.error_rate)
+        if name == "urllib":
+            fetch = lambda a, base=server.base_url: urllib_fetch(base, a)
+        elif name == "urllib+cookie":
+            fetch = lambda a, base=server.base_url: urllib_fetch(base, a, cookie="nsit=standin")
+        else:
+            session = NSESession(base_url=server.base_url, backoff_s=0.05)
+            fetch = lambda a, s=session: session_fetch(s, a)
+        stats = run_client(name, fetch, args.requests, args.workers)
+        stats["kb_sent"]     = round(server.bytes_sent / 1024, 1)
+        stats["connections"] = server.connections
+        results.append(stats)
+        server.shutdown()
+    for stats in results:
+        sys.stdout.write(json.dumps(stats) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
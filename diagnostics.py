@@ -0,0 +1,173 @@
+"""Timing spans and cache counters — where a slow page spends its time.
+
+Code marks the work worth measuring with a span, either as a block or as a
+decorated function:
+
+    with PROFILER.span("chart.pcp_payoff"):
+        fig = go.Figure(...)
+
+    @timed("nse.fetch_chain")
+    def fetch_nse_chain(asset_name, session=None): ...
+
+Each span name accumulates count / total / max / last milliseconds. Caches
+that already keep hit and miss counts (ChainCache.counters, an lru_cache's
+cache_info()) are registered as counter sources and read only when the
+stats are exported, so they cost nothing per hit.
+
+Off by default; ARB_PROFILE=1, ``scanner.py --profile`` or the app's
+diagnostics toggle turns it on. Disabled, a span is one attribute check
+returning a shared no-op context manager. Stats are process-wide: the
+poller's fetch threads and every app session feed the same table.
+Export with ``snapshot()`` (JSON-able dict) or ``prometheus()`` (text
+exposition format).
+"""
+import functools
+import os
+import threading
+import time
+
+PROMETHEUS_PREFIX = "arb"
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "t0")
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, (time.perf_counter() - self.t0) * 1000)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Profiler:
+    """Span timings and event counters, safe to feed from any thread."""
+
+    def __init__(self, enabled=False):
+        self.enabled    = enabled
+        self.started_at = time.time()
+        self._spans     = {}   # name → [count, total_ms, max_ms, last_ms]
+        self._counts    = {}   # name → events counted with count()
+        self._sources   = {}   # prefix → callable returning {counter: number}
+        self._lock      = threading.Lock()
+
+    # ── recording ─────────────────────────────────────────────────────────────
+    def span(self, name):
+        """Context manager timing its block under ``name`` (a no-op while disabled)."""
+        return _Span(self, name) if self.enabled else _NO_SPAN
+
+    def record(self, name, ms):
+        """Add one measured duration to ``name``'s stats."""
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                self._spans[name] = [1, ms, ms, ms]
+            else:
+                stats[0] += 1
+                stats[1] += ms
+                stats[2]  = max(stats[2], ms)
+                stats[3]  = ms
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def register_counters(self, prefix, source):
+        """Read ``source()`` — a {name: number} dict — at export time, as ``prefix.name`` counters."""
+        self._sources[prefix] = source
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counts.clear()
+            self.started_at = time.time()
+
+    # ── export ────────────────────────────────────────────────────────────────
+    def counters(self):
+        """Own counts plus every registered source, flattened to {name: number}."""
+        with self._lock:
+            out = dict(self._counts)
+        for prefix, source in list(self._sources.items()):
+            try:
+                values = source()
+            except Exception:
+                continue
+            out.update({"{}.{}".format(prefix, k): v for k, v in values.items()
+                        if isinstance(v, (int, float)) and not isinstance(v, bool)})
+        return out
+
+    def snapshot(self):
+        """{"enabled", "since", "spans": {name: stats}, "counters": {name: n}}, spans by total time."""
+        with self._lock:
+            spans = {name: list(s) for name, s in self._spans.items()}
+        return {
+            "enabled": self.enabled,
+            "since":   self.started_at,
+            "spans":   {name: {"count": c, "total_ms": round(total, 3), "mean_ms": round(total / c, 3),
+                               "max_ms": round(mx, 3), "last_ms": round(last, 3)}
+                        for name, (c, total, mx, last) in sorted(spans.items(), key=lambda kv: -kv[1][1])},
+            "counters": self.counters(),
+        }
+
+    def prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Stats in the Prometheus text exposition format."""
+        snap  = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for label, key, value in samples:
+                lines.append('{}_{}{{{}="{}"}} {}'.format(prefix, name, label, _escape_label(key), value))
+
+        spans = snap["spans"]
+        family("span_duration_ms_total", "counter", "Cumulative milliseconds spent in each instrumented span.",
+               [("span", k, s["total_ms"]) for k, s in spans.items()])
+        family("span_calls_total", "counter", "Completed calls of each instrumented span.",
+               [("span", k, s["count"]) for k, s in spans.items()])
+        family("span_duration_ms_max", "gauge", "Slowest single call of each span since the last reset.",
+               [("span", k, s["max_ms"]) for k, s in spans.items()])
+        family("span_duration_ms_last", "gauge", "Most recent call of each span.",
+               [("span", k, s["last_ms"]) for k, s in spans.items()])
+        family("events_total", "counter", "Cache hits, misses and other counted events.",
+               [("event", k, v) for k, v in sorted(snap["counters"].items())])
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+PROFILER = Profiler(enabled=os.environ.get("ARB_PROFILE", "") not in ("", "0"))
+
+
+def timed(name, profiler=PROFILER):
+    """Decorator: time every call of the function under span ``name``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return fn(*args, **kwargs)
+            with _Span(profiler, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
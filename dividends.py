@@ -0,0 +1,66 @@
+"""Dividend calendar — cash dividends per underlying, for dividend-aware parity.
+
+Loaded once from a local file (``data/dividends.csv``, or a JSON list of
+records; ARB_DIVIDENDS overrides the path) with one row per dividend:
+
+    symbol, ex_date (YYYY-MM-DD), amount (₹ per share)
+
+Announced dividends from the exchange's corporate-action feed, plus the
+expected ones (last year's date and amount) for stocks that pay on a
+regular cycle. Indices carry none: their options are priced off futures,
+which already have the dividends in them. A missing file means no
+dividends anywhere, i.e. the old no-dividend parity.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DIVIDENDS_PATH = os.environ.get(
+    "ARB_DIVIDENDS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "dividends.csv"))
+DIVIDEND_COLUMNS = ["symbol", "ex_date", "amount"]
+
+
+class DividendCalendar:
+    """Ex-dates and amounts per symbol, each sorted by ex-date."""
+
+    def __init__(self, frame):
+        missing = [c for c in DIVIDEND_COLUMNS if c not in frame.columns]
+        if missing:
+            raise ValueError("dividend calendar is missing columns: {}".format(", ".join(missing)))
+        frame = frame.assign(symbol=frame["symbol"].astype(str).str.strip().str.upper(),
+                             ex_date=pd.to_datetime(frame["ex_date"]).dt.date,
+                             amount=frame["amount"].astype(float)).sort_values(["symbol", "ex_date"])
+        # Content hash: caches built from the calendar are keyed on it.
+        self.digest = hashlib.sha1(frame[DIVIDEND_COLUMNS].to_csv(index=False).encode()).hexdigest()[:16]
+        self.by_symbol = {sym: (list(g["ex_date"]), g["amount"].to_numpy()) for sym, g in frame.groupby("symbol")}
+
+    @classmethod
+    def load(cls, path=DIVIDENDS_PATH):
+        """From a CSV file or a JSON list of records; an empty calendar if the file is absent."""
+        if not os.path.exists(path):
+            return cls(pd.DataFrame(columns=DIVIDEND_COLUMNS))
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                return cls(pd.DataFrame(json.load(f)))
+        return cls(pd.read_csv(path))
+
+    def __contains__(self, symbol):
+        return symbol in self.by_symbol
+
+    def schedule(self, symbol, today=None):
+        """(times, amounts) of dividends going ex after ``today``: years from today, ₹ per share."""
+        today = today or datetime.date.today()
+        dates, amounts = self.by_symbol.get(symbol, ([], np.empty(0)))
+        days = np.array([(d - today).days for d in dates], dtype=float)
+        ahead = days > 0
+        return days[ahead] / 365.0, amounts[ahead]
+
+    def upcoming(self, symbol, today=None, until=None):
+        """[(ex_date, amount)] after ``today`` and up to ``until`` (inclusive), for display."""
+        today = today or datetime.date.today()
+        dates, amounts = self.by_symbol.get(symbol, ([], np.empty(0)))
+        return [(d, float(a)) for d, a in zip(dates, amounts) if d > today and (until is None or d <= until)]
@@ -0,0 +1,136 @@
+"""Figure layer — cached Plotly figures, lean trace payloads and in-place refresh.
+
+Streamlit serializes every figure it draws and ships the whole spec over the
+websocket on every rerun, so the cost of a chart is building it plus the size
+of its data arrays. Three things keep both down:
+
+* ``FigureCache`` — process-wide LRU of built figures keyed on a hash of the
+  builder's name and inputs. A rerun whose chart inputs didn't change gets
+  the same figure back without building it.
+* ``decimate()`` / ``lean_scatter()`` — line traces sent as float32, and a
+  flat one (the locked net P&L line, every leg when there's no signal) as
+  its two endpoints instead of 300 samples.
+* ``LiveFigure`` — one chart redrawn many times in a run (the streaming
+  scanner's comparison chart) keeps its figure and only has its traces' data
+  and title replaced while the layout stays put.
+
+Nothing in here touches Streamlit; cached figures are shared by every
+session, so callers must not mutate them (st.plotly_chart doesn't).
+"""
+import collections
+import functools
+import hashlib
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+
+from diagnostics import PROFILER
+
+FIGURE_CACHE_SIZE = 64     # figures kept process-wide, least recently used dropped first
+DECIMATE_RTOL     = 1e-9   # spread, relative to the series' magnitude, below which it counts as flat
+
+
+def input_hash(*parts):
+    """Stable digest of a builder's inputs (scalars, strings, tuples)."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def decimate(x, y, rtol=DECIMATE_RTOL):
+    """(x, y) as float32, and only the two endpoints if ``y`` is flat.
+
+    float32 still resolves ₹0.01 on prices and ₹1 on P&L up to ~10⁷ and
+    halves the payload; a flat series drawn through its endpoints is the
+    same line.
+    """
+    x, y = np.asarray(x, dtype=np.float32), np.asarray(y, dtype=np.float32)
+    PROFILER.count("figures.points_in", len(y))
+    if len(y) > 2 and np.ptp(y) <= rtol * max(float(np.abs(y).max()), 1.0):
+        x, y = x[[0, -1]], y[[0, -1]]
+    PROFILER.count("figures.points_out", len(y))
+    return x, y
+
+
+def lean_scatter(x, y, **kwargs):
+    """go.Scatter over the decimated series — for ``mode="lines"`` traces.
+
+    A flat trace keeps no interior points to hover on; under
+    ``hovermode="x unified"`` set ``hoverdistance=-1`` so it still shows.
+    """
+    x, y = decimate(x, y)
+    return go.Scatter(x=x, y=y, **kwargs)
+
+
+class FigureCache:
+    """Built figures by input hash, bounded LRU, safe to share between sessions."""
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize  = maxsize
+        self._figs    = collections.OrderedDict()   # input hash → figure
+        self._lock    = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, build):
+        """The figure cached under ``key`` (an input_hash), building it with ``build()`` on a miss."""
+        with self._lock:
+            fig = self._figs.get(key)
+            if fig is not None:
+                self._figs.move_to_end(key)
+                self.counters["hits"] += 1
+                return fig
+            self.counters["misses"] += 1
+        fig = build()   # outside the lock: two sessions missing at once both build, last one wins
+        with self._lock:
+            self._figs[key] = fig
+            self._figs.move_to_end(key)
+            while len(self._figs) > self.maxsize:
+                self._figs.popitem(last=False)
+                self.counters["evictions"] += 1
+        return fig
+
+    def cached(self, name):
+        """Decorator: cache a figure builder on its arguments, timing misses under span ``name``."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                def build():
+                    with PROFILER.span(name):
+                        return fn(*args, **kwargs)
+                return self.get(input_hash(name, args, sorted(kwargs.items())), build)
+            return wrapper
+        return decorate
+
+    def clear(self):
+        with self._lock:
+            self._figs.clear()
+
+    def __len__(self):
+        return len(self._figs)
+
+
+class LiveFigure:
+    """One chart redrawn in place: its frame rebuilt only when its shape changes.
+
+    ``draw(shape, build, fill)`` makes the frame (traces, axes, styling) with
+    ``build()`` on the first draw and whenever ``shape`` — e.g. the number of
+    bars — differs from the last one, then sets the data with ``fill(fig)``
+    in one batch update. Not shared: one per redraw loop.
+    """
+
+    def __init__(self):
+        self.fig   = None
+        self.shape = None
+
+    def draw(self, shape, build, fill):
+        if self.fig is None or shape != self.shape:
+            self.fig, self.shape = build(), shape
+            PROFILER.count("figures.live_rebuilds")
+        else:
+            PROFILER.count("figures.live_updates")
+        with self.fig.batch_update():
+            fill(self.fig)
+        return self.fig
+
+
+FIGURES = FigureCache()
+PROFILER.register_counters("figures.cache", lambda: FIGURES.counters)
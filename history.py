@@ -0,0 +1,155 @@
+"""Opportunity history — every scan snapshot appended to a local SQLite store.
+
+Writes go through a queue drained by one writer thread in batched
+transactions, so recording a scan never blocks a page render. Reads open
+their own connection (WAL mode lets them run alongside the writer).
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+HISTORY_DB_PATH = os.environ.get(
+    "ARB_HISTORY_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "opportunity_history.sqlite3"))
+
+HISTORY_COLUMNS = ["ts", "asset", "strategy", "type", "strike", "expiry", "days",
+                   "spot", "gap", "gross", "friction", "net_pnl", "ann_return", "profitable", "data_src"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS opportunities (
+    ts         REAL    NOT NULL,
+    asset      TEXT    NOT NULL,
+    strategy   TEXT    NOT NULL,
+    type       TEXT    NOT NULL,
+    strike     REAL,
+    expiry     TEXT,
+    days       INTEGER,
+    spot       REAL,
+    gap        REAL,
+    gross      REAL,
+    friction   REAL,
+    net_pnl    REAL,
+    ann_return REAL,
+    profitable INTEGER,
+    data_src   TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_opp_snapshot ON opportunities (ts, asset, strategy, type, expiry);
+CREATE INDEX IF NOT EXISTS ix_opp_series ON opportunities (asset, strategy, ts);
+"""
+
+
+def _row(opp, ts):
+    expiry = opp.get("expiry")
+    return (
+        ts, opp["asset"], opp["strategy"], opp["type"], opp.get("strike"),
+        expiry.isoformat() if hasattr(expiry, "isoformat") else expiry,
+        opp.get("days"), opp.get("spot"), opp.get("gap"), opp.get("gross"), opp.get("friction"),
+        opp.get("net_pnl"), opp.get("ann_return"), int(bool(opp.get("profitable"))), opp.get("data_src"),
+    )
+
+
+class OpportunityHistory:
+    """Append-only opportunity store with a time-series query API."""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self._queue  = queue.Queue()
+        self._thread = threading.Thread(target=self._writer, name="opportunity-history-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ── writes ────────────────────────────────────────────────────────────────
+    def append_scan(self, opportunities, ts=None):
+        """Queue one scan's opportunities. Re-recording the same snapshot ts is a no-op."""
+        ts = time.time() if ts is None else ts
+        rows = [_row(o, ts) for o in opportunities]
+        if rows:
+            self._queue.put(rows)
+
+    def flush(self):
+        """Block until every queued scan has been written."""
+        self._queue.join()
+
+    def _writer(self):
+        conn = self._connect()
+        while True:
+            batches = [self._queue.get()]
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO opportunities VALUES ({})".format(",".join("?" * len(HISTORY_COLUMNS))),
+                        [row for batch in batches for row in batch])
+            except sqlite3.Error:
+                pass
+            for _ in batches:
+                self._queue.task_done()
+
+    # ── reads ─────────────────────────────────────────────────────────────────
+    def query(self, asset=None, strategy=None, since=None, until=None):
+        """Raw rows as a DataFrame, oldest first. ``since``/``until`` are epoch seconds."""
+        clauses, params = [], []
+        for col, op, val in (("asset", "=", asset), ("strategy", "=", strategy),
+                             ("ts", ">=", since), ("ts", "<=", until)):
+            if val is not None:
+                clauses.append("{} {} ?".format(col, op))
+                params.append(val)
+        sql = "SELECT * FROM opportunities"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts"
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        df["time"] = pd.to_datetime(df["ts"], unit="s")
+        return df
+
+    def series(self, asset, strategy, since=None, until=None):
+        """Best gap / net P&L per scan for one asset and strategy, indexed by scan time."""
+        df = self.query(asset, strategy, since, until)
+        if df.empty:
+            return pd.DataFrame(columns=["gap", "net_pnl", "ann_return", "profitable"])
+        best = df.loc[df.groupby("ts")["net_pnl"].idxmax()]
+        return best.set_index("time")[["gap", "net_pnl", "ann_return", "profitable"]]
+
+    def episodes(self, asset, strategy, since=None, until=None, max_gap_s=300.0):
+        """Runs of consecutive profitable scans — how long a gap lasted and how often it came back.
+
+        A run breaks on an unprofitable scan or when scans are more than
+        ``max_gap_s`` apart. Returns one row per episode: start, end, duration_s,
+        scans, peak_net_pnl.
+        """
+        s = self.series(asset, strategy, since, until)
+        cols = ["start", "end", "duration_s", "scans", "peak_net_pnl"]
+        if s.empty:
+            return pd.DataFrame(columns=cols)
+        ts         = s.index.to_series()
+        profitable = s["profitable"].astype(bool)
+        new_run    = profitable & (~profitable.shift(fill_value=False) | (ts.diff().dt.total_seconds() > max_gap_s))
+        run_id     = new_run.cumsum()[profitable]
+        if run_id.empty:
+            return pd.DataFrame(columns=cols)
+        grouped = s[profitable].groupby(run_id.values)
+        out = pd.DataFrame({
+            "start":        grouped.apply(lambda g: g.index.min()),
+            "end":          grouped.apply(lambda g: g.index.max()),
+            "scans":        grouped.size(),
+            "peak_net_pnl": grouped["net_pnl"].max(),
+        })
+        out["duration_s"] = (out["end"] - out["start"]).dt.total_seconds()
+        return out[cols].reset_index(drop=True)
@@ -0,0 +1,133 @@
+"""Instrument master — contract specs for every NSE F&O underlying.
+
+Loaded once from a local contract file (``data/instruments.csv``, or a JSON
+list of records; ARB_INSTRUMENTS overrides the path) with one row per
+underlying:
+
+    symbol, kind (INDEX / STOCK), tier, lot_size, strike_step, fallback_spot,
+    yf_ticker, expiries
+
+``tier`` orders the universes: 1 is the watchlist, 2 adds the rest of the
+NIFTY 50 and the other index underlyings, 3 is the full F&O list.
+``expiries`` is optional — semicolon-separated NSE dates ("25-Nov-2026") for
+contracts off the standard cycle; blank means the monthly last-Thursday cycle.
+NSE revises lot sizes a few times a year, so refresh the file from the
+exchange's contract master rather than editing the code.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from strategies import NSE_EXPIRY_FORMAT, monthly_expiries
+
+INSTRUMENTS_PATH = os.environ.get(
+    "ARB_INSTRUMENTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "instruments.csv"))
+INSTRUMENT_COLUMNS = ["symbol", "kind", "tier", "lot_size", "strike_step", "fallback_spot", "yf_ticker", "expiries"]
+REQUIRED_COLUMNS   = ["symbol", "kind", "lot_size", "strike_step", "fallback_spot", "yf_ticker"]
+
+UNIVERSES = {                      # name → (label, highest tier included)
+    "watchlist": ("Watchlist",          1),
+    "nifty50":   ("NIFTY 50 + indices", 2),
+    "fno":       ("All F&O",            3),
+}
+
+
+class InstrumentMaster:
+    """Every underlying's specs in file order, indexed by symbol.
+
+    Columns are NumPy arrays (``lot_size``, ``strike_step``, ``fallback_spot``,
+    ``tier``) or lists (``symbols``, ``kind``, ``yf_ticker``); ``index`` maps a
+    symbol to its row, so a single lookup is one dict probe and ``rows()``
+    maps a whole array of symbols in one hashed pass.
+    """
+
+    def __init__(self, frame):
+        missing = [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+        if missing:
+            raise ValueError("instrument master is missing columns: {}".format(", ".join(missing)))
+        frame = frame.reset_index(drop=True)
+        # Content hash: caches built from the master are keyed on it.
+        self.digest  = hashlib.sha1(frame.to_csv(index=False).encode()).hexdigest()[:16]
+        self.symbols = [str(s).strip().upper() for s in frame["symbol"]]
+        self.index   = {s: i for i, s in enumerate(self.symbols)}
+        if len(self.index) != len(self.symbols):
+            dupes = sorted({s for s in self.symbols if self.symbols.count(s) > 1})
+            raise ValueError("duplicate symbols in instrument master: {}".format(", ".join(dupes)))
+
+        self.kind          = [str(k).strip().upper() for k in frame["kind"]]
+        self.tier          = (frame["tier"] if "tier" in frame.columns else pd.Series(3, index=frame.index)) \
+            .fillna(3).to_numpy(dtype=np.int64)
+        self.lot_size      = frame["lot_size"].to_numpy(dtype=np.int64)
+        self.strike_step   = frame["strike_step"].to_numpy(dtype=float)
+        self.fallback_spot = frame["fallback_spot"].to_numpy(dtype=float)
+        self.yf_ticker     = [str(t).strip() for t in frame["yf_ticker"]]
+        listed = frame["expiries"] if "expiries" in frame.columns else [""] * len(frame)
+        self.listed_expiries = [tuple(e.strip() for e in str(v).split(";") if e.strip())
+                                if isinstance(v, str) else () for v in listed]
+
+    @classmethod
+    def load(cls, path=INSTRUMENTS_PATH):
+        """From a CSV file or a JSON list of records."""
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                frame = pd.DataFrame(json.load(f))
+        else:
+            frame = pd.read_csv(path, dtype={"expiries": str}, keep_default_na=False, na_values={"tier": [""]})
+        return cls(frame)
+
+    # ── lookup ────────────────────────────────────────────────────────────────
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def row(self, symbol):
+        """One underlying's specs as a dict; KeyError if it isn't in the master."""
+        i = self.index[symbol]
+        return {"symbol": symbol, "kind": self.kind[i], "tier": int(self.tier[i]),
+                "lot_size": int(self.lot_size[i]), "strike_step": float(self.strike_step[i]),
+                "fallback_spot": float(self.fallback_spot[i]), "yf_ticker": self.yf_ticker[i],
+                "expiries": list(self.listed_expiries[i])}
+
+    def rows(self, symbols):
+        """Row index per symbol (-1 for unknown), for an array of any length."""
+        return pd.Index(self.symbols).get_indexer(pd.Index(symbols))
+
+    def lot_sizes_for(self, symbols):
+        """Lot size per symbol as floats, NaN where the symbol is unknown."""
+        rows = self.rows(symbols)
+        out  = np.full(len(rows), np.nan)
+        out[rows >= 0] = self.lot_size[rows[rows >= 0]]
+        return out
+
+    def mapping(self, column):
+        """{symbol: value} for one column, values as plain Python scalars."""
+        values = getattr(self, column)
+        return dict(zip(self.symbols, values.tolist() if isinstance(values, np.ndarray) else values))
+
+    def is_index(self, symbol):
+        return self.kind[self.index[symbol]] == "INDEX"
+
+    # ── universes & expiries ──────────────────────────────────────────────────
+    def universe(self, name):
+        """Symbols in a named universe (see UNIVERSES), in file order."""
+        max_tier = UNIVERSES[name][1]
+        return [s for s, t in zip(self.symbols, self.tier) if t <= max_tier]
+
+    def expiries(self, symbol, today=None, n=3):
+        """Next ``n`` expiries (dates) for the underlying: its listed dates, else the monthly cycle."""
+        today  = today or datetime.date.today()
+        listed = self.listed_expiries[self.index[symbol]]
+        if not listed:
+            return monthly_expiries(today, n)
+        dates = sorted(d for d in (datetime.datetime.strptime(e, NSE_EXPIRY_FORMAT).date() for e in listed)
+                       if d > today)
+        return dates[:n]
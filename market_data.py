@@ -0,0 +1,931 @@
+"""Market data layer — NSE option chains, yfinance spots and the background poller.
+
+Nothing in here touches Streamlit: the poller runs on its own thread and every
+page render just reads the latest published snapshot.
+"""
+import codecs
+import datetime
+import functools
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from diagnostics import PROFILER, timed
+from dividends import DIVIDENDS_PATH, DividendCalendar
+from instruments import INSTRUMENTS_PATH, InstrumentMaster
+from option_chain import OptionChain
+from strategies import NSE_EXPIRY_FORMAT, monthly_expiries
+
+# ── CONSTANTS ─────────────────────────────────────────────────────────────────
+# Per-underlying specs come from the instrument master (data/instruments.csv).
+INSTRUMENTS    = InstrumentMaster.load(INSTRUMENTS_PATH)
+DIVIDENDS      = DividendCalendar.load(DIVIDENDS_PATH)   # announced ex-dates (data/dividends.csv)
+LOT_SIZES      = INSTRUMENTS.mapping("lot_size")
+STRIKE_STEP    = INSTRUMENTS.mapping("strike_step")
+FALLBACK_SPOTS = INSTRUMENTS.mapping("fallback_spot")
+TICKER_MAP     = INSTRUMENTS.mapping("yf_ticker")
+NSE_CHAIN_URLS = {s: "https://www.nseindia.com/option-chain" if INSTRUMENTS.is_index(s) else
+                     "https://www.nseindia.com/get-quotes/derivatives?symbol={}".format(s) for s in INSTRUMENTS}
+WATCHLIST      = INSTRUMENTS.universe("watchlist")
+FX_TICKER        = "USDINR=X"
+FALLBACK_FX      = 83.50
+YF_BATCH_SYMBOLS = [TICKER_MAP[a] for a in WATCHLIST] + [FX_TICKER]
+
+FETCH_DEADLINE_S = 10.0   # one budget for a whole fetch cycle, not per asset
+FETCH_WORKERS    = 8
+POLL_INTERVAL_S  = 60.0
+TRACK_TTL_S      = 600.0  # a tracked asset no session has asked for in this long stops being polled
+PUBLISH_EVERY_S  = 0.25   # mid-cycle, republish the assets that have landed at most this often
+
+# One request per segment returns every listed future: all F&O stocks, all expiries.
+NSE_FUTURES_PATHS  = ["/api/liveEquity-derivatives?index=stock_fut", "/api/liveEquity-derivatives?index=nse50_fut"]
+NSE_INDEX_NAMES    = {"NIFTY 50": "NIFTY"}
+FUTURES_CURVE_PATH = os.environ.get("ARB_FUTURES_CURVE")   # stand-in curve file; unset → live NSE
+FUTURES_COLUMNS    = ["asset", "expiry", "futures", "spot", "oi", "lot_size"]
+FUTURES_MAX_STALE_S = 900.0   # after a failed futures fetch, the last good curves are served this long
+
+# USD/INR outright forwards, 1W–1Y. No free live feed: a quote file, else a stand-in curve.
+FORWARD_CURVE_PATH = os.environ.get("ARB_FORWARD_CURVE")   # quote file; unset → simulated curve
+FORWARD_TENORS     = {"1W": 7, "2W": 14, "1M": 30, "2M": 61, "3M": 91, "6M": 182, "9M": 273, "1Y": 365}
+FORWARD_COLUMNS    = ["tenor", "days", "forward"]
+
+CHAIN_TTL_S          = 90.0    # chain older than this is served as stale
+CHAIN_NEGATIVE_TTL_S = 15.0    # after a failed fetch, don't retry NSE for this long
+CHAIN_MAX_STALE_S    = 900.0   # past this, a stale chain is dropped rather than served
+CHAIN_CACHE_PATH     = os.environ.get(
+    "ARB_CHAIN_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chain_cache.pkl"))
+
+
+# ── NSE HTTP SESSION ──────────────────────────────────────────────────────────
+NSE_BASE_URL        = os.environ.get("ARB_NSE_BASE_URL", "https://www.nseindia.com")
+NSE_PRIME_PATH      = "/option-chain"      # any page that sets the nsit / nseappid cookies
+NSE_COOKIE_TTL_S    = 240.0                # NSE's cookies go stale after a few minutes
+NSE_PRIME_BACKOFF_S = 10.0                 # after a failed priming, fail fast instead of re-priming per thread
+NSE_TIMEOUT_S       = (3.05, 8.0)          # (connect, read)
+NSE_CHUNK_BYTES     = 64 * 1024
+NSE_HEADERS         = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate",
+    "Referer": "https://www.nseindia.com/option-chain",
+}
+
+
+class NSESession:
+    """Long-lived pooled HTTP client for the NSE API.
+
+    One requests.Session: keep-alive connections shared by every fetch
+    worker, gzip, and the browser cookies NSE insists on. Cookies are primed
+    from an HTML page on first use, refreshed after ``cookie_ttl_s`` and
+    re-primed once whenever the API answers 401/403. Connection errors and
+    429/5xx are retried with exponential backoff.
+    """
+
+    def __init__(self, base_url=NSE_BASE_URL, pool_size=FETCH_WORKERS, retries=2, backoff_s=0.3,
+                 cookie_ttl_s=NSE_COOKIE_TTL_S):
+        self.base_url     = base_url.rstrip("/")
+        self.cookie_ttl_s = cookie_ttl_s
+        self._primed_at   = None
+        self._prime_error = None   # (time, exception) of the last failed priming
+        self._prime_lock  = threading.Lock()
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff_s,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(NSE_HEADERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def prime(self, force=False):
+        """Load an NSE page to pick up fresh cookies (once per TTL across all threads)."""
+        with self._prime_lock:
+            fresh = self._primed_at is not None and time.time() - self._primed_at < self.cookie_ttl_s
+            if fresh and not force:
+                return
+            if self._prime_error and time.time() - self._prime_error[0] < NSE_PRIME_BACKOFF_S and not force:
+                raise self._prime_error[1]
+            try:
+                self.session.get(self.base_url + NSE_PRIME_PATH, timeout=NSE_TIMEOUT_S,
+                                 headers={"Accept": "text/html,application/xhtml+xml"})
+            except requests.RequestException as exc:
+                self._prime_error = (time.time(), exc)
+                raise
+            self._primed_at, self._prime_error = time.time(), None
+
+    def get(self, path, params=None, stream=False):
+        self.prime()
+        resp = self.session.get(self.base_url + path, params=params, timeout=NSE_TIMEOUT_S, stream=stream)
+        if resp.status_code in (401, 403):
+            resp.close()
+            self.prime(force=True)
+            resp = self.session.get(self.base_url + path, params=params, timeout=NSE_TIMEOUT_S, stream=stream)
+        resp.raise_for_status()
+        return resp
+
+    def get_json(self, path, params=None):
+        return self.get(path, params).json()
+
+    def iter_chunks(self, path, params=None, chunk_size=NSE_CHUNK_BYTES):
+        """Response body as decompressed byte chunks. Exhaust the iterator so
+        the keep-alive connection goes back to the pool."""
+        with self.get(path, params, stream=True) as resp:
+            yield from resp.iter_content(chunk_size)
+
+    def close(self):
+        self.session.close()
+
+
+_nse_session      = None
+_nse_session_lock = threading.Lock()
+
+
+def get_nse_session():
+    """Process-wide NSESession, created on first use."""
+    global _nse_session
+    with _nse_session_lock:
+        if _nse_session is None:
+            _nse_session = NSESession()
+        return _nse_session
+
+
+# ── NSE OPTION CHAIN ──────────────────────────────────────────────────────────
+def parse_nse_chain(data):
+    """Decoded NSE option-chain JSON → (spot, OptionChain, nearest expiry, expiries), None if empty."""
+    records = data["records"]
+    calls, puts, codes = _ChainColumns(), _ChainColumns(), _ExpiryCodes()
+    for rec in records["data"]:
+        _append_record(rec, calls, puts, codes)
+    return _chain_result(records.get("underlyingValue"), records.get("expiryDates"), calls, puts, codes)
+
+
+class _ChainColumns:
+    """Growable preallocated columns for one option side (calls or puts)."""
+
+    def __init__(self, capacity=1024):
+        self.n      = 0
+        self.expiry = np.empty(capacity, dtype=np.int32)   # index into the expiry list
+        self.strike = np.empty(capacity)
+        self.last   = np.empty(capacity)
+        self.oi     = np.empty(capacity)
+        self.volume = np.empty(capacity)
+
+    def append(self, expiry_code, strike, leg):
+        if self.n == len(self.strike):
+            for name in ("expiry", "strike", "last", "oi", "volume"):
+                col = getattr(self, name)
+                grown = np.empty(len(col) * 2, dtype=col.dtype)
+                grown[:self.n] = col
+                setattr(self, name, grown)
+        i = self.n
+        self.expiry[i] = expiry_code
+        self.strike[i] = strike
+        self.last[i]   = leg.get("lastPrice", 0) or 0
+        self.oi[i]     = leg.get("openInterest", 0) or 0
+        self.volume[i] = leg.get("totalTradedVolume", 0) or 0
+        self.n += 1
+
+    def legs(self, remap):
+        n = self.n
+        return {"expiry": remap[self.expiry[:n]], "strike": self.strike[:n], "last": self.last[:n],
+                "oi": self.oi[:n], "volume": self.volume[:n]}
+
+
+class _ExpiryCodes(dict):
+    """Expiry string → code, in order of first appearance."""
+
+    def code(self, expiry):
+        c = self.get(expiry)
+        if c is None:
+            c = self[expiry] = len(self)
+        return c
+
+
+def _append_record(rec, calls, puts, codes):
+    e = codes.code(rec.get("expiryDate"))
+    k = float(rec["strikePrice"])
+    if "CE" in rec:
+        calls.append(e, k, rec["CE"])
+    if "PE" in rec:
+        puts.append(e, k, rec["PE"])
+
+
+def _chain_result(spot, expiries, calls, puts, codes):
+    if spot is None or not expiries or calls.n == 0:
+        return None
+    # Chain rows follow NSE's expiryDates order (nearest first).
+    listed = list(expiries) + [e for e in codes if e not in expiries]
+    remap  = np.array([listed.index(e) for e in codes], dtype=np.int32)
+    chain  = OptionChain.from_legs(round(float(spot), 2), listed, calls.legs(remap), puts.legs(remap))
+    return chain.spot, chain, expiries[0], expiries
+
+
+class _JSONStream:
+    """Pull-parser over a chunked JSON body: raw_decode one value at a time,
+    reading more only when a value runs past the buffered text."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, chunks):
+        self._chunks  = iter(chunks)
+        self._utf8    = codecs.getincrementaldecoder("utf-8")()
+        self.buf, self.pos = "", 0
+
+    def _more(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            raise ValueError("truncated NSE payload")
+        if self.pos > NSE_CHUNK_BYTES:   # drop what's been consumed
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += self._utf8.decode(chunk)
+
+    def peek(self):
+        """Next non-whitespace character, not consumed."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            self._more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("expected {!r} at offset {}".format(char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                self._more()   # value continues in the next chunk
+                continue
+            # A number with only number characters after it ("3850" of "3850.25")
+            # may continue in the next chunk.
+            if isinstance(obj, (int, float)) and not isinstance(obj, bool) \
+                    and not self.buf[end:].strip("0123456789.eE+-"):
+                try:
+                    self._more()
+                    continue
+                except ValueError:
+                    pass
+            self.pos = end
+            return obj
+
+    def members(self):
+        """Yield the keys of the object at the cursor; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def parse_nse_chain_stream(chunks):
+    """Same result as parse_nse_chain, built straight from the response stream.
+
+    Records are decoded one at a time into preallocated NumPy columns, so the
+    payload is never held as a whole document or a list of row dicts. Parsing
+    stops once "records" is complete; the duplicate "filtered" block after it
+    is left unread in ``chunks``.
+    """
+    stream = _JSONStream(chunks)
+    calls, puts, codes = _ChainColumns(), _ChainColumns(), _ExpiryCodes()
+    spot, expiries = None, None
+    for top in stream.members():
+        if top != "records":
+            stream.value()
+            continue
+        for key in stream.members():
+            if key == "underlyingValue":
+                spot = stream.value()
+            elif key == "expiryDates":
+                expiries = stream.value()
+            elif key == "data":
+                stream.expect("[")
+                while stream.peek() != "]":
+                    _append_record(stream.value(), calls, puts, codes)
+                    if stream.peek() == ",":
+                        stream.pos += 1
+                stream.pos += 1
+            else:
+                stream.value()
+        break
+    return _chain_result(spot, expiries, calls, puts, codes)
+
+
+def nse_chain_path(asset_name):
+    is_index = INSTRUMENTS.is_index(asset_name) if asset_name in INSTRUMENTS else asset_name == "NIFTY"
+    return "/api/option-chain-indices" if is_index else "/api/option-chain-equities"
+
+
+@timed("nse.fetch_chain")
+def fetch_nse_chain(asset_name, session=None):
+    try:
+        chunks = (session or get_nse_session()).iter_chunks(nse_chain_path(asset_name), params={"symbol": asset_name})
+        result = parse_nse_chain_stream(chunks)
+        for _ in chunks:   # drain unparsed, keeping the connection reusable
+            pass
+        return result
+    except Exception:
+        return None
+
+
+# ── NSE FUTURES CURVES ────────────────────────────────────────────────────────
+def parse_nse_futures(data):
+    """liveEquity-derivatives JSON → DataFrame (FUTURES_COLUMNS), futures rows only."""
+    rows = [r for r in data.get("data", []) if str(r.get("instrumentType", "")).startswith("FUT")]
+    asset = [NSE_INDEX_NAMES.get(r.get("underlying"), r.get("underlying")) for r in rows]
+    return pd.DataFrame({
+        "asset":    asset,
+        "expiry":   [r.get("expiryDate") for r in rows],
+        "futures":  np.array([r.get("lastPrice") or 0 for r in rows], dtype=float),
+        "spot":     np.array([r.get("underlyingValue") or 0 for r in rows], dtype=float),
+        "oi":       np.array([r.get("openInterest") or 0 for r in rows], dtype=float),
+        "lot_size": np.array([LOT_SIZES.get(a, np.nan) for a in asset], dtype=float),
+    })
+
+
+@timed("nse.fetch_futures")
+def fetch_futures_curves(session=None):
+    """Every listed stock and NIFTY future in one request per segment, None on failure."""
+    try:
+        session = session or get_nse_session()
+        frames  = [parse_nse_futures(session.get_json(path)) for path in NSE_FUTURES_PATHS]
+        curves  = pd.concat(frames, ignore_index=True)
+        return curves if not curves.empty else None
+    except Exception:
+        return None
+
+
+def load_futures_curves(path):
+    """Stand-in curve file (CSV or Parquet): asset, expiry, futures, spot [, oi, lot_size]."""
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    missing = {"asset", "expiry", "futures", "spot"} - set(df.columns)
+    if missing:
+        raise ValueError("{} is missing columns: {}".format(path, ", ".join(sorted(missing))))
+    if "oi" not in df.columns:
+        df["oi"] = np.nan
+    if "lot_size" not in df.columns:
+        df["lot_size"] = df["asset"].map(LOT_SIZES)
+    return df[FUTURES_COLUMNS]
+
+
+def standin_futures_curves(spots, today=None, r=0.0675, carry_noise=0.004, seed=None):
+    """Simulated near / mid / far curves around ``spots`` ({asset: spot}).
+
+    Carry is r plus noise of ``carry_noise`` (annualised), so some contracts
+    sit off fair value. For demos and offline runs; write it out with
+    ``standin_futures_curves(...).to_csv(path, index=False)`` to get a file
+    for ARB_FUTURES_CURVE.
+    """
+    today = today or datetime.date.today()
+    rng   = np.random.default_rng(seed)
+    rows  = []
+    for asset, spot in spots.items():
+        expiries = INSTRUMENTS.expiries(asset, today, 3) if asset in INSTRUMENTS else monthly_expiries(today, 3)
+        for exp in expiries:
+            T = max((exp - today).days, 1) / 365.0
+            carry = r + rng.normal(0, carry_noise)
+            rows.append((asset, exp.strftime(NSE_EXPIRY_FORMAT), round(spot * np.exp(carry * T), 2), spot,
+                         float(rng.integers(1000, 100000)), LOT_SIZES.get(asset, np.nan)))
+    return pd.DataFrame(rows, columns=FUTURES_COLUMNS)
+
+
+def load_forward_curve(path):
+    """Forward quote file (CSV or Parquet): tenor, forward [, days].
+
+    ``days`` defaults from the tenor label (FORWARD_TENORS); rows are
+    returned shortest tenor first, one per tenor (the last quoted wins).
+    """
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    missing = {"tenor", "forward"} - set(df.columns)
+    if missing:
+        raise ValueError("{} is missing columns: {}".format(path, ", ".join(sorted(missing))))
+    if "days" not in df.columns:
+        df["days"] = df["tenor"].map(FORWARD_TENORS)
+    df = df[df["days"].notna() & (df["forward"] > 0)].astype({"days": int})
+    df = df.drop_duplicates("tenor", keep="last")
+    return df.sort_values("days", kind="stable").reset_index(drop=True)[FORWARD_COLUMNS]
+
+
+@functools.lru_cache(maxsize=4)
+def _forward_file(path, mtime_ns):
+    return load_forward_curve(path)
+
+
+def standin_forward_curve(fx, r_d, r_f, tenors=FORWARD_TENORS, premium_noise=0.003, seed=None):
+    """Simulated 1W–1Y forwards around covered parity.
+
+    Each tenor's annualised forward premium is r_d − r_f plus noise of
+    ``premium_noise``, so some points sit off F* and the long end drifts
+    furthest. For demos and offline runs, like standin_futures_curves().
+    """
+    rng  = np.random.default_rng(seed)
+    days = np.array(list(tenors.values()), dtype=float)
+    fwd  = fx * np.exp((r_d - r_f + rng.normal(0, premium_noise, len(days))) * days / 365.0)
+    return pd.DataFrame({"tenor": list(tenors), "days": days.astype(int), "forward": np.round(fwd, 4)})
+
+
+def forward_curve(fx, r_d, r_f, path=FORWARD_CURVE_PATH, seed=None):
+    """(curve, source): the quote file at ``path`` ("file") if set, else the stand-in ("simulated").
+
+    The file is re-read only when its mtime changes, so per-scan calls are cheap.
+    A file that can't be read, or has no usable tenor, gives an empty curve
+    and source "error", with the reason in ``curve.attrs["error"]``.
+    """
+    if path:
+        try:
+            curve = _forward_file(path, os.stat(path).st_mtime_ns)
+            if curve.empty:
+                raise ValueError("{} has no rows with a known tenor and a positive forward".format(path))
+            return curve, "file"
+        except (OSError, ValueError) as exc:
+            curve = pd.DataFrame(columns=FORWARD_COLUMNS)
+            curve.attrs["error"] = str(exc)
+            return curve, "error"
+    return standin_forward_curve(fx, r_d, r_f, seed=seed), "simulated"
+
+
+def _timed_futures_curves(path):
+    t0 = time.perf_counter()
+    if path:
+        curves, source = load_futures_curves(path), "file"
+    else:
+        curves = fetch_futures_curves()
+        source = "nse" if curves is not None else None
+    return curves, source, (time.perf_counter() - t0) * 1000
+
+
+def _carried_futures(snapshot):
+    """(curves, source, fetched_at) from an earlier snapshot, while younger than FUTURES_MAX_STALE_S."""
+    fetched_at = snapshot.get("futures_ts")
+    if snapshot.get("futures") is None or fetched_at is None or time.time() - fetched_at > FUTURES_MAX_STALE_S:
+        return None, None, None
+    return snapshot["futures"], snapshot["futures_src"], fetched_at
+
+
+def _landed_futures(future, carried):
+    """((curves, source, fetched_at), ms) from a finished _timed_futures_curves; ``carried`` if it failed."""
+    if future.exception() is not None:
+        return carried, None
+    curves, source, ms = future.result()
+    return ((curves, source, time.time()) if curves is not None else carried), ms
+
+
+# ── CHAIN CACHE ───────────────────────────────────────────────────────────────
+class ChainCache:
+    """Last good NSE chain per asset, with stale-while-revalidate semantics.
+
+    ``get()`` never touches the network: it returns the last good chain and
+    its age, even past ``ttl_s`` (counted as a stale hit) while the owner —
+    normally the poller — revalidates with ``fetch()``. A failed fetch leaves
+    the good chain in place and records a negative entry that suppresses
+    retries for ``negative_ttl_s``. With ``path`` set, good chains are pickled
+    there so a restarted process starts warm.
+    """
+
+    def __init__(self, ttl_s=CHAIN_TTL_S, negative_ttl_s=CHAIN_NEGATIVE_TTL_S,
+                 max_stale_s=CHAIN_MAX_STALE_S, path=None, loader=None):
+        self.ttl_s          = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.max_stale_s    = max_stale_s
+        self.path           = path
+        self.loader         = loader   # None → fetch_nse_chain, looked up at call time
+        self._good          = {}   # asset → (chain, fetched_at)
+        self._failed_at     = {}   # asset → time of the last failed fetch
+        self._inflight      = {}   # asset → Lock, one fetch per asset at a time
+        self._lock          = threading.Lock()
+        self.counters       = {"hits": 0, "stale_hits": 0, "misses": 0, "negative_hits": 0,
+                               "fetches": 0, "fetch_failures": 0}
+        if path and os.path.exists(path):
+            self.load()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, asset):
+        """(chain, age_s) for the last good chain, or (None, None) if there is none usable."""
+        entry = self._good.get(asset)
+        if entry is None:
+            self._count("misses")
+            return None, None
+        chain, fetched_at = entry
+        age = time.time() - fetched_at
+        if age > self.max_stale_s:
+            self._count("misses")
+            return None, None
+        self._count("hits" if age <= self.ttl_s else "stale_hits")
+        return chain, age
+
+    def fetch(self, asset, force=False):
+        """Revalidate one asset from NSE. Returns True if a new chain was stored.
+
+        Skipped while a negative entry is live (unless ``force``) or while
+        another thread is already fetching the same asset.
+        """
+        failed_at = self._failed_at.get(asset)
+        if not force and failed_at is not None and time.time() - failed_at < self.negative_ttl_s:
+            self._count("negative_hits")
+            return False
+        with self._lock:
+            inflight = self._inflight.setdefault(asset, threading.Lock())
+        if not inflight.acquire(blocking=False):
+            return False
+        try:
+            self._count("fetches")
+            chain = (self.loader or fetch_nse_chain)(asset)
+            if chain is None:
+                self._count("fetch_failures")
+                self._failed_at[asset] = time.time()
+                return False
+            self._good[asset] = (chain, time.time())
+            self._failed_at.pop(asset, None)
+            return True
+        finally:
+            inflight.release()
+
+    def clear_failures(self):
+        """Drop negative entries so the next fetch() goes to NSE regardless."""
+        self._failed_at.clear()
+
+    def has_chains(self):
+        return bool(self._good)
+
+    def stalest_first(self, assets):
+        """``assets`` ordered by the age of their good chain, never-fetched first."""
+        good = dict(self._good)
+        return sorted(assets, key=lambda a: good[a][1] if a in good else float("-inf"))
+
+    def stats(self):
+        """Counters plus per-asset age_s / state ("fresh", "stale", "expired", "failing")."""
+        now, assets = time.time(), {}
+        for asset in set(self._good) | set(self._failed_at):
+            fetched_at = self._good[asset][1] if asset in self._good else None
+            age = now - fetched_at if fetched_at is not None else None
+            if asset in self._failed_at and now - self._failed_at[asset] < self.negative_ttl_s:
+                state = "failing"
+            elif age is None or age > self.max_stale_s:
+                state = "expired"
+            else:
+                state = "fresh" if age <= self.ttl_s else "stale"
+            assets[asset] = {"age_s": age, "state": state}
+        with self._lock:
+            return dict(self.counters, assets=assets)
+
+    # ── persistence ───────────────────────────────────────────────────────────
+    def save(self):
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(dict(self._good), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+        except Exception:
+            return
+        # Skip entries pickled by an older layout of the chain tuple.
+        self._good.update({a: e for a, e in saved.items()
+                           if len(e[0]) == 4 and isinstance(e[0][1], OptionChain)})
+
+
+# ── YFINANCE BATCH ────────────────────────────────────────────────────────────
+def yf_batch_symbols(asset_names):
+    """yfinance symbols for these assets plus USD/INR, deduplicated, in order."""
+    return list(dict.fromkeys([TICKER_MAP[a] for a in asset_names if a in TICKER_MAP] + [FX_TICKER]))
+
+
+@timed("yfinance.batch")
+def fetch_yf_batch(symbols=YF_BATCH_SYMBOLS):
+    """One batched yfinance download for every spot symbol plus USD/INR.
+
+    Returns {symbol: (last_close, prev_close)}; symbols with no data are omitted.
+    """
+    closes = {}
+    try:
+        # 5d rather than 2d: the batch aligns all symbols on one date index, so
+        # FX (which trades on NSE holidays) leaves NaN gaps in the equity columns.
+        df = yf.download(symbols, period="5d", interval="1d", group_by="column",
+                         auto_adjust=False, progress=False, threads=True)
+        close = df["Close"]
+        for sym in symbols:
+            if sym not in close.columns:
+                continue
+            series = close[sym].dropna()
+            if series.empty:
+                continue
+            last = float(series.iloc[-1])
+            prev = float(series.iloc[-2]) if len(series) > 1 else last
+            closes[sym] = (last, prev)
+    except Exception:
+        pass
+    return closes
+
+
+# ── MARKET DATA TUPLE ─────────────────────────────────────────────────────────
+def fallback_market_data(asset_name, message="All live sources unavailable. Using fallback spot. Enter prices manually."):
+    spot = FALLBACK_SPOTS[asset_name]
+    return (spot, OptionChain.empty(spot), None, [], message, "fallback")
+
+
+@timed("market_data.build")
+def build_market_data(asset_name, yf_closes, chain_cache=None):
+    """NSE chain if reachable, else yfinance spot, else the static fallback.
+
+    With a ``chain_cache`` the chain is revalidated through it, and the last
+    good chain is served (with a note of its age) when NSE fails.
+    Returns (spot, chain, expiry, expiries, message, source); chain is an OptionChain.
+    """
+    if chain_cache is None:
+        result, age = fetch_nse_chain(asset_name), 0.0
+    else:
+        chain_cache.fetch(asset_name)
+        result, age = chain_cache.get(asset_name)
+    if result:
+        spot, chain, expiry, expiries = result
+        message = None if chain_cache is None or age <= chain_cache.ttl_s else \
+            "NSE refresh failed. Showing the last good option chain from {:.0f}s ago.".format(age)
+        return spot, chain, expiry, expiries, message, "nse"
+    if TICKER_MAP[asset_name] in yf_closes:
+        spot = float(round(yf_closes[TICKER_MAP[asset_name]][0], 2))
+        return spot, OptionChain.empty(spot), None, [], \
+            "NSE option chain unavailable from cloud server. Live spot ✅ | Enter prices manually.", "yf_spot"
+    return fallback_market_data(asset_name)
+
+
+def _timed_market_data(asset_name, yf_closes, chain_cache=None):
+    t0 = time.perf_counter()
+    data = build_market_data(asset_name, yf_closes, chain_cache)
+    return data, (time.perf_counter() - t0) * 1000
+
+
+def iter_market_data_concurrent(asset_names, yf_closes, deadline_s=FETCH_DEADLINE_S, chain_cache=None):
+    """Fetch several assets in parallel under one shared deadline, yielding as they land.
+
+    Yields (asset, data, latency_ms) in completion order, so consumers can
+    act on the fastest assets while slow ones are still in flight. Assets
+    that fail or are still running at the deadline come last, with the
+    cached chain or the fallback tuple, so the cycle finishes on time.
+    With a ``chain_cache`` the stalest chains are submitted first, so the
+    assets cut off by one cycle's deadline lead the next one instead of
+    being cut off every cycle.
+    """
+    if not asset_names:
+        return
+    if chain_cache is not None:
+        asset_names = chain_cache.stalest_first(asset_names)
+    pool = ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(asset_names)))
+    pending = {pool.submit(_timed_market_data, a, yf_closes, chain_cache): a for a in asset_names}
+    try:
+        for fut in as_completed(list(pending), timeout=deadline_s):
+            if fut.exception() is None:
+                data, ms = fut.result()
+                yield pending.pop(fut), data, ms
+    except FuturesTimeout:
+        pass
+    finally:
+        # Don't join stragglers — the session's own timeouts bound them.
+        pool.shutdown(wait=False, cancel_futures=True)
+    PROFILER.count("market_data.deadline_misses", len(pending))
+    for asset_name in pending.values():
+        yield asset_name, _cached_or_fallback(asset_name, chain_cache,
+            "Fetch exceeded the {:.0f}s deadline. Using fallback spot.".format(deadline_s)), deadline_s * 1000
+
+
+def fetch_market_data_concurrent(asset_names, yf_closes, deadline_s=FETCH_DEADLINE_S, chain_cache=None):
+    """Fetch several assets in parallel under a single shared deadline.
+
+    Returns (data, latency_ms) dicts keyed by asset, in ``asset_names`` order.
+    """
+    data, latency_ms = {}, {}
+    for asset_name, result, ms in iter_market_data_concurrent(asset_names, yf_closes, deadline_s, chain_cache):
+        data[asset_name], latency_ms[asset_name] = result, ms
+    return {a: data[a] for a in asset_names}, {a: latency_ms[a] for a in asset_names}
+
+
+def _cached_or_fallback(asset_name, chain_cache, message):
+    cached, age = chain_cache.get(asset_name) if chain_cache is not None else (None, None)
+    if cached is None:
+        return fallback_market_data(asset_name, message)
+    spot, chain, expiry, expiries = cached
+    return spot, chain, expiry, expiries, \
+        "Live fetch pending. Showing the cached option chain from {:.0f}s ago.".format(age), "nse"
+
+
+# ── BACKGROUND POLLER ─────────────────────────────────────────────────────────
+class MarketDataPoller:
+    """Refreshes chains, spots and USD/INR on a schedule and publishes snapshots.
+
+    A snapshot is an immutable dict swapped in whole, so readers never lock:
+    {"ts", "cycle_ms", "yf", "market_data", "latency_ms", "futures",
+    "futures_src", "futures_ts", "complete"}. One poller per process means N
+    browser sessions share a single upstream fetch stream. ``futures`` is
+    every listed future (FUTURES_COLUMNS) from one bulk NSE request per
+    segment or ``futures_path``, published as soon as it lands; a failed
+    fetch keeps the last good curves (``futures_ts`` is when they were
+    fetched) for up to FUTURES_MAX_STALE_S, after which it is None. Mid-cycle, assets are republished as they land
+    (``complete`` False, the rest carried over from the previous snapshot),
+    so one slow fetch doesn't hold back the others.
+    Chains go through ``chain_cache``, so a failed NSE fetch keeps serving
+    the last good chain; a persisted cache is published before the first
+    fetch so a restart doesn't start cold.
+    ``assets`` are polled for the poller's lifetime; assets added with
+    ``track()`` are dropped once no caller has asked for them in ``track_ttl_s``.
+    """
+
+    def __init__(self, assets, interval_s=POLL_INTERVAL_S, deadline_s=FETCH_DEADLINE_S, chain_cache=None,
+                 futures_path=FUTURES_CURVE_PATH, track_ttl_s=TRACK_TTL_S):
+        self.assets       = list(assets)   # replaced whole by track(), never mutated in place
+        self.pinned       = frozenset(assets)
+        self.track_ttl_s  = track_ttl_s
+        self.futures_path = futures_path
+        self.interval_s   = interval_s
+        self.deadline_s   = deadline_s
+        self.chain_cache  = chain_cache if chain_cache is not None else ChainCache()
+        self._snapshot    = None
+        self._ready       = threading.Event()
+        self._wake        = threading.Event()
+        self._stop        = threading.Event()
+        self._thread      = None
+        self._asked_at    = {}   # tracked asset → last time track() was called with it
+        self._track_lock  = threading.Lock()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="market-data-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh_now(self):
+        """Ask the poller to start a new cycle without waiting for the interval."""
+        self.chain_cache.clear_failures()
+        self._wake.set()
+
+    def track(self, assets):
+        """Add assets to the polled set and wake the poller. Returns the newly added ones.
+
+        Call it on every use, not just the first: it also keeps the assets
+        from expiring.
+        """
+        now = time.time()
+        with self._track_lock:
+            self._asked_at.update((a, now) for a in assets if a not in self.pinned)
+            known = set(self.assets)
+            new   = [a for a in dict.fromkeys(assets) if a not in known]
+            if new:
+                self.assets = self.assets + new
+        if new:
+            self._wake.set()
+        return new
+
+    def expire_tracked(self):
+        """Drop tracked assets nobody has asked for in ``track_ttl_s``. Returns the dropped ones."""
+        cutoff = time.time() - self.track_ttl_s
+        with self._track_lock:
+            expired = [a for a, asked_at in self._asked_at.items() if asked_at < cutoff]
+            for a in expired:
+                del self._asked_at[a]
+            if expired:
+                gone = set(expired)
+                self.assets = [a for a in self.assets if a not in gone]
+        PROFILER.count("poller.untracked", len(expired))
+        return expired
+
+    def wait_ready(self, timeout):
+        return self._ready.wait(timeout)
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def poll_once(self):
+        for _ in self.iter_poll():
+            pass
+        return self._snapshot
+
+    def iter_poll(self):
+        """One fetch cycle, yielding (asset, data) as each asset lands.
+
+        Publishes partial snapshots along the way and the complete one at
+        the end; ``poll_once()`` is this with nobody listening.
+        """
+        t0 = time.perf_counter()
+        self.expire_tracked()
+        assets = self.assets
+        prev = self._snapshot or {}
+        pool = ThreadPoolExecutor(max_workers=1)
+        curves_future = pool.submit(_timed_futures_curves, self.futures_path)
+        yf_closes = fetch_yf_batch(yf_batch_symbols(assets))
+        futures, futures_ms, landed = _carried_futures(prev), None, False
+        market_data, latency_ms, published = {}, {}, float("-inf")
+        for asset, data, ms in iter_market_data_concurrent(assets, yf_closes, self.deadline_s, self.chain_cache):
+            market_data[asset], latency_ms[asset] = data, ms
+            if not landed and curves_future.done():
+                (futures, futures_ms), landed = _landed_futures(curves_future, futures), True
+                if futures_ms is not None:
+                    latency_ms["futures"] = futures_ms
+                published = float("-inf")   # publish the new curves right away
+            if time.perf_counter() - published >= PUBLISH_EVERY_S:
+                self._snapshot = {
+                    "ts":          time.time(),
+                    "cycle_ms":    (time.perf_counter() - t0) * 1000,
+                    "yf":          yf_closes,
+                    "market_data": dict(prev.get("market_data", {}), **market_data),
+                    "latency_ms":  dict(prev.get("latency_ms", {}), **latency_ms),
+                    "futures":     futures[0],
+                    "futures_src": futures[1],
+                    "futures_ts":  futures[2],
+                    "complete":    False,
+                }
+                self._ready.set()
+                published = time.perf_counter()
+            yield asset, data
+        market_data = {a: market_data[a] for a in assets}
+        latency_ms  = {a: latency_ms[a] for a in assets}
+        if not landed:
+            done, _ = wait([curves_future], timeout=max(self.deadline_s - (time.perf_counter() - t0), 0.0))
+            if done:
+                futures, futures_ms = _landed_futures(curves_future, futures)
+        pool.shutdown(wait=False, cancel_futures=True)
+        if futures_ms is not None:
+            latency_ms["futures"] = futures_ms
+        self._snapshot = {
+            "ts":          time.time(),
+            "cycle_ms":    (time.perf_counter() - t0) * 1000,
+            "yf":          yf_closes,
+            "market_data": market_data,
+            "latency_ms":  latency_ms,
+            "futures":     futures[0],
+            "futures_src": futures[1],
+            "futures_ts":  futures[2],
+            "complete":    True,
+        }
+        self._ready.set()
+        if PROFILER.enabled:
+            PROFILER.record("poll.cycle", self._snapshot["cycle_ms"])
+        try:
+            self.chain_cache.save()
+        except OSError:
+            pass
+
+    def publish_cached(self):
+        """Publish a snapshot straight from the chain cache, without fetching."""
+        assets = self.assets
+        self._snapshot = {
+            "ts":          time.time(),
+            "cycle_ms":    0.0,
+            "yf":          {},
+            "market_data": {a: _cached_or_fallback(a, self.chain_cache, "Live data not polled yet.")
+                            for a in assets},
+            "latency_ms":  {a: 0.0 for a in assets},
+            "futures":     None,
+            "futures_src": None,
+            "futures_ts":  None,
+            "complete":    True,
+        }
+        self._ready.set()
+        return self._snapshot
+
+    def _run(self):
+        if self._snapshot is None and self.chain_cache.has_chains():
+            self.publish_cached()
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                pass
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
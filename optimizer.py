@@ -0,0 +1,184 @@
+"""Parameter sweep — thresholds × profit filter × lots × brokerage over recorded ticks.
+
+Each tick file is priced once at 1 lot and zero brokerage; the resulting gap
+arrays (deviation %, per-lot edge, capacity, contract boundaries) are cached
+on disk as .npy files. Everything the sweep varies is then cheap:
+
+    net(lots, brokerage) = lots · edge − brokerage · orders(lots)
+
+and all thresholds come out of one threshold_stats() pass per grid cell.
+Worker processes memory-map the cache, so N cores share one copy of the ticks.
+
+    python optimizer.py --pcp ticks_pcp.csv --out surface.csv
+
+Writes the full surface (expected net P&L and trade count per grid point) to
+--out and prints the trades-vs-P&L frontier to stdout.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import DEFAULT_THRESHOLDS, evaluate_basis_ticks, evaluate_irp_ticks, evaluate_pcp_ticks, \
+    load_ticks, sort_evaluated, threshold_stats
+from market_data import DIVIDENDS, INSTRUMENTS
+from strategies import BASIS_ORDERS, IRP_ORDERS, pcp_orders
+
+SWEEP_CACHE_DIR = os.environ.get(
+    "ARB_SWEEP_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sweep_cache"))
+
+SWEEP_DEFAULTS = {
+    "thresholds": list(DEFAULT_THRESHOLDS),                             # % — 50 points
+    "min_profit": [0, 5, 25, 50, 100, 250, 500, 1000, 2500, 5000],      # ₹ net
+    "lots":       [1, 2, 3, 5, 10],
+    "brokerage":  [0, 10, 20, 40],                                      # ₹ per order
+}   # 50 × 10 × 5 × 4 = 10,000 points per strategy
+
+STRATEGY_NAMES = {"pcp": "Put-Call Parity", "fb": "Futures Basis", "irp": "Interest Rate Parity"}
+
+_GAP_ARRAYS = ["dev_pct", "edge", "capacity_lots", "same_prev"]
+
+
+# ── GAP CACHE ─────────────────────────────────────────────────────────────────
+def _evaluate(code, ticks, r, r_us):
+    # 1 lot, no brokerage: net_pnl is the per-lot edge after STT.
+    if code == "pcp":
+        return evaluate_pcp_ticks(ticks, r, lots=1, brokerage=0.0)
+    if code == "fb":
+        return evaluate_basis_ticks(ticks, r, lots=1, brokerage=0.0)
+    return evaluate_irp_ticks(ticks, r, r_us, brokerage=0.0)
+
+
+def gap_cache(code, path, r, r_us, cache_dir=SWEEP_CACHE_DIR):
+    """Directory of cached gap arrays for one tick file, built on first use.
+
+    Keyed on the file's path, size and mtime plus the rates, the instrument
+    master for PCP and basis (lot sizes) and the dividend calendar for PCP,
+    so re-recording the ticks, changing r, refreshing instruments.csv or
+    editing the calendar invalidates it.
+    """
+    st = os.stat(path)
+    digest = hashlib.sha1("{}|{}|{}|{}|{}|{}|{}|{}".format(
+        code, os.path.abspath(path), st.st_size, st.st_mtime_ns, r, r_us,
+        INSTRUMENTS.digest if code in ("pcp", "fb") else "",
+        DIVIDENDS.digest if code == "pcp" else "").encode()).hexdigest()[:16]
+    entry = os.path.join(cache_dir, "{}-{}".format(code, digest))
+    if all(os.path.exists(os.path.join(entry, name + ".npy")) for name in _GAP_ARRAYS):
+        return entry
+
+    s = sort_evaluated(_evaluate(code, load_ticks(path), r, r_us))
+    os.makedirs(entry, exist_ok=True)
+    for name, arr in (("dev_pct", s["dev_pct"]), ("edge", s["net_pnl"]),
+                      ("capacity_lots", s["capacity_lots"]), ("same_prev", s["same_prev"])):
+        tmp = os.path.join(entry, name + ".tmp.npy")
+        np.save(tmp, arr)
+        os.replace(tmp, os.path.join(entry, name + ".npy"))
+    return entry
+
+
+def load_gap_cache(entry):
+    return {name: np.load(os.path.join(entry, name + ".npy"), mmap_mode="r") for name in _GAP_ARRAYS}
+
+
+# ── SWEEP ─────────────────────────────────────────────────────────────────────
+_worker_gaps = {}
+
+
+def _init_worker(entries):
+    for code, entry in entries.items():
+        _worker_gaps[code] = load_gap_cache(entry)
+
+
+def _sweep_cell(cell):
+    """All thresholds for one (strategy, lots, brokerage, min_profit) cell."""
+    code, lots, brokerage, min_profit, thresholds = cell
+    g      = _worker_gaps[code]
+    orders = pcp_orders(lots) if code == "pcp" else (BASIS_ORDERS if code == "fb" else IRP_ORDERS)
+    net    = lots * np.asarray(g["edge"]) - brokerage * orders
+    stats  = threshold_stats(np.asarray(g["dev_pct"]), net, np.asarray(g["capacity_lots"]),
+                             np.asarray(g["same_prev"]), thresholds, min_profit)
+    stats.insert(0, "min_profit", min_profit)
+    stats.insert(0, "brokerage", brokerage)
+    stats.insert(0, "lots", lots)
+    stats.insert(0, "strategy", STRATEGY_NAMES[code])
+    return stats
+
+
+def sweep(tick_files, thresholds=None, min_profit=None, lots=None, brokerage=None,
+          r=0.0675, r_us=0.0525, workers=None, cache_dir=SWEEP_CACHE_DIR):
+    """Full grid over every strategy in ``tick_files`` ({"pcp"|"fb"|"irp": path}).
+
+    Returns the surface: one row per (strategy, lots, brokerage, min_profit,
+    threshold) with trades, hit rate, total/mean net P&L and capacity.
+    """
+    thresholds = SWEEP_DEFAULTS["thresholds"] if thresholds is None else thresholds
+    min_profit = SWEEP_DEFAULTS["min_profit"] if min_profit is None else min_profit
+    lots       = SWEEP_DEFAULTS["lots"]       if lots is None       else lots
+    brokerage  = SWEEP_DEFAULTS["brokerage"]  if brokerage is None  else brokerage
+
+    entries = {code: gap_cache(code, path, r, r_us, cache_dir) for code, path in tick_files.items()}
+    cells   = [(code, l, b, mp, thresholds)
+               for code, l, b, mp in itertools.product(entries, lots, brokerage, min_profit)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(cells) == 1:
+        _init_worker(entries)
+        blocks = [_sweep_cell(c) for c in cells]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(entries,)) as pool:
+            blocks = list(pool.map(_sweep_cell, cells, chunksize=max(1, len(cells) // (workers * 4))))
+    return pd.concat(blocks, ignore_index=True)
+
+
+def frontier(surface):
+    """Best settings for each trade count: rows no other setting beats on both
+    trades and total net P&L, per strategy and brokerage assumption."""
+    rows = []
+    for _, grp in surface[surface["trades"] > 0].groupby(["strategy", "brokerage"], sort=False):
+        grp  = grp.sort_values(["trades", "total_pnl"], ascending=[False, False])
+        best = grp["total_pnl"].cummax()
+        rows.append(grp[grp["total_pnl"] >= best].drop_duplicates("trades"))
+    if not rows:
+        return surface.iloc[0:0]
+    return pd.concat(rows, ignore_index=True).sort_values(["strategy", "brokerage", "trades"])
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep detection settings over recorded ticks.")
+    parser.add_argument("--pcp", metavar="PATH", help="PCP tick file")
+    parser.add_argument("--basis", metavar="PATH", help="futures basis tick file")
+    parser.add_argument("--irp", metavar="PATH", help="IRP forward tick file")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=SWEEP_DEFAULTS["thresholds"], help="%% grid")
+    parser.add_argument("--min-profit", nargs="+", type=float, default=SWEEP_DEFAULTS["min_profit"], help="₹ grid")
+    parser.add_argument("--lots", nargs="+", type=int, default=SWEEP_DEFAULTS["lots"])
+    parser.add_argument("--brokerage", nargs="+", type=float, default=SWEEP_DEFAULTS["brokerage"], help="₹ per order")
+    parser.add_argument("--rate", type=float, default=6.75, help="India risk-free rate (%%)")
+    parser.add_argument("--us-rate", type=float, default=5.25, help="US risk-free rate (%%)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--cache-dir", default=SWEEP_CACHE_DIR)
+    parser.add_argument("--out", metavar="PATH", help="write the full surface CSV here")
+    args = parser.parse_args(argv)
+    tick_files = {code: path for code, path in (("pcp", args.pcp), ("fb", args.basis), ("irp", args.irp)) if path}
+    if not tick_files:
+        parser.error("give at least one of --pcp, --basis, --irp")
+
+    t0 = time.perf_counter()
+    surface = sweep(tick_files, args.thresholds, args.min_profit, args.lots, args.brokerage,
+                    r=args.rate / 100, r_us=args.us_rate / 100, workers=args.workers, cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - t0
+    if args.out:
+        surface.to_csv(args.out, index=False)
+    frontier(surface).to_csv(sys.stdout, index=False, float_format="%.4f")
+    sys.stderr.write(json.dumps({"event": "sweep", "points": len(surface), "elapsed_s": round(elapsed, 2)}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
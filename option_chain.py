@@ -0,0 +1,171 @@
+"""Columnar option chain — calls and puts aligned on (expiry, strike) in NumPy arrays.
+
+Rows are sorted by expiry (in NSE's listing order) and then strike, so each
+expiry is one contiguous block: ``for_expiry()`` returns a zero-copy view and
+strike lookups are a binary search. A chain pickles as a handful of raw
+buffers, which keeps the poller's on-disk cache and Streamlit reruns cheap.
+"""
+import numpy as np
+import pandas as pd
+
+LEG_FIELDS = ("last", "oi", "volume")   # per side: call_last, put_oi, ...
+
+
+class OptionChain:
+    """Option chain for one underlying. Missing legs are NaN.
+
+    Attributes: ``spot``, ``expiries`` (list of NSE expiry strings),
+    ``expiry_idx`` (per row, into ``expiries``), ``strike``, and
+    ``call_last`` / ``call_oi`` / ``call_volume`` / ``put_last`` / ``put_oi`` /
+    ``put_volume``. ``offsets[i]:offsets[i + 1]`` is expiry i's row block.
+    """
+
+    __slots__ = ("spot", "expiries", "expiry_idx", "strike", "offsets",
+                 "call_last", "call_oi", "call_volume", "put_last", "put_oi", "put_volume")
+
+    def __init__(self, spot, expiries, expiry_idx, strike, offsets, **legs):
+        self.spot       = spot
+        self.expiries   = list(expiries)
+        self.expiry_idx = expiry_idx
+        self.strike     = strike
+        self.offsets    = offsets
+        for side in ("call", "put"):
+            for field in LEG_FIELDS:
+                setattr(self, "{}_{}".format(side, field), legs["{}_{}".format(side, field)])
+
+    # ── construction ──────────────────────────────────────────────────────────
+    @classmethod
+    def empty(cls, spot=None):
+        z = np.empty(0)
+        return cls(spot, [], np.empty(0, dtype=np.int32), z, np.zeros(1, dtype=np.int64),
+                   **{"{}_{}".format(s, f): z for s in ("call", "put") for f in LEG_FIELDS})
+
+    @classmethod
+    def from_legs(cls, spot, expiries, calls, puts):
+        """Align call and put legs into one chain.
+
+        ``calls`` / ``puts`` are dicts of equal-length arrays: ``expiry`` (codes
+        into ``expiries``), ``strike``, ``last``, ``oi``, ``volume``.
+        """
+        n_c  = len(calls["strike"])
+        exp  = np.concatenate([calls["expiry"], puts["expiry"]]).astype(np.int64)
+        k    = np.concatenate([calls["strike"], puts["strike"]]).astype(float)
+        if len(k) == 0:
+            return cls.empty(spot)
+        order = np.lexsort((k, exp))
+        new   = np.ones(len(order), dtype=bool)
+        new[1:] = (exp[order][1:] != exp[order][:-1]) | (k[order][1:] != k[order][:-1])
+        row_of_sorted = np.cumsum(new) - 1
+        row = np.empty(len(order), dtype=np.int64)
+        row[order] = row_of_sorted
+        n_rows = int(row_of_sorted[-1]) + 1
+
+        expiry_idx = exp[order][new].astype(np.int32)
+        strike     = k[order][new]
+        offsets    = np.searchsorted(expiry_idx, np.arange(len(expiries) + 1), side="left").astype(np.int64)
+        legs = {}
+        for side, src, rows in (("call", calls, row[:n_c]), ("put", puts, row[n_c:])):
+            for field in LEG_FIELDS:
+                col = np.full(n_rows, np.nan)
+                col[rows] = src[field]
+                legs["{}_{}".format(side, field)] = col
+        return cls(spot, expiries, expiry_idx, strike, offsets, **legs)
+
+    @classmethod
+    def from_frames(cls, spot, calls_df, puts_df, expiries=None):
+        """From the old calls/puts DataFrames (expiry, strike, lastPrice, openInterest, volume)."""
+        frames = [df for df in (calls_df, puts_df) if not df.empty]
+        if not frames:
+            return cls.empty(spot)
+        if expiries is None:
+            names = [df["expiry"] for df in frames if "expiry" in df.columns]
+            expiries = list(pd.unique(pd.concat(names))) if names else [None]
+
+        def legs(df):
+            if df.empty:
+                return {"expiry": np.empty(0, dtype=np.int32), "strike": np.empty(0),
+                        "last": np.empty(0), "oi": np.empty(0), "volume": np.empty(0)}
+            code = pd.Index(expiries).get_indexer(df["expiry"]) if "expiry" in df.columns \
+                else np.zeros(len(df), dtype=np.int64)
+            get  = lambda col: df[col].to_numpy(dtype=float) if col in df.columns else np.full(len(df), np.nan)
+            keep = code >= 0
+            return {"expiry": code[keep], "strike": get("strike")[keep], "last": get("lastPrice")[keep],
+                    "oi": get("openInterest")[keep], "volume": get("volume")[keep]}
+        return cls.from_legs(spot, expiries, legs(calls_df), legs(puts_df))
+
+    # ── access ────────────────────────────────────────────────────────────────
+    def __len__(self):
+        return len(self.strike)
+
+    @property
+    def is_empty(self):
+        return len(self.strike) == 0
+
+    def expiry_names(self):
+        """Per-row expiry string (object array; shares the strings in ``expiries``)."""
+        return np.asarray(self.expiries, dtype=object)[self.expiry_idx] if self.expiries else \
+            np.empty(0, dtype=object)
+
+    def for_expiry(self, expiry):
+        """Zero-copy view of one expiry's rows (an empty chain if it isn't listed)."""
+        try:
+            i = self.expiries.index(expiry)
+        except ValueError:
+            return OptionChain.empty(self.spot)
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        legs = {name: getattr(self, name)[lo:hi] for name in self.__slots__ if name.startswith(("call_", "put_"))}
+        return OptionChain(self.spot, [expiry], np.zeros(hi - lo, dtype=np.int32), self.strike[lo:hi],
+                           np.array([0, hi - lo], dtype=np.int64), **legs)
+
+    def index_of(self, strike, atol):
+        """Row of the strike within ``atol`` (binary search), -1 if none.
+
+        Strikes are only sorted within an expiry; call on a ``for_expiry`` view
+        when the chain holds several.
+        """
+        i = int(np.searchsorted(self.strike, strike))
+        best = -1
+        for j in (i - 1, i):
+            if 0 <= j < len(self.strike) and abs(self.strike[j] - strike) <= atol:
+                if best < 0 or abs(self.strike[j] - strike) < abs(self.strike[best] - strike):
+                    best = j
+        return best
+
+    def quote(self, side, strike, atol):
+        """(last, oi, volume) for ``side`` ("call"/"put") at ``strike``, None if not quoted."""
+        i = self.index_of(strike, atol)
+        if i < 0:
+            return None
+        last = getattr(self, side + "_last")[i]
+        if np.isnan(last):
+            return None
+        return float(last), float(getattr(self, side + "_oi")[i]), float(getattr(self, side + "_volume")[i])
+
+    def pairs(self):
+        """Boolean mask of rows with a traded price on both sides."""
+        with np.errstate(invalid="ignore"):
+            return (self.call_last > 0) & (self.put_last > 0)
+
+    def to_frames(self):
+        """(calls_df, puts_df) in the old DataFrame shape, for display."""
+        names = self.expiry_names()
+        out = []
+        for side in ("call", "put"):
+            last = getattr(self, side + "_last")
+            has  = ~np.isnan(last)
+            out.append(pd.DataFrame({
+                "expiry":       names[has],
+                "strike":       self.strike[has],
+                "lastPrice":    last[has],
+                "openInterest": getattr(self, side + "_oi")[has],
+                "volume":       getattr(self, side + "_volume")[has],
+            }))
+        return tuple(out)
+
+    # ── pickling ──────────────────────────────────────────────────────────────
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
@@ -0,0 +1,282 @@
+"""Black-Scholes pricing, implied volatility and Greeks — vectorized over whole chains.
+
+European options on an underlying paying a continuous yield ``q`` (0 by
+default). NSE index and stock options are all European-exercise, so the
+closed form applies as-is. Every function broadcasts, so a chain's calls
+and puts go through one call: ``implied_vol`` solves all of them together
+with a bracketed Newton iteration (bisection whenever a Newton step would
+leave the bracket), and the few that haven't converged after
+``IV_MAX_ITER`` steps are finished off one by one with scipy's Brent solver.
+
+Cash dividends use the escrowed model: spot less the PV of dividends going
+ex before expiry. For American-style checks, ``early_exercise_premium``
+runs a CRR binomial lattice over all strikes of an expiry at once; the
+parts that depend only on (r, T, steps) are cached.
+"""
+import functools
+
+import numpy as np
+from scipy.optimize import brentq
+from scipy.special import ndtr
+
+from diagnostics import PROFILER, timed
+
+IV_LOW       = 1e-4     # σ bracket for the solver
+IV_HIGH      = 5.0
+IV_PRICE_TOL = 1e-6     # ₹ — |model − market| at which a strike counts as solved
+IV_MAX_ITER  = 30       # vectorized steps before Brent takes over the stragglers
+SMILE_WINDOW = 5        # neighbouring strikes in the rolling smile median
+LATTICE_STEPS = 60      # CRR steps; the European control variate absorbs most of the error
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def _npdf(x):
+    return np.exp(-0.5 * x * x) * _INV_SQRT_2PI
+
+
+def _sign(is_call):
+    """+1 for calls, −1 for puts — so one formula prices both."""
+    return np.where(is_call, 1.0, -1.0)
+
+
+def _d1_d2(S, K, T, r, sigma, q):
+    vol_t = sigma * np.sqrt(T)
+    d1    = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / vol_t
+    return d1, d1 - vol_t
+
+
+# ── PRICE & GREEKS ────────────────────────────────────────────────────────────
+def bs_price(S, K, T, r, sigma, is_call, q=0.0):
+    """European option price; scalars or arrays."""
+    w      = _sign(is_call)
+    d1, d2 = _d1_d2(S, K, T, r, sigma, q)
+    return w * (S * np.exp(-q * T) * ndtr(w * d1) - K * np.exp(-r * T) * ndtr(w * d2))
+
+
+def bs_greeks(S, K, T, r, sigma, is_call, q=0.0):
+    """Price and Greeks in one pass, as a dict of arrays.
+
+    ``delta`` and ``gamma`` per ₹1 of spot, ``vega`` per vol point (σ + 0.01),
+    ``theta`` per calendar day, ``rho`` per 1% of rate.
+    """
+    w      = _sign(is_call)
+    d1, d2 = _d1_d2(S, K, T, r, sigma, q)
+    sqrt_t = np.sqrt(T)
+    df_q, df_r = np.exp(-q * T), np.exp(-r * T)
+    nd1    = _npdf(d1)
+    cdf1, cdf2 = ndtr(w * d1), ndtr(w * d2)
+    return {
+        "price": w * (S * df_q * cdf1 - K * df_r * cdf2),
+        "delta": w * df_q * cdf1,
+        "gamma": df_q * nd1 / (S * sigma * sqrt_t),
+        "vega":  S * df_q * nd1 * sqrt_t / 100,
+        "theta": (-S * df_q * nd1 * sigma / (2 * sqrt_t) - w * r * K * df_r * cdf2 + w * q * S * df_q * cdf1) / 365,
+        "rho":   w * K * T * df_r * cdf2 / 100,
+    }
+
+
+# ── IMPLIED VOLATILITY ────────────────────────────────────────────────────────
+def implied_vol(price, S, K, T, r, is_call, q=0.0, tol=IV_PRICE_TOL, max_iter=IV_MAX_ITER):
+    """σ that reprices each option, NaN where none exists.
+
+    No solution when the price sits outside the no-arbitrage bounds
+    (at or below discounted intrinsic, at or above the forward / PV(K)),
+    or T, S or K isn't positive. Newton steps run on the unsolved subset
+    only, so the cost of each pass shrinks as strikes converge.
+    """
+    price, S, K, T, r, q, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(r, dtype=float), np.asarray(q, dtype=float), np.asarray(is_call))
+    shape = price.shape
+    price, S, K, T, r, q, is_call = (a.ravel() for a in (price, S, K, T, r, q, is_call))
+    w = _sign(is_call)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fwd_s = S * np.exp(-q * T)
+        pv_k  = K * np.exp(-r * T)
+        lower = np.maximum(w * (fwd_s - pv_k), 0.0)
+        upper = np.where(is_call, fwd_s, pv_k)
+        valid = np.isfinite(price) & (T > 0) & (S > 0) & (K > 0) & (price > lower) & (price < upper)
+
+        sigma = np.full(price.shape, np.nan)
+        lo    = np.full(price.shape, IV_LOW)
+        hi    = np.full(price.shape, IV_HIGH)
+        # Start at the inflection point of price in σ, where Newton converges
+        # monotonically (Manaster & Koehler); floored for near-the-money strikes.
+        sigma[valid] = np.clip(np.sqrt(2 * np.abs(np.log(fwd_s[valid] / pv_k[valid])) / T[valid]), 0.2, IV_HIGH)
+
+        active = np.flatnonzero(valid)
+        for _ in range(max_iter):
+            if len(active) == 0:
+                break
+            s, t = sigma[active], T[active]
+            d1, d2 = _d1_d2(S[active], K[active], t, r[active], s, q[active])
+            wa   = w[active]
+            diff = wa * (fwd_s[active] * ndtr(wa * d1) - pv_k[active] * ndtr(wa * d2)) - price[active]
+            vega = fwd_s[active] * _npdf(d1) * np.sqrt(t)
+            lo[active] = np.where(diff < 0, s, lo[active])
+            hi[active] = np.where(diff > 0, s, hi[active])
+            step = s - diff / vega
+            step = np.where((step > lo[active]) & (step < hi[active]), step, 0.5 * (lo[active] + hi[active]))
+            solved = np.abs(diff) < tol
+            stuck  = ~solved & (hi[active] - lo[active] < 1e-12)   # pinned at IV_LOW / IV_HIGH
+            sigma[active] = np.where(solved, s, np.where(stuck, np.nan, step))
+            active = active[~(solved | stuck)]
+
+    for i in active:   # rare: deep wings with almost no vega
+        f = lambda v, i=i: bs_price(S[i], K[i], T[i], r[i], v, is_call[i], q[i]) - price[i]
+        try:
+            sigma[i] = brentq(f, IV_LOW, IV_HIGH, xtol=1e-10)
+        except ValueError:
+            sigma[i] = np.nan
+    return sigma.reshape(shape)
+
+
+# ── CHAIN ANALYTICS ───────────────────────────────────────────────────────────
+@timed("pricing.chain_greeks")
+def chain_greeks(spot, chain, r, T, q=0.0, greeks=True):
+    """IV and Greeks for every leg of an OptionChain, calls and puts in one batch.
+
+    ``spot`` and ``T`` (years to expiry) are scalars or per chain row.
+    Returns a dict of row-aligned arrays: ``call_iv`` / ``put_iv`` and,
+    unless ``greeks`` is False, ``call_`` / ``put_`` ``delta``, ``gamma``,
+    ``vega``, ``theta`` (units as bs_greeks()); NaN where a leg has no price
+    or no IV.
+    """
+    n      = len(chain)
+    spot   = np.concatenate([spot, spot]) if np.ndim(spot) else spot
+    K      = np.concatenate([chain.strike, chain.strike])
+    t      = np.concatenate([T, T]) if np.ndim(T) else np.full(2 * n, float(T))
+    prices = np.concatenate([chain.call_last, chain.put_last])
+    calls  = np.arange(2 * n) < n
+    iv     = implied_vol(prices, spot, K, t, r, calls, q)
+    if not greeks:
+        return {"call_iv": iv[:n], "put_iv": iv[n:]}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        g = bs_greeks(spot, K, t, r, iv, calls, q)
+    out = {"call_iv": iv[:n], "put_iv": iv[n:]}
+    for name in ("delta", "gamma", "vega", "theta"):
+        out["call_" + name], out["put_" + name] = g[name][:n], g[name][n:]
+    return out
+
+
+def smile_deviation(chain, call_iv, put_iv, forward, window=SMILE_WINDOW):
+    """Per row, how far (vol points) the worse leg sits from its expiry's smile.
+
+    The smile at a strike is the median out-of-the-money IV — puts below the
+    forward, calls above — over the ``window`` strikes centred on it, within
+    the same expiry. A last price left over from earlier in the session
+    reprices to an IV off that curve, so a large deviation flags a leg whose
+    parity gap is likely a stale print rather than a tradeable one. NaN
+    where it can't be judged: a leg with no IV (deep in the money at
+    intrinsic, or outside the no-arbitrage bounds) or fewer than 3 IVs
+    nearby to draw the smile from.
+    """
+    otm  = np.where(chain.strike < forward, put_iv, call_iv)
+    otm  = np.where(np.isnan(otm), np.where(chain.strike < forward, call_iv, put_iv), otm)
+    # Neighbours as a (rows × window) gather; slots past either end of an
+    # expiry's block are NaN, so every expiry is handled in the same pass.
+    rows  = np.arange(len(chain))
+    nbr   = rows[:, None] + np.arange(window) - window // 2
+    same  = (nbr >= 0) & (nbr < len(chain))
+    nbr   = np.clip(nbr, 0, max(len(chain) - 1, 0))
+    same &= chain.expiry_idx[nbr] == chain.expiry_idx[:, None]
+    frames = np.sort(np.where(same, otm[nbr], np.nan), axis=1)   # NaNs sort last
+    count  = np.sum(~np.isnan(frames), axis=1)
+    mid    = np.maximum(count - 1, 0)
+    smile  = 0.5 * (np.take_along_axis(frames, (mid // 2)[:, None], 1)[:, 0] +
+                    np.take_along_axis(frames, ((mid + 1) // 2)[:, None], 1)[:, 0])
+    smile  = np.where(count >= 3, smile, np.nan)
+
+    with np.errstate(invalid="ignore"):
+        return np.fmax(np.abs(call_iv - smile), np.abs(put_iv - smile)) * 100
+
+
+# ── DIVIDENDS & AMERICAN EXERCISE ─────────────────────────────────────────────
+def dividend_pv(times, amounts, T, r):
+    """PV of the dividends going ex in (0, T], for each T.
+
+    ``times`` (years from today) and ``amounts`` (₹ per share) describe one
+    underlying's schedule; ``T`` is a scalar or an array of expiries.
+    """
+    times, amounts = np.asarray(times, dtype=float), np.asarray(amounts, dtype=float)
+    T = np.asarray(T, dtype=float)
+    if len(times) == 0:
+        return np.zeros(T.shape)
+    paid = (times > 0) & (times <= T[..., None])
+    return np.sum(np.where(paid, amounts * np.exp(-r * times), 0.0), axis=-1)
+
+
+def parity_bounds(S, K, T, r, pv_div=0.0):
+    """(lower, upper) on C − P that rule out conversion / reversal arbitrage.
+
+    European options sit on the single point S − PV(D) − K·e^(−rT). Early
+    exercise widens that to S − PV(D) − K ≤ C − P ≤ S − K·e^(−rT) for
+    American options: only a C − P outside the band is riskless.
+    """
+    return S - pv_div - K, S - K * np.exp(-r * T)
+
+
+@functools.lru_cache(maxsize=512)
+def binomial_lattice(r, T, steps):
+    """The strike- and vol-independent parts of a CRR lattice, per (r, T, steps).
+
+    Returns (dt, disc, times, exponents): the step length, the one-step
+    discount factor, each step's time and the terminal nodes' up-minus-down
+    move counts. Chains share a handful of expiries, so a scan hits the
+    cache for all but the first underlying.
+    """
+    dt = T / steps
+    return dt, np.exp(-r * dt), np.arange(steps + 1) * dt, np.arange(-steps, steps + 1, 2, dtype=float)
+
+
+PROFILER.register_counters("binomial_lattice", lambda: dict(zip(("hits", "misses"), binomial_lattice.cache_info()[:2])))
+
+
+@timed("pricing.american_lattice")
+def early_exercise_premium(S, K, T, r, sigma, is_call, div_times=(), div_amounts=(), steps=LATTICE_STEPS):
+    """American minus European value per option, on one binomial lattice.
+
+    ``K``, ``T``, ``sigma`` and ``is_call`` are arrays over every leg of a
+    chain (they broadcast) and go through the lattice as one batch: each
+    backward step is a single array operation over legs × nodes, with the
+    per-expiry pieces looked up in binomial_lattice()'s cache. The European
+    value is rolled back alongside, so the premium is a difference of two
+    prices with the same discretisation error. Dividends follow the
+    escrowed model (see dividend_pv()).
+    """
+    K, T, sigma, is_call = np.broadcast_arrays(np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+                                               np.asarray(sigma, dtype=float), np.asarray(is_call))
+    if K.size == 0:
+        return np.empty(0)
+    K, T, sigma, is_call = K.ravel(), T.ravel(), sigma.ravel(), is_call.ravel()
+    T_u, inv  = np.unique(T, return_inverse=True)
+    lattices  = [binomial_lattice(float(r), float(t), int(steps)) for t in T_u]
+    dt        = np.array([lat[0] for lat in lattices])[inv][:, None]
+    disc      = np.array([lat[1] for lat in lattices])[inv][:, None]
+    times     = np.vstack([lat[2] for lat in lattices])                # (expiries, steps + 1)
+    exponents = lattices[0][3]
+    # PV, at each step, of the dividends still to go ex before that expiry.
+    div_times, div_amounts = np.asarray(div_times, dtype=float), np.asarray(div_amounts, dtype=float)
+    remaining = np.zeros(times.shape)
+    for d_t, d_a in zip(div_times, div_amounts):
+        ahead = (d_t > times) & (d_t <= T_u[:, None])
+        remaining += np.where(ahead, d_a * np.exp(-r * (d_t - times)), 0.0)
+    remaining = remaining[inv]                                         # (legs, steps + 1)
+
+    w     = _sign(is_call)[:, None]
+    K     = K[:, None]
+    u_log = sigma[:, None] * np.sqrt(dt)
+    up    = np.exp(u_log)
+    p     = (np.exp(r * dt) - 1 / up) / (up - 1 / up)
+    q     = 1 - p
+    node  = (S - remaining[:, :1]) * np.exp(u_log * exponents)         # escrowed spot at expiry
+    euro  = np.maximum(w * (node + remaining[:, steps:] - K), 0.0)
+    amer  = euro
+    p, q  = p * disc, q * disc
+    for i in range(steps - 1, -1, -1):
+        node = node[:, :-1] * up                                       # (i, j) from (i + 1, j)
+        euro = p * euro[:, 1:] + q * euro[:, :-1]
+        amer = np.maximum(p * amer[:, 1:] + q * amer[:, :-1], w * (node + remaining[:, i:i + 1] - K))
+    return (amer - euro)[:, 0]
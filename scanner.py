@@ -0,0 +1,547 @@
+"""Headless scan pipeline — fetch → PCP / futures basis / IRP → filter → rank.
+
+The Streamlit "All Opportunities" tab calls run_scan() on the poller
+snapshot; the same pipeline runs from cron, a server or a test harness:
+
+    python scanner.py --assets NIFTY TCS                 # one scan, JSON lines on stdout
+    python scanner.py --daemon --interval 0.5 --all      # continuous, every 500 ms
+    python scanner.py --universe fno                     # every F&O underlying in the instrument master
+    python scanner.py --universe fno --stream            # one scan, each asset emitted as its fetch lands
+    python scanner.py --universe fno --rank score --top 20   # best 20 by the custom score
+    python scanner.py --assets HCLTECH TCS --american        # PCP legs priced with early exercise
+    ARB_FORWARD_CURVE=usdinr_fwd.csv python scanner.py --strategies irp   # IRP across a quoted forward curve
+    python scanner.py --daemon --profile-prom /var/lib/node_exporter/arb.prom   # timings for Prometheus
+
+Startup cost (import, first fetch, first scan) is reported on stderr as one
+JSON line so it can be tracked alongside the output.
+"""
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+from diagnostics import PROFILER, timed
+from instruments import UNIVERSES
+from market_data import DIVIDENDS, INSTRUMENTS, LOT_SIZES, FALLBACK_FX, FX_TICKER, POLL_INTERVAL_S, \
+    ChainCache, MarketDataPoller, fallback_market_data, forward_curve
+from strategies import PCP_MAX_IV_DEV, PCP_MIN_VOLUME, futures_term_structure, irp_surface, next_monthly_expiry, \
+    pcp_chain_scan
+
+_IMPORT_MS = (time.perf_counter() - _IMPORT_T0) * 1000
+
+STRATEGIES      = ["Put-Call Parity", "Futures Basis", "Interest Rate Parity"]
+STRATEGY_CODES  = {"pcp": "Put-Call Parity", "fb": "Futures Basis", "irp": "Interest Rate Parity"}
+
+PCP_ROW_FIELDS  = ["type", "strike", "gap", "gross", "friction", "net_pnl", "ann_return", "expiry_date", "days"]
+NEAR_BASIS_FIELDS = ["expiry_date", "days", "spot", "futures", "fair", "basis", "gross", "friction", "net_pnl",
+                     "ann_return"]
+
+SCAN_DEFAULTS = {
+    "r":                 0.0675,   # India risk-free rate
+    "r_us":              0.0525,   # US risk-free rate (IRP)
+    "brokerage":         20.0,     # ₹ per order
+    "pcp_min_dev":       0.05,     # % of spot
+    "fb_min_dev":        0.05,     # % of fair futures
+    "irp_min_dev":       0.05,     # % of theoretical forward
+    "min_profit":        5.0,      # ₹ net
+    "only_profitable":   True,
+    "pcp_max_per_asset": 5,        # best strikes per asset surfaced as opportunities
+    "pcp_skip_stale":    True,     # drop strikes whose gap looks like a stale last price
+    "pcp_max_iv_dev":    PCP_MAX_IV_DEV,   # vol points off the smile
+    "pcp_min_volume":    PCP_MIN_VOLUME,   # contracts per leg
+    "pcp_exercise":      "european",       # NSE options are European; "american" prices early exercise
+    "irp_max_tenors":    3,        # best forward-curve tenors surfaced as opportunities
+    "irp_notional":      100000,   # USD
+    "score_ann_weight":  100.0,    # custom score: ₹ credited per 1% annualised return
+    "score_day_weight":  0.0,      # custom score: ₹ debited per day to expiry
+}
+
+RANK_KEYS = {                      # rank key → label; higher ranks first
+    "net_pnl":    "Net P&L (₹)",
+    "ann_return": "Annualised return (%)",
+    "score":      "Custom score",
+}
+
+
+# ── STRATEGY LEGS ─────────────────────────────────────────────────────────────
+@timed("scan.pcp")
+def scan_pcp(asset, spot_data, expiry, today, cfg):
+    """Full-chain PCP for one asset. Returns (opportunities, n_profitable).
+
+    Only a chain from NSE is scanned: without one there are no option
+    quotes, so no PCP trade, as there is no basis trade without a futures
+    quote.
+    """
+    spot, option_chain, source = spot_data[0], spot_data[1], spot_data[5]
+    if source != "nse" or option_chain.is_empty:
+        return [], 0
+    lot  = LOT_SIZES[asset]
+    chain = pcp_chain_scan(spot, option_chain, cfg["r"], lot, lots=1, brokerage=cfg["brokerage"], today=today,
+                           max_iv_dev=cfg["pcp_max_iv_dev"], min_volume=cfg["pcp_min_volume"],
+                           dividends=DIVIDENDS.schedule(asset, today), american=cfg["pcp_exercise"] == "american")
+
+    threshold   = spot * (cfg["pcp_min_dev"] / 100)
+    keep        = np.abs(chain["gap"].to_numpy()) > threshold
+    if cfg["pcp_skip_stale"]:
+        keep &= ~chain["stale"].to_numpy(dtype=bool)
+    hits        = chain[keep]
+    profit_mask = hits["net_pnl"].to_numpy() > cfg["min_profit"]
+    if cfg["only_profitable"]:
+        hits = hits[profit_mask]
+
+    opps = []
+    # Chain is already ranked by net P&L; surface the best few strikes per asset.
+    # Whole columns as lists, not itertuples/to_dict: their per-row iloc slicing
+    # dominated a 200-asset scan.
+    top = hits.head(cfg["pcp_max_per_asset"])
+    for values in zip(*(top[c].tolist() for c in PCP_ROW_FIELDS)):
+        row = dict(zip(PCP_ROW_FIELDS, values))
+        exp = row["expiry_date"] if isinstance(row["expiry_date"], datetime.date) else expiry
+        opps.append({
+            "strategy":    "Put-Call Parity",
+            "asset":       asset,
+            "type":        "{} · K {:,.0f}".format(row["type"], row["strike"]),
+            "strike":      row["strike"],
+            "spot":        spot,
+            "gap":         row["gap"],
+            "gross":       row["gross"],
+            "friction":    row["friction"],
+            "net_pnl":     row["net_pnl"],
+            "ann_return":  row["ann_return"],
+            "expiry":      exp,
+            "days":        int(row["days"]),
+            "profitable":  bool(row["net_pnl"] > cfg["min_profit"]),
+            "action":      ("Buy Spot · Buy Put · Sell Call"
+                            if row["gap"] > 0 else
+                            "Short Spot · Sell Put · Buy Call"),
+            "data_src":    source,
+        })
+    return opps, int(profit_mask.sum())
+
+
+_NEAR_BASIS = [(None, None, None)]   # (key, curves, rows) of the last call, swapped whole
+
+
+def near_month_basis(curves, today, cfg):
+    """{asset: near-month basis row} for every underlying in a futures curves frame, in one pass.
+
+    ``curves`` is a poller snapshot's "futures" (FUTURES_COLUMNS). Spot and
+    futures come from the same feed, so the basis isn't skewed by a spot
+    fetched at another moment. One lot per trade; rows without a lot size
+    are dropped. The last result is kept, so a daemon rescanning the same
+    snapshot doesn't redo it.
+    """
+    key = (today, cfg["r"], cfg["brokerage"])
+    last_key, last_curves, rows = _NEAR_BASIS[0]
+    if last_key == key and last_curves is curves:
+        return rows
+    term = futures_term_structure(curves, cfg["r"], lots=1, brokerage=cfg["brokerage"], today=today)
+    near = term[(term["tenor"] == "near") & term["net_pnl"].notna()]
+    days = np.maximum(near["days"].to_numpy(dtype=float), 1.0)
+    ann  = near["net_pnl"].to_numpy() / (near["spot"].to_numpy() * near["lot_size"].to_numpy()) * (365 / days) * 100
+    rows = {asset: dict(zip(NEAR_BASIS_FIELDS, values)) for asset, *values in zip(
+        near["asset"].tolist(), *(near[c].tolist() for c in NEAR_BASIS_FIELDS[:-1]), ann.tolist())}
+    _NEAR_BASIS[0] = (key, curves, rows)
+    return rows
+
+
+@timed("scan.futures_basis")
+def scan_futures_basis(asset, quote, today, cfg):
+    """Cost-of-carry basis for one asset's near-month future. Returns (opportunities, n_profitable).
+
+    ``quote`` is the asset's near_month_basis() row; None — no futures
+    quote for it in this snapshot — yields nothing.
+    """
+    if quote is None:
+        return [], 0
+    basis, net = quote["basis"], quote["net_pnl"]
+    if abs(basis) <= quote["fair"] * (cfg["fb_min_dev"] / 100):
+        return [], 0
+    profitable = bool(net > cfg["min_profit"])
+    if cfg["only_profitable"] and not profitable:
+        return [], 0
+    return [{
+        "strategy":   "Futures Basis",
+        "asset":      asset,
+        "type":       "Cash & Carry" if basis > 0 else "Reverse C&C",
+        "spot":       quote["spot"],
+        "gap":        basis,
+        "gross":      quote["gross"],
+        "friction":   quote["friction"],
+        "net_pnl":    net,
+        "ann_return": quote["ann_return"],
+        "expiry":     quote["expiry_date"],
+        "days":       int(quote["days"]),
+        "profitable": profitable,
+        "action":     "Buy Spot · Sell Futures" if basis > 0 else "Short Spot · Buy Futures",
+        "data_src":   "futures",
+    }], int(profitable)
+
+
+@timed("scan.irp")
+def scan_irp(fx, today, cfg, forwards=None):
+    """Covered IRP on USD/INR at every tenor of the forward curve. Returns (opportunities, n_profitable).
+
+    ``forwards`` is (curve, source) as from forward_curve(); by default the
+    quote file in ARB_FORWARD_CURVE. The stand-in curve is noise, not quotes:
+    without a readable quote file there is no IRP trade, as there is no basis
+    trade without a futures quote.
+    """
+    curve, source = forwards or forward_curve(fx, cfg["r"], cfg["r_us"], seed=today.toordinal())
+    if source != "file":
+        return [], 0
+    surface = irp_surface(fx, curve, cfg["r"], cfg["r_us"], cfg["irp_notional"], cfg["brokerage"], shocks_bp=(0,))
+    gap     = surface["gap"].to_numpy()
+    keep    = np.abs(gap) > surface["f_theory"].to_numpy() * (cfg["irp_min_dev"] / 100)
+    profit_mask = surface["net_pnl"].to_numpy() > cfg["min_profit"]
+    n_profitable = int((keep & profit_mask).sum())
+    if cfg["only_profitable"]:
+        keep &= profit_mask
+    hits = surface[keep].sort_values("net_pnl", ascending=False, kind="stable").head(cfg["irp_max_tenors"])
+
+    opps = []
+    for tenor, days, g, gross, friction, net, ann in zip(*(hits[c].tolist() for c in (
+            "tenor", "days", "gap", "gross", "friction", "net_pnl", "ann_return"))):
+        opps.append({
+            "strategy":   "Interest Rate Parity",
+            "asset":      "USD/INR",
+            "type":       "{} · {}".format("Borrow USD · Invest INR" if g > 0 else "Borrow INR · Invest USD", tenor),
+            "spot":       fx,
+            "gap":        g,
+            "gross":      gross,
+            "friction":   friction,
+            "net_pnl":    net,
+            "ann_return": ann,
+            "expiry":     today + datetime.timedelta(days=days),
+            "days":       days,
+            "profitable": bool(net > cfg["min_profit"]),
+            "action":     "Borrow USD · Convert · Invest INR · Sell Forward" if g > 0 else "Borrow INR · Convert · Invest USD · Buy Forward",
+            "data_src":   "forward curve ({})".format(source),
+        })
+    return opps, n_profitable
+
+
+# ── PIPELINE ──────────────────────────────────────────────────────────────────
+def iter_scan(market_data, fx_rate, assets, strategies=STRATEGIES, settings=None, today=None, futures=None):
+    """The scan one unit at a time: yields (code, asset, opportunities, n_profitable).
+
+    One unit is one strategy on one asset (code "PCP" / "FB" / "IRP").
+    ``market_data`` is a dict as for run_scan(), or an iterable of
+    (asset, tuple) pairs in arrival order — e.g. MarketDataPoller.iter_poll()
+    — so each asset is scanned as soon as its data lands. IRP needs no
+    chain and comes first (only with ARB_FORWARD_CURVE set). ``futures`` is the snapshot's futures curves, or
+    a callable returning the latest ones when they land mid-stream; assets
+    without a futures quote get no basis trade. Units are unranked; see
+    run_scan().
+    """
+    cfg    = dict(SCAN_DEFAULTS, **(settings or {}))
+    today  = today or datetime.date.today()
+    expiry = next_monthly_expiry(today)
+
+    def basis_quote(asset):
+        curves = futures() if callable(futures) else futures
+        return None if curves is None else near_month_basis(curves, today, cfg).get(asset)
+
+    # IRP is currency-based: once per scan, not per equity asset.
+    if "Interest Rate Parity" in strategies and assets:
+        yield ("IRP", "USD/INR") + scan_irp(fx_rate, today, cfg)
+
+    if isinstance(market_data, dict):
+        arrivals = ((a, market_data.get(a) or fallback_market_data(a)) for a in assets)
+    else:
+        wanted   = set(assets)
+        arrivals = ((a, d) for a, d in market_data if a in wanted)
+    for asset, spot_data in arrivals:
+        if "Put-Call Parity" in strategies:
+            yield ("PCP", asset) + scan_pcp(asset, spot_data, expiry, today, cfg)
+        if "Futures Basis" in strategies:
+            yield ("FB", asset) + scan_futures_basis(asset, basis_quote(asset), today, cfg)
+
+
+def run_scan(market_data, fx_rate, assets, strategies=STRATEGIES, settings=None, today=None,
+             rank="net_pnl", top=None, futures=None):
+    """Evaluate every requested strategy and rank the results.
+
+    ``market_data`` maps asset → the market-data tuple (a poller snapshot's
+    "market_data"); missing assets use the fallback spot. ``futures`` is the
+    snapshot's futures curves (see iter_scan()). ``settings``
+    overrides SCAN_DEFAULTS. ``rank`` is a RANK_KEYS name; with ``top`` only
+    the best ``top`` are kept (TopN), otherwise everything is sorted.
+    Returns (opportunities, summary) where summary holds profitable counts
+    per strategy, their total, everything found and the scan expiry.
+    """
+    today   = today or datetime.date.today()
+    summary = {"PCP": 0, "FB": 0, "IRP": 0, "total": 0, "found": 0, "expiry": next_monthly_expiry(today)}
+    key     = rank_key(rank, settings)
+    ranked  = TopN(top, key) if top else None
+    opportunities = []
+    for code, _, opps, n in iter_scan(market_data, fx_rate, assets, strategies, settings, today, futures):
+        if ranked is not None:
+            ranked.extend(opps)
+        else:
+            opportunities += opps
+        summary[code] += n
+        summary["found"] += len(opps)
+    summary["total"] = summary["PCP"] + summary["FB"] + summary["IRP"]
+    if ranked is not None:
+        return ranked.ranked(), summary
+    opportunities.sort(key=key, reverse=True)
+    return opportunities, summary
+
+
+# ── RANKING ───────────────────────────────────────────────────────────────────
+def rank_key(name, settings=None):
+    """Sort key for a RANK_KEYS name (higher is better).
+
+    "score" is net P&L plus ``score_ann_weight`` ₹ per 1% annualised return,
+    less ``score_day_weight`` ₹ per day to expiry — a quick way to favour
+    fast, capital-light trades over the single biggest rupee figure.
+    """
+    if name == "net_pnl":
+        return lambda o: o["net_pnl"]
+    if name == "ann_return":
+        return lambda o: o["ann_return"]
+    if name == "score":
+        cfg = dict(SCAN_DEFAULTS, **(settings or {}))
+        w_ann, w_day = cfg["score_ann_weight"], cfg["score_day_weight"]
+        return lambda o: o["net_pnl"] + w_ann * o["ann_return"] - w_day * o["days"]
+    raise ValueError("unknown rank key {!r}; expected one of {}".format(name, ", ".join(RANK_KEYS)))
+
+
+class TopN:
+    """The ``n`` best items pushed so far under ``key``, in a bounded min-heap.
+
+    A push is O(log n) and memory stays O(n) however many opportunities a
+    full-universe scan turns up; ``seen`` counts everything pushed. Ties keep
+    the earlier item, so results arriving in scan order rank stably.
+    """
+
+    def __init__(self, n, key):
+        self.n     = max(int(n), 1)
+        self.key   = key
+        self.seen  = 0
+        self._heap = []            # (key, -arrival, item); the root is the weakest kept
+        self._arrival = itertools.count()
+
+    def push(self, item):
+        self.seen += 1
+        entry = (self.key(item), -next(self._arrival), item)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def ranked(self):
+        """Kept items, best first."""
+        return [e[2] for e in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+def paginate(items, page, page_size):
+    """(items on ``page`` (1-based, clamped), page, n_pages) for a ranked list."""
+    n_pages = max((len(items) + page_size - 1) // page_size, 1)
+    page    = min(max(int(page), 1), n_pages)
+    return items[(page - 1) * page_size:page * page_size], page, n_pages
+
+
+def snapshot_fx(snapshot):
+    yf_closes = snapshot["yf"]
+    return float(round(yf_closes[FX_TICKER][0], 4)) if FX_TICKER in yf_closes else FALLBACK_FX
+
+
+def opportunity_to_json(opp, **extra):
+    row = dict(opp, **extra)
+    row["expiry"] = row["expiry"].isoformat() if hasattr(row["expiry"], "isoformat") else row["expiry"]
+    return json.dumps(row, ensure_ascii=False, default=float)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Headless cross-asset arbitrage scanner (JSON lines on stdout).")
+    parser.add_argument("--assets", nargs="+", metavar="SYMBOL", help="underlyings to scan (default: --universe)")
+    parser.add_argument("--universe", default="watchlist", choices=list(UNIVERSES),
+                        help="instrument-master universe to scan when --assets is not given")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGY_CODES), choices=list(STRATEGY_CODES))
+    parser.add_argument("--rate", type=float, default=SCAN_DEFAULTS["r"] * 100, help="India risk-free rate (%%)")
+    parser.add_argument("--brokerage", type=float, default=SCAN_DEFAULTS["brokerage"], help="₹ per order")
+    parser.add_argument("--min-profit", type=float, default=SCAN_DEFAULTS["min_profit"], help="₹ net")
+    parser.add_argument("--all", action="store_true", help="also emit opportunities below the profit filter")
+    parser.add_argument("--american", action="store_true", help="price PCP legs as American options (early exercise)")
+    parser.add_argument("--rank", default="net_pnl", choices=list(RANK_KEYS), help="ranking key (default: net_pnl)")
+    parser.add_argument("--top", type=int, default=0, metavar="N", help="emit (and record) only the best N per scan (0 = all)")
+    parser.add_argument("--daemon", action="store_true", help="scan continuously instead of once")
+    parser.add_argument("--interval", type=float, default=1.0, help="daemon: seconds between scans")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_S, help="daemon: seconds between market data fetches")
+    parser.add_argument("--count", type=int, default=0, help="daemon: stop after N scans (0 = run forever)")
+    parser.add_argument("--stream", action="store_true",
+                        help="one scan, emitting each asset's results as its fetch lands (arrival order, unranked)")
+    parser.add_argument("--history", metavar="PATH", help="also append every scan to this history database")
+    parser.add_argument("--chain-cache", metavar="PATH", help="persist the last good option chains here across runs")
+    parser.add_argument("--record-ticks", metavar="PATH", help="append each new chain snapshot as PCP ticks (CSV) for backtest.py")
+    parser.add_argument("--verbose", action="store_true", help="one stderr line per scan with timing and counts")
+    parser.add_argument("--profile", action="store_true", help="time fetches and strategy legs; stats on stderr at exit")
+    parser.add_argument("--profile-prom", metavar="PATH",
+                        help="with profiling on, rewrite this file in Prometheus text format after every scan")
+    args = parser.parse_args(argv)
+    if args.assets is None:
+        args.assets = INSTRUMENTS.universe(args.universe)
+    unknown = [a for a in args.assets if a not in INSTRUMENTS]
+    if unknown:
+        parser.error("not in the instrument master: {}".format(", ".join(unknown)))
+    return args
+
+
+def _stream_once(poller, args, strategies, settings, history):
+    """One fetch cycle with each asset scanned and written the moment it lands."""
+    t0 = time.perf_counter()
+    arrivals = poller.iter_poll()
+    first    = next(arrivals, None)   # the yfinance batch is in by the first arrival
+    fx_rate  = snapshot_fx(poller.snapshot) if poller.snapshot else FALLBACK_FX
+    stream   = itertools.chain([first] if first else [], arrivals)
+    out, found, first_result_ms, all_opps = sys.stdout, 0, None, []
+    # The futures curves land mid-cycle; until then the previous cycle's are used, if any.
+    futures = lambda: (poller.snapshot or {}).get("futures")
+    for _, _, opps, _ in iter_scan(stream, fx_rate, args.assets, strategies, settings, futures=futures):
+        now = time.time()
+        for opp in opps:
+            out.write(opportunity_to_json(opp, ts=now) + "\n")
+        out.flush()
+        if opps and first_result_ms is None:
+            first_result_ms = (time.perf_counter() - t0) * 1000
+        found += len(opps)
+        all_opps += opps
+    snapshot = poller.snapshot
+    if history is not None:
+        history.append_scan(all_opps, snapshot["ts"])
+    if args.record_ticks:
+        from backtest import append_ticks, pcp_ticks_from_snapshot
+        append_ticks(pcp_ticks_from_snapshot(snapshot), args.record_ticks)
+    futures_ms = snapshot["latency_ms"].get("futures")
+    sys.stderr.write(json.dumps({
+        "event": "stream", "import_ms": round(_IMPORT_MS, 1),
+        "first_result_ms": None if first_result_ms is None else round(first_result_ms, 1),
+        "cycle_ms": round((time.perf_counter() - t0) * 1000, 1), "found": found,
+        "futures_ms": None if futures_ms is None else round(futures_ms, 1),
+    }) + "\n")
+    return 0
+
+
+def _write_profile(args, final=False):
+    """Profiling output: the Prometheus text file (atomically), and at exit a stderr JSON line."""
+    if args.profile_prom:
+        tmp = args.profile_prom + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(PROFILER.prometheus())
+        os.replace(tmp, args.profile_prom)
+    if final:
+        sys.stderr.write(json.dumps(dict({"event": "profile"}, **PROFILER.snapshot())) + "\n")
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    strategies = [STRATEGY_CODES[c] for c in args.strategies]
+    settings = {
+        "r":               args.rate / 100,
+        "brokerage":       args.brokerage,
+        "min_profit":      args.min_profit,
+        "only_profitable": not args.all,
+        "pcp_exercise":    "american" if args.american else "european",
+    }
+    history = None
+    if args.history:
+        from history import OpportunityHistory
+        history = OpportunityHistory(args.history)
+    if args.record_ticks:
+        from backtest import append_ticks, pcp_ticks_from_snapshot
+
+    chain_cache = ChainCache(path=args.chain_cache)
+    poller = MarketDataPoller(args.assets, interval_s=args.poll_interval, chain_cache=chain_cache)
+    profiling = args.profile or bool(args.profile_prom)
+    if profiling:
+        PROFILER.enabled = True
+        PROFILER.register_counters("chain_cache", lambda: chain_cache.counters)
+    if args.stream and not args.daemon:
+        try:
+            return _stream_once(poller, args, strategies, settings, history)
+        finally:
+            if history is not None:
+                history.flush()
+            if profiling:
+                _write_profile(args, final=True)
+    t0 = time.perf_counter()
+    if args.daemon:
+        poller.start()
+        poller.wait_ready(None)
+    else:
+        poller.poll_once()
+    first_fetch_ms = (time.perf_counter() - t0) * 1000
+
+    out = sys.stdout
+    scans = 0
+    recorded_ts = None
+    try:
+        while True:
+            scan_t0  = time.perf_counter()
+            snapshot = poller.snapshot
+            opps, summary = run_scan(snapshot["market_data"], snapshot_fx(snapshot), args.assets, strategies, settings,
+                                     rank=args.rank, top=args.top or None, futures=snapshot["futures"])
+            scan_ms  = (time.perf_counter() - scan_t0) * 1000
+            now      = time.time()
+            for opp in opps:
+                out.write(opportunity_to_json(opp, ts=now, snapshot_ts=snapshot["ts"]) + "\n")
+            out.flush()
+            # Mid-cycle snapshots are republished every few hundred ms; record only whole cycles.
+            if history is not None and snapshot["complete"]:
+                history.append_scan(opps, snapshot["ts"])
+            if args.record_ticks and snapshot["complete"] and snapshot["ts"] != recorded_ts:
+                append_ticks(pcp_ticks_from_snapshot(snapshot), args.record_ticks)
+                recorded_ts = snapshot["ts"]
+            if scans == 0:
+                futures_ms = snapshot["latency_ms"].get("futures")
+                sys.stderr.write(json.dumps({
+                    "event": "startup", "import_ms": round(_IMPORT_MS, 1),
+                    "first_fetch_ms": round(first_fetch_ms, 1), "first_scan_ms": round(scan_ms, 1),
+                    "futures_ms": None if futures_ms is None else round(futures_ms, 1),
+                    "futures_contracts": 0 if snapshot["futures"] is None else len(snapshot["futures"]),
+                }) + "\n")
+            elif args.verbose:
+                sys.stderr.write(json.dumps({
+                    "event": "scan", "scan_ms": round(scan_ms, 2), "found": summary["found"],
+                    "profitable": summary["total"], "snapshot_age_s": round(now - snapshot["ts"], 1),
+                }) + "\n")
+            if profiling:
+                PROFILER.record("scan.total", scan_ms)
+                if args.profile_prom:
+                    _write_profile(args)
+            scans += 1
+            if not args.daemon or (args.count and scans >= args.count):
+                break
+            time.sleep(max(args.interval - (time.perf_counter() - scan_t0), 0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.stop()
+        if history is not None:
+            history.flush()
+        if profiling:
+            _write_profile(args, final=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
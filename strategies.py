@@ -0,0 +1,494 @@
+"""Strategy kernels — vectorized parity checks over whole option chains.
+
+Pure NumPy/pandas, no Streamlit, so the same math serves the scanner, Tab 1
+and anything run outside the app.
+"""
+import calendar
+import datetime
+import functools
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import PROFILER, timed
+from pricing import bs_greeks, chain_greeks, dividend_pv, early_exercise_premium, implied_vol, smile_deviation
+
+# ── FRICTION MODEL ────────────────────────────────────────────────────────────
+STT_SPOT     = 0.001      # 0.1% on spot trade value
+STT_OPTIONS  = 0.000625   # 0.0625% on option premium
+BASIS_ORDERS = 4          # spot + futures, opened and closed
+CALENDAR_ORDERS = 4       # near + far futures, opened and closed
+IRP_ORDERS   = 4          # spot, forward and the two deposit legs
+
+NSE_EXPIRY_FORMAT = "%d-%b-%Y"
+
+# ── STALE-PRINT FILTER ────────────────────────────────────────────────────────
+PCP_MAX_IV_DEV = 5.0      # vol points a leg's IV may sit off its expiry's smile
+PCP_MIN_VOLUME = 1        # contracts traded today on each leg (unknown volume passes)
+
+PCP_CHAIN_COLUMNS = ["expiry", "expiry_date", "days", "strike", "call", "put", "pv_k",
+                     "synthetic", "gap", "gross", "friction", "net_pnl", "ann_return", "type",
+                     "call_iv", "put_iv", "iv_dev", "stale", "pv_div", "early_ex"]
+
+
+def pcp_orders(lots):
+    """Brokerage orders per PCP trade: 2·lots option orders + 2 spot orders."""
+    return 2 * lots + 2
+
+
+def parse_nse_expiry(expiry):
+    """'28-Nov-2024' (NSE) or '2024-11-28' → date, None if unparseable."""
+    for fmt in (NSE_EXPIRY_FORMAT, "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(expiry, fmt).date()
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+# ── EXPIRY CALENDAR ───────────────────────────────────────────────────────────
+def last_thursday(year, month):
+    cal = calendar.monthcalendar(year, month)
+    thursdays = [w[3] for w in cal if w[3] != 0]
+    return datetime.date(year, month, thursdays[-1])
+
+
+def monthly_expiries(today, n=3):
+    """The next ``n`` NSE monthly expiries (last Thursdays) after ``today`` — near, mid, far."""
+    out, y, m = [], today.year, today.month
+    while len(out) < n:
+        exp = last_thursday(y, m)
+        if exp > today:
+            out.append(exp)
+        m += 1
+        if m > 12: m = 1; y += 1
+    return out
+
+
+def next_monthly_expiry(today):
+    return monthly_expiries(today, 1)[0]
+
+
+# ── KERNELS ───────────────────────────────────────────────────────────────────
+# Scalar or array inputs (NumPy broadcasting); shared by the scanner, the
+# chain scan and the backtester so every path uses the same friction model.
+def pcp_kernel(spot, strike, call, put, r, T, lot_size, lots=1, brokerage=20.0, pv_div=0.0, early_ex=0.0):
+    """Returns (pv_k, synthetic, gap, gross, friction, net).
+
+    ``pv_div`` is the PV of dividends going ex before expiry; ``early_ex`` the
+    American call-minus-put early-exercise premium (0 for European options).
+    """
+    units    = lots * lot_size
+    pv_k     = strike * np.exp(-r * T)
+    synth    = call - put - early_ex + pv_k + pv_div
+    gap      = spot - synth
+    gross    = np.abs(gap) * units
+    friction = brokerage * pcp_orders(lots) + spot * units * STT_SPOT + (call + put) * units * STT_OPTIONS
+    return pv_k, synth, gap, gross, friction, gross - friction
+
+
+def basis_kernel(spot, futures, r, T, lot_size, lots=1, brokerage=20.0):
+    """Returns (fair, basis, gross, friction, net). Brokerage on 4 orders, STT on spot."""
+    units    = lots * lot_size
+    fair     = spot * np.exp(r * T)
+    basis    = futures - fair
+    gross    = np.abs(basis) * units
+    friction = brokerage * BASIS_ORDERS + spot * units * STT_SPOT
+    return fair, basis, gross, friction, gross - friction
+
+
+def calendar_kernel(f_near, f_far, r, T_near, T_far, lot_size, lots=1, brokerage=20.0):
+    """Returns (fair_far, gap, gross, friction, net). Far leg priced off the near one
+    at the carry rate; brokerage on 4 futures orders, no spot leg so no STT."""
+    units    = lots * lot_size
+    fair_far = f_near * np.exp(r * (T_far - T_near))
+    gap      = f_far - fair_far
+    gross    = np.abs(gap) * units
+    friction = brokerage * CALENDAR_ORDERS + 0.0 * gross   # broadcast to the shape of gross
+    return fair_far, gap, gross, friction, gross - friction
+
+
+def irp_kernel(fx, forward, r_d, r_f, T, notional, brokerage=20.0):
+    """Returns (f_theory, gap, gross, friction, net) in INR. Brokerage on 4 legs, no STT."""
+    f_theory = fx * np.exp((r_d - r_f) * T)
+    gap      = forward - f_theory
+    gross    = np.abs(gap) * notional
+    friction = brokerage * IRP_ORDERS + 0.0 * gross   # broadcast to the shape of gross
+    return f_theory, gap, gross, friction, gross - friction
+
+
+# ── PUT-CALL PARITY — FULL CHAIN ──────────────────────────────────────────────
+@timed("strategy.pcp_chain")
+def pcp_chain_scan(spot, chain, r, lot_size, lots=1, brokerage=20.0, today=None,
+                   max_iv_dev=PCP_MAX_IV_DEV, min_volume=PCP_MIN_VOLUME, dividends=None, american=False):
+    """Put-Call Parity at every strike/expiry pair the chain quotes, in one pass.
+
+    ``chain`` is an OptionChain, so calls and puts are already aligned on
+    (expiry, strike); rows without a traded price on both sides are dropped.
+    Friction matches Tab 1: brokerage on 2·lots option orders + 2 spot orders,
+    0.1% STT on spot, 0.0625% on premium. Returns a DataFrame
+    (PCP_CHAIN_COLUMNS) ranked by net P&L, best first.
+
+    Each leg's implied vol is solved over the whole chain; ``iv_dev`` is the
+    worse leg's distance from the expiry's smile in vol points (see
+    pricing.smile_deviation) and ``stale`` marks rows whose gap is likely a
+    stale last price: ``iv_dev`` above ``max_iv_dev`` or either leg traded
+    fewer than ``min_volume`` contracts. Rows are flagged, not dropped.
+
+    ``dividends`` is the underlying's (times, amounts) schedule
+    (DividendCalendar.schedule); their PV to each expiry (``pv_div``) comes
+    off spot in the parity and in the IVs. With ``american`` each row's
+    early-exercise premium, call minus put (``early_ex``), is priced on a
+    binomial lattice at the strike's IV — one batch per expiry — and taken
+    out of C − P before the gap is measured.
+    """
+    if chain.is_empty:
+        return pd.DataFrame(columns=PCP_CHAIN_COLUMNS)
+    rows = np.flatnonzero(chain.pairs())
+    if len(rows) == 0:
+        return pd.DataFrame(columns=PCP_CHAIN_COLUMNS)
+    today = today or datetime.date.today()
+
+    # One parse per expiry, not per row. Unparseable expiries fall back to a
+    # 30-day tenor, same as the app's default.
+    expiry_dates = [parse_nse_expiry(e) for e in chain.expiries]
+    expiry_days  = np.array([(d - today).days if d else 30 for d in expiry_dates], dtype=float)
+    idx  = chain.expiry_idx[rows]
+    days = np.maximum(expiry_days[idx], 1.0)
+
+    div_times, div_amounts = dividends if dividends is not None else ((), ())
+    pv_div_exp = dividend_pv(div_times, div_amounts, np.maximum(expiry_days, 1.0) / 365.0, r)
+
+    # IVs over every row, not just the pairs: the smile needs the one-sided
+    # wings as neighbours.
+    T_all  = np.maximum(expiry_days[chain.expiry_idx], 1.0) / 365.0
+    s_ex   = spot - pv_div_exp[chain.expiry_idx]          # escrowed spot per row
+    ivs    = chain_greeks(s_ex, chain, r, T_all, greeks=False)
+    iv_dev = smile_deviation(chain, ivs["call_iv"], ivs["put_iv"], s_ex * np.exp(r * T_all))[rows]
+    with np.errstate(invalid="ignore"):
+        thin = np.fmin(chain.call_volume[rows], chain.put_volume[rows]) < min_volume
+
+    k = chain.strike[rows]
+    c = chain.call_last[rows]
+    p = chain.put_last[rows]
+
+    pv_div   = pv_div_exp[idx]
+    early_ex = np.zeros(len(rows))
+    if american:
+        c_iv, p_iv = ivs["call_iv"][rows], ivs["put_iv"][rows]
+        sigma = np.where(np.isnan(c_iv), p_iv, np.where(np.isnan(p_iv), c_iv, 0.5 * (c_iv + p_iv)))
+        # Strikes without an IV take their expiry's median, or 25% if the expiry has none.
+        for e in np.unique(idx):
+            block = idx == e
+            if np.isnan(sigma[block]).any():
+                known = sigma[block][~np.isnan(sigma[block])]
+                sigma[block] = np.where(np.isnan(sigma[block]), np.median(known) if len(known) else 0.25,
+                                        sigma[block])
+        # Puts everywhere; calls are only worth exercising early ahead of a dividend.
+        with_call = np.flatnonzero(pv_div > 0)
+        legs      = np.concatenate([np.arange(len(rows)), with_call])
+        is_call   = np.arange(len(legs)) >= len(rows)
+        eep       = early_exercise_premium(spot, k[legs], days[legs] / 365.0, r, sigma[legs], is_call,
+                                           div_times, div_amounts)
+        early_ex -= eep[:len(rows)]
+        early_ex[with_call] += eep[len(rows):]
+
+    pv_k, synth, gap, gross, friction, net = pcp_kernel(spot, k, c, p, r, days / 365.0, lot_size, lots, brokerage,
+                                                        pv_div, early_ex)
+    ann = (net / (spot * lots * lot_size)) * (365 / days) * 100
+
+    # Ranked on the arrays, before the frame exists: one gather per column is
+    # cheaper than sort_values' per-block take on the finished frame.
+    order = np.argsort(-net, kind="stable")
+    return pd.DataFrame({
+        "expiry":      chain.expiry_names()[rows[order]],
+        "expiry_date": np.asarray(expiry_dates, dtype=object)[idx[order]],
+        "days":        days[order].astype(int),
+        "strike":      k[order],
+        "call":        c[order],
+        "put":         p[order],
+        "pv_k":        pv_k[order],
+        "synthetic":   synth[order],
+        "gap":         gap[order],
+        "gross":       gross[order],
+        "friction":    friction[order],
+        "net_pnl":     net[order],
+        "ann_return":  ann[order],
+        "type":        np.where(gap[order] > 0, "Conversion", "Reversal"),
+        "call_iv":     ivs["call_iv"][rows[order]],
+        "put_iv":      ivs["put_iv"][rows[order]],
+        "iv_dev":      iv_dev[order],
+        "stale":       ((iv_dev > max_iv_dev) | thin)[order],
+        "pv_div":      pv_div[order],
+        "early_ex":    early_ex[order],
+    })
+
+
+# ── FUTURES TERM STRUCTURE ────────────────────────────────────────────────────
+TENOR_LABELS = ["near", "mid", "far"]
+
+TERM_STRUCTURE_COLUMNS = ["asset", "tenor", "expiry", "expiry_date", "days", "spot", "futures", "fair", "basis",
+                          "basis_pct", "implied_carry", "lot_size", "gross", "friction", "net_pnl", "oi"]
+CALENDAR_COLUMNS = ["asset", "legs", "near_expiry", "far_expiry", "near_days", "far_days", "f_near", "f_far",
+                    "fair_far", "gap", "gap_pct", "forward_carry", "gross", "friction", "net_pnl", "type", "flag"]
+
+
+@timed("strategy.term_structure")
+def futures_term_structure(curves, r, lots=1, brokerage=20.0, today=None):
+    """Basis and implied carry at every listed expiry of every underlying, in one pass.
+
+    ``curves`` has one row per futures contract: asset, expiry, futures, spot,
+    lot_size and optionally oi. Rows are ranked by expiry within each asset
+    (near / mid / far, then "+3", ...); expired contracts are dropped.
+    ``implied_carry`` is the annualised rate the market prices in,
+    ln(F / S) / T, in %. Rows without a lot size get basis and carry but NaN P&L.
+    """
+    if curves is None or curves.empty:
+        return pd.DataFrame(columns=TERM_STRUCTURE_COLUMNS)
+    today = today or datetime.date.today()
+    df = curves.copy()
+    unique_exp = pd.unique(df["expiry"])
+    parsed     = dict(zip(unique_exp, (parse_nse_expiry(e) for e in unique_exp)))
+    df["expiry_date"] = df["expiry"].map(parsed)
+    df = df[df["expiry_date"].notna()]
+    df["days"] = df["expiry_date"].map(lambda d: (d - today).days).astype(int)
+    df = df[(df["days"] >= 0) & (df["futures"] > 0) & (df["spot"] > 0)]
+    if df.empty:
+        return pd.DataFrame(columns=TERM_STRUCTURE_COLUMNS)
+    df = df.sort_values(["asset", "days"], kind="stable").reset_index(drop=True)
+
+    rank = df.groupby("asset", sort=False).cumcount().to_numpy()
+    df["tenor"] = [TENOR_LABELS[i] if i < len(TENOR_LABELS) else "+{}".format(i) for i in rank]
+
+    for col in ("lot_size", "oi"):
+        if col not in df.columns:
+            df[col] = np.nan
+    S = df["spot"].to_numpy(dtype=float)
+    F = df["futures"].to_numpy(dtype=float)
+    T = np.maximum(df["days"].to_numpy(dtype=float), 1.0) / 365.0
+    fair, basis, gross, friction, net = basis_kernel(S, F, r, T, df["lot_size"].to_numpy(dtype=float), lots, brokerage)
+
+    df["fair"]          = fair
+    df["basis"]         = basis
+    df["basis_pct"]     = basis / fair * 100
+    df["implied_carry"] = np.log(F / S) / T * 100
+    df["gross"]         = gross
+    df["friction"]      = friction
+    df["net_pnl"]       = net
+    return df[TERM_STRUCTURE_COLUMNS]
+
+
+@timed("strategy.calendar_spreads")
+def calendar_spreads(term, r, lots=1, brokerage=20.0, min_dev_pct=0.05):
+    """Calendar spreads between consecutive expiries of each underlying.
+
+    The far future is priced off the near one at the carry rate r; ``gap`` is
+    what the market charges beyond that. ``forward_carry`` is the rate implied
+    between the two expiries (%). ``flag`` marks spreads whose gap exceeds
+    ``min_dev_pct`` of the fair far price and still nets a profit.
+    """
+    if term.empty:
+        return pd.DataFrame(columns=CALENDAR_COLUMNS)
+    same = term["asset"].to_numpy()[1:] == term["asset"].to_numpy()[:-1]
+    near = term.iloc[:-1][same].reset_index(drop=True)
+    far  = term.iloc[1:][same].reset_index(drop=True)
+    if near.empty:
+        return pd.DataFrame(columns=CALENDAR_COLUMNS)
+
+    f1, f2 = near["futures"].to_numpy(dtype=float), far["futures"].to_numpy(dtype=float)
+    T1 = np.maximum(near["days"].to_numpy(dtype=float), 1.0) / 365.0
+    T2 = np.maximum(far["days"].to_numpy(dtype=float), 1.0) / 365.0
+    fair_far, gap, gross, friction, net = calendar_kernel(f1, f2, r, T1, T2, near["lot_size"].to_numpy(dtype=float),
+                                                          lots, brokerage)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fwd_carry = np.log(f2 / f1) / np.maximum(T2 - T1, 1.0 / 365.0) * 100
+    gap_pct = gap / fair_far * 100
+
+    return pd.DataFrame({
+        "asset":         near["asset"],
+        "legs":          near["tenor"] + "/" + far["tenor"],
+        "near_expiry":   near["expiry"],
+        "far_expiry":    far["expiry"],
+        "near_days":     near["days"],
+        "far_days":      far["days"],
+        "f_near":        f1,
+        "f_far":         f2,
+        "fair_far":      fair_far,
+        "gap":           gap,
+        "gap_pct":       gap_pct,
+        "forward_carry": fwd_carry,
+        "gross":         gross,
+        "friction":      friction,
+        "net_pnl":       net,
+        "type":          np.where(gap > 0, "Sell far · Buy near", "Buy far · Sell near"),
+        "flag":          (np.abs(gap_pct) > min_dev_pct) & (net > 0),
+    })[CALENDAR_COLUMNS]
+
+
+# ── IRP FORWARD CURVE ─────────────────────────────────────────────────────────
+IRP_RATE_SHOCKS_BP = (-100, -50, -25, 0, 25, 50, 100)   # parallel shifts to r_d, basis points
+
+IRP_SURFACE_COLUMNS = ["tenor", "days", "shock_bp", "forward", "f_theory", "gap", "gap_pct", "gross",
+                       "friction", "net_pnl", "ann_return"]
+
+
+@timed("strategy.irp_surface")
+def irp_surface(fx, curve, r_d, r_f, notional, brokerage=20.0, shocks_bp=IRP_RATE_SHOCKS_BP):
+    """Covered IRP at every tenor of a forward curve under every rate shock, in one broadcast.
+
+    ``curve`` has one row per tenor: tenor, days, forward (see
+    market_data.forward_curve). Each shock shifts the INR rate, i.e. the
+    rate differential F* is priced off. One row per (tenor, shock), tenor
+    first; pivot on ``shock_bp`` for the tenor × scenario matrix.
+    ``ann_return`` is net P&L on the INR notional, annualised, in %.
+    """
+    if curve is None or curve.empty:
+        return pd.DataFrame(columns=IRP_SURFACE_COLUMNS)
+    days   = curve["days"].to_numpy(dtype=float)[:, None]
+    F      = curve["forward"].to_numpy(dtype=float)[:, None]
+    shocks = np.asarray(shocks_bp, dtype=float)
+    T      = np.maximum(days, 1.0) / 365.0
+    f_theory, gap, gross, friction, net = irp_kernel(fx, F, r_d + shocks[None, :] / 1e4, r_f, T, notional, brokerage)
+    n_shocks = len(shocks)
+    return pd.DataFrame({
+        "tenor":      np.repeat(curve["tenor"].to_numpy(), n_shocks),
+        "days":       np.repeat(days[:, 0].astype(int), n_shocks),
+        "shock_bp":   np.tile(shocks.astype(int), len(curve)),
+        "forward":    np.repeat(F[:, 0], n_shocks),
+        "f_theory":   f_theory.ravel(),
+        "gap":        gap.ravel(),
+        "gap_pct":    (gap / f_theory * 100).ravel(),
+        "gross":      gross.ravel(),
+        "friction":   friction.ravel(),
+        "net_pnl":    net.ravel(),
+        "ann_return": (net / (fx * notional) * (365.0 / np.maximum(days, 1.0)) * 100).ravel(),
+    })[IRP_SURFACE_COLUMNS]
+
+
+# ── SINGLE TRADES (MEMOIZED) ──────────────────────────────────────────────────
+# One trade per call, for the app's PCP / IRP / basis tabs. Scalar inputs
+# only, so each function is pure and hashable and sits behind an LRU keyed
+# on the full input tuple (spot, strike, prices, r, T, lots, costs, ...):
+# a rerun that changes nothing a tab depends on reuses the last result. The
+# same object goes to every caller, so arrays come back read-only.
+TRADE_CACHE_SIZE = 256    # distinct input tuples kept per function; least recently used go first
+
+
+def _read_only(*arrays):
+    for a in arrays:
+        a.setflags(write=False)
+    return arrays
+
+
+def _signal(gap, threshold, rich, cheap):
+    return rich if gap > threshold else cheap if gap < -threshold else "none"
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+@timed("strategy.pcp_legs")
+def pcp_leg_analytics(spot, strike, call, put, r, T, div_times=(), div_amounts=(), american=False):
+    """Both legs at one strike: IVs, Greeks, dividend PV and the early-exercise premium.
+
+    IVs and Greeks are taken against the ex-dividend spot (escrowed model);
+    ``early_ex`` is the American call-minus-put premium, 0 unless ``american``.
+    Dividend times/amounts are tuples (see DividendCalendar.schedule).
+    """
+    pv_div = float(dividend_pv(np.asarray(div_times), np.asarray(div_amounts), T, r))
+    s_ex   = spot - pv_div
+    iv     = implied_vol([call, put], s_ex, strike, T, r, [True, False])
+    with np.errstate(invalid="ignore"):
+        greeks = bs_greeks(s_ex, strike, T, r, iv, [True, False])
+    early_ex = 0.0
+    if american:
+        known = iv[~np.isnan(iv)]
+        eep   = early_exercise_premium(spot, strike, T, r, float(known.mean()) if len(known) else 0.25,
+                                       [True, False], div_times, div_amounts)
+        early_ex = float(eep[0] - eep[1])
+    _read_only(iv, *greeks.values())
+    return {"pv_div": pv_div, "s_ex": s_ex, "iv": iv, "greeks": greeks, "early_ex": early_ex}
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+@timed("strategy.pcp")
+def pcp_trade(spot, strike, call, put, r, T, lot_size, lots, brokerage, threshold, pv_div=0.0, early_ex=0.0):
+    """One PCP trade through pcp_kernel(), plus the friction split and the signal.
+
+    ``threshold`` is the smallest |gap| per unit worth trading; below it the
+    signal is "none" and the P&L is just the friction paid.
+    """
+    units = lots * lot_size
+    pv_k, synth, gap, gross, friction, net = pcp_kernel(spot, strike, call, put, r, T, lot_size, lots, brokerage,
+                                                        pv_div, early_ex)
+    signal = _signal(gap, threshold, "conversion", "reversal")
+    return {"pv_k": pv_k, "synthetic": synth, "gap": gap, "gross": gross, "friction": friction,
+            "orders": pcp_orders(lots), "brokerage": brokerage * pcp_orders(lots),
+            "stt_spot": spot * units * STT_SPOT, "stt_options": (call + put) * units * STT_OPTIONS,
+            "net_pnl": net if signal != "none" else -friction, "signal": signal}
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+def pcp_payoff(spot, strike, call, put, units, signal, points=300, band=0.25):
+    """(prices, spot_pnl, put_pnl, call_pnl) at expiry over spot ± ``band``, for the signal's legs."""
+    prices = np.linspace(spot * (1 - band), spot * (1 + band), points)
+    if signal == "none":
+        flat = np.zeros_like(prices)
+        return _read_only(prices, flat, flat.copy(), flat.copy())
+    side     = 1.0 if signal == "conversion" else -1.0   # conversion: long spot, long put, short call
+    spot_pnl = side * (prices - spot) * units
+    put_pnl  = side * (np.maximum(strike - prices, 0) - put) * units
+    call_pnl = side * (call - np.maximum(prices - strike, 0)) * units
+    return _read_only(prices, spot_pnl, put_pnl, call_pnl)
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+@timed("strategy.irp")
+def irp_trade(fx, forward, r_d, r_f, T, notional, brokerage, threshold_pct):
+    """One covered-IRP trade through irp_kernel(), in INR and USD, plus the signal.
+
+    Signal "rich" (forward above F*: borrow USD, invest INR, sell forward),
+    "cheap" or "none", against ``threshold_pct`` of the theoretical forward.
+    """
+    f_theory, gap, gross, friction, net = irp_kernel(fx, forward, r_d, r_f, T, notional, brokerage)
+    return {"f_theory": f_theory, "gap": gap, "gap_pct": gap / f_theory * 100, "gross": gross,
+            "friction": friction, "net_pnl": net, "net_usd": net / fx,
+            "signal": _signal(gap, f_theory * threshold_pct / 100, "rich", "cheap")}
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+def irp_sensitivity(f_theory, notional, friction, points=200, band=0.02):
+    """(forwards, net_pnl): net INR P&L against market forwards over F* ± ``band``."""
+    forwards = np.linspace(f_theory * (1 - band), f_theory * (1 + band), points)
+    return _read_only(forwards, np.abs(forwards - f_theory) * notional - friction)
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+@timed("strategy.futures_basis")
+def basis_trade(spot, futures, r, T, lot_size, lots, brokerage, threshold_pct):
+    """One cash-and-carry trade through basis_kernel(), plus the friction split and the signal.
+
+    Signal "carry" (futures rich: buy spot, sell futures), "reverse" or
+    "none", against ``threshold_pct`` of the fair futures price.
+    """
+    units = lots * lot_size
+    fair, basis, gross, friction, net = basis_kernel(spot, futures, r, T, lot_size, lots, brokerage)
+    return {"fair": fair, "basis": basis, "basis_pct": basis / fair * 100, "gross": gross,
+            "friction": friction, "brokerage": brokerage * BASIS_ORDERS, "stt_spot": spot * units * STT_SPOT,
+            "net_pnl": net, "signal": _signal(basis, fair * threshold_pct / 100, "carry", "reverse")}
+
+
+@functools.lru_cache(maxsize=TRADE_CACHE_SIZE)
+def basis_decay(spot, futures, r, days, units, friction):
+    """(days_left, fair, basis, net_pnl) for each day to expiry, ``days`` down to 1.
+
+    Fair futures rise towards the entry futures price as carry accrues, so
+    the basis decays to zero by expiry.
+    """
+    days_left = np.arange(days, 0, -1)
+    fair      = spot * np.exp(r * days_left / 365.0)
+    basis     = futures - fair
+    return _read_only(days_left, fair, basis, np.abs(basis) * units - friction)
+
+
+for _fn in (pcp_leg_analytics, pcp_trade, pcp_payoff, irp_trade, irp_sensitivity, basis_trade, basis_decay):
+    PROFILER.register_counters("memo." + _fn.__name__,
+                               lambda fn=_fn: dict(zip(("hits", "misses"), fn.cache_info()[:2])))